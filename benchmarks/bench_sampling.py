@@ -0,0 +1,102 @@
+"""采样引擎基准测试
+
+生成一段合成视频，分别用旧的逐帧read()方式和iter_sampled_frames
+在间隔1、10、100下遍历整段视频，输出每秒处理的源视频帧数；
+再测量按时间采样和场景变化检测的速度。
+
+用法:
+    python benchmarks/bench_sampling.py [--width 1920] [--height 1080] [--frames 600]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from frame_extractor import iter_sampled_frames, iter_scene_frames, iter_timed_frames  # noqa: E402
+
+
+def make_video(path, width, height, frames, fps=30):
+    """生成内容逐帧变化的合成视频"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(frames):
+        frame = np.roll(base, i * 8, axis=1)
+        cv2.putText(frame, str(i), (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+        writer.write(frame)
+    writer.release()
+
+
+def run_read_all(path, interval):
+    """旧实现：每一帧都read()，再丢弃不需要的帧"""
+    cap = cv2.VideoCapture(str(path))
+    kept = 0
+    index = 0
+    while True:
+        ret, _ = cap.read()
+        if not ret:
+            break
+        if index % interval == 0:
+            kept += 1
+        index += 1
+    cap.release()
+    return kept, index
+
+
+def run_sampled(path, interval):
+    cap = cv2.VideoCapture(str(path))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    kept = sum(1 for _ in iter_sampled_frames(cap, interval))
+    cap.release()
+    return kept, total
+
+
+def run_timed(path, seconds):
+    cap = cv2.VideoCapture(str(path))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    kept = sum(1 for _ in iter_timed_frames(cap, seconds, cap.get(cv2.CAP_PROP_FPS)))
+    cap.release()
+    return kept, total
+
+
+def run_scene(path, interval):
+    cap = cv2.VideoCapture(str(path))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    kept = sum(1 for _ in iter_scene_frames(iter_sampled_frames(cap, interval)))
+    cap.release()
+    return kept, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=600)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = Path(tmp) / "synthetic.mp4"
+        make_video(video, args.width, args.height, args.frames)
+        print(f"视频: {args.width}x{args.height}, {args.frames} 帧")
+        print(f"{'间隔':>6} {'方式':>10} {'保留帧':>8} {'耗时(s)':>9} {'源帧/秒':>10}")
+        for interval in (1, 10, 100):
+            for name, func in (("read-all", run_read_all), ("sampled", run_sampled)):
+                start = time.perf_counter()
+                kept, total = func(video, interval)
+                elapsed = time.perf_counter() - start
+                print(f"{interval:>6} {name:>10} {kept:>8} {elapsed:>9.2f} {total / elapsed:>10.1f}")
+        for label, name, func, arg in (("1s", "seconds", run_timed, 1.0), ("1", "scene", run_scene, 1)):
+            start = time.perf_counter()
+            kept, total = func(video, arg)
+            elapsed = time.perf_counter() - start
+            print(f"{label:>6} {name:>10} {kept:>8} {elapsed:>9.2f} {total / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
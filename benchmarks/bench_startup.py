@@ -0,0 +1,119 @@
+"""启动时间测量：命令行入口不应导入OpenCV、NumPy或tkinter
+
+在新的子进程中多次运行各入口（--help、--dry-run、导入包），报告最短和中位耗时，
+并检查导入后这些重型模块没有被加载。有重型模块被加载、或中位耗时超过--max-ms时以退出码 1 结束，
+结果可写入JSON文件与之前的结果比较。
+
+用法:
+    python benchmarks/bench_startup.py [--runs 10] [--max-ms 300] [--output startup.json]
+    python benchmarks/bench_startup.py --compare startup.json [--threshold 0.2]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 入口启动后不应加载的模块
+HEAVY_MODULES = ("cv2", "numpy", "tkinter")
+
+# 检查已加载模块的代码：运行入口后输出其中已加载的重型模块
+CHECK_MODULES = ("import json, runpy, sys\n"
+                 "sys.argv = {argv!r}\n"
+                 "try:\n"
+                 "    runpy.{runner}({target!r}, run_name='__main__')\n"
+                 "except SystemExit:\n"
+                 "    pass\n"
+                 "sys.__stdout__.write(json.dumps([m for m in {heavy!r} if m in sys.modules]))\n")
+
+
+def _cases(input_dir, output_dir):
+    """(名称, 子进程参数, 用于检查模块的(runpy函数名, 模块名或脚本路径, 命令行参数)或None)"""
+    gui = str(ROOT / "video_frame_extractor.py")
+    dry_run = [str(input_dir), str(output_dir), "--dry-run", "--progress", "none", "--log-level", "error"]
+    return [
+        ("python", ["-c", "pass"], None),
+        ("import", ["-c", "import frame_extractor"], None),
+        ("help", ["-m", "frame_extractor", "--help"], ("run_module", "frame_extractor", ["--help"])),
+        ("dry-run", ["-m", "frame_extractor"] + dry_run, ("run_module", "frame_extractor", dry_run)),
+        ("gui-cli", [gui, "--help"], ("run_path", gui, ["--help"])),
+    ]
+
+
+def _time_run(args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def _loaded_heavy_modules(runner, target, argv):
+    code = CHECK_MODULES.format(runner=runner, target=target, argv=[target] + argv, heavy=HEAVY_MODULES)
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="每个入口运行的次数（默认: 10）")
+    parser.add_argument("--max-ms", type=float, help="中位耗时超过该毫秒数（不含解释器本身的启动）时视为失败")
+    parser.add_argument("--output", help="结果JSON文件")
+    parser.add_argument("--compare", help="与之前的结果JSON比较")
+    parser.add_argument("--threshold", type=float, default=0.2, help="中位耗时增加超过该比例视为变慢（默认: 0.2）")
+    args = parser.parse_args()
+
+    failures = []
+    results = {"meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+                        "runs": args.runs}, "cases": {}}
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_dir = Path(work_dir) / "input"
+        for i in range(20):
+            # 内容不是有效的视频也没有关系，试运行不会打开视频
+            video = input_dir / f"dir_{i % 4}" / f"video_{i:02d}.mp4"
+            video.parent.mkdir(parents=True, exist_ok=True)
+            video.write_bytes(os.urandom(1024))
+        baseline = None
+        for name, run_args, check in _cases(input_dir, Path(work_dir) / "output"):
+            times = [_time_run(run_args) for _ in range(max(1, args.runs))]
+            median = statistics.median(times)
+            baseline = median if baseline is None else baseline
+            overhead = median - baseline if name != "python" else 0.0
+            loaded = _loaded_heavy_modules(*check) if check else []
+            results["cases"][name] = {"min_ms": round(min(times), 1), "median_ms": round(median, 1),
+                                      "overhead_ms": round(overhead, 1), "heavy_modules": loaded}
+            print(f"{name:<10} 最短 {min(times):7.1f} ms  中位 {median:7.1f} ms  除解释器外 {overhead:7.1f} ms"
+                  f"{'  已加载: ' + ', '.join(loaded) if loaded else ''}")
+            if loaded:
+                failures.append(f"{name} 加载了 {', '.join(loaded)}")
+            if args.max_ms is not None and name != "python" and overhead > args.max_ms:
+                failures.append(f"{name} 启动耗时 {overhead:.1f} ms 超过 {args.max_ms} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)["cases"]
+        for name, result in results["cases"].items():
+            old = previous.get(name)
+            if name == "python" or not old or not old["overhead_ms"]:
+                continue
+            change = result["overhead_ms"] / old["overhead_ms"] - 1
+            print(f"{name:<10} {old['overhead_ms']:7.1f} -> {result['overhead_ms']:7.1f} ms ({change * 100:+.1f}%)")
+            if change > args.threshold:
+                failures.append(f"{name} 启动变慢 {change * 100:.1f}%")
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""提取热路径的基准测试套件
+
+用cv2.VideoWriter在本地生成确定性的合成视频（多种分辨率、长度和编码），
+分阶段（解码、编码、写出）以及端到端（run_batch）测量不同间隔、输出格式和进程数下的性能。
+每个用例在单独的子进程中运行，报告帧/秒、MB/秒、峰值内存(RSS)和CPU利用率，
+结果写入JSON文件；用--compare与之前的结果比较，速度下降超过阈值时以非零退出码结束。
+
+用法:
+    python benchmarks/bench_suite.py --output bench.json [--quick]
+    python benchmarks/bench_suite.py --output new.json --compare bench.json [--threshold 0.1]
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from frame_extractor import ExtractionOptions, encode_frame, iter_sampled_frames, run_batch, write_file_atomic  # noqa: E402
+
+# 编码 -> 扩展名；当前OpenCV不支持的编码会被跳过
+CODECS = {"mp4v": ".mp4", "MJPG": ".avi", "XVID": ".avi", "FFV1": ".mkv"}
+
+# 完整测试矩阵
+FULL_MATRIX = {
+    "videos": [(640, 360, 300), (1280, 720, 300), (1920, 1080, 150)],   # (宽, 高, 帧数)
+    "codecs": ["mp4v", "MJPG", "FFV1"],
+    "intervals": [1, 10, 100],
+    "formats": ["png", "jpg", "webp", "raw"],
+    "workers": [1, 2, 4],
+}
+
+# --quick使用的小矩阵，适合在修改后快速检查
+QUICK_MATRIX = {
+    "videos": [(640, 360, 120)],
+    "codecs": ["mp4v"],
+    "intervals": [1, 10],
+    "formats": ["png", "jpg"],
+    "workers": [1, 2],
+}
+
+# 分阶段测试编码和写出时使用的帧数
+STAGE_FRAMES = 30
+
+# 端到端测试多进程时输入目录中的视频副本数
+E2E_COPIES = 4
+
+
+def make_video(path, width, height, frames, codec, fps=30):
+    """生成确定性的合成视频：固定种子的平滑背景缓慢平移，并叠加帧号；返回是否成功"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        return False
+    rng = np.random.default_rng(0)
+    base = cv2.resize(rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8), (width, height),
+                      interpolation=cv2.INTER_CUBIC)
+    for i in range(frames):
+        frame = np.roll(base, i * 4, axis=1)
+        cv2.putText(frame, str(i), (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+        writer.write(frame)
+    writer.release()
+    return True
+
+
+def _peak_rss_mb():
+    """当前进程及已结束的子进程的峰值RSS（MB），不支持时返回None"""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # Linux单位为KB，macOS为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _decode_frames(video, count):
+    cap = cv2.VideoCapture(str(video))
+    frames = [frame for _, frame in itertools.islice(iter_sampled_frames(cap, 1), count)]
+    cap.release()
+    return frames
+
+
+def _stage_decode(case, work_dir):
+    cap = cv2.VideoCapture(case["video"])
+    frames = nbytes = 0
+    for _, frame in iter_sampled_frames(cap, case["interval"]):
+        frames += 1
+        nbytes += frame.nbytes
+    cap.release()
+    return frames, nbytes
+
+
+def _stage_encode(case, work_dir):
+    frames = _decode_frames(case["video"], STAGE_FRAMES)
+    start = time.perf_counter()
+    nbytes = sum(len(encode_frame(frame, case["format"])) for frame in frames)
+    return len(frames), nbytes, time.perf_counter() - start
+
+
+def _stage_write(case, work_dir):
+    encoded = [encode_frame(frame, case["format"]) for frame in _decode_frames(case["video"], STAGE_FRAMES)]
+    start = time.perf_counter()
+    for i, data in enumerate(encoded):
+        write_file_atomic(Path(work_dir) / f"frame_{i:06d}", data)
+    return len(encoded), sum(len(data) for data in encoded), time.perf_counter() - start
+
+
+def _end_to_end(case, work_dir):
+    input_dir = Path(work_dir) / "input"
+    input_dir.mkdir()
+    copies = E2E_COPIES if case["workers"] > 1 else 1
+    for i in range(copies):
+        shutil.copy(case["video"], input_dir / f"video_{i}{Path(case['video']).suffix}")
+    options = ExtractionOptions(interval=case["interval"], output_format=case["format"], workers=case["workers"])
+    batch = run_batch(input_dir, Path(work_dir) / "output", options)
+    return batch.extracted_frames, batch.bytes_written
+
+
+STAGES = {"decode": _stage_decode, "encode": _stage_encode, "write": _stage_write, "end_to_end": _end_to_end}
+
+
+def _measure(case):
+    """子进程入口：运行一个用例并返回测量结果"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        times_before = os.times()
+        start = time.perf_counter()
+        outcome = STAGES[case["stage"]](case, work_dir)
+        elapsed = time.perf_counter() - start
+        times_after = os.times()
+    # 编码和写出阶段只计时核心循环，不包括准备输入帧
+    frames, nbytes = outcome[:2]
+    if len(outcome) == 3:
+        elapsed = outcome[2]
+    cpu = sum(after - before for after, before in zip(times_after[:4], times_before[:4]))
+    wall = times_after[4] - times_before[4] or elapsed
+    return dict(case, frames=frames, bytes=nbytes, seconds=round(elapsed, 4),
+                frames_per_s=round(frames / elapsed, 2) if elapsed else None,
+                mb_per_s=round(nbytes / 1024 / 1024 / elapsed, 2) if elapsed else None,
+                peak_rss_mb=_peak_rss_mb(),
+                cpu_percent=round(cpu / wall * 100, 1) if wall else None)
+
+
+def build_cases(matrix, video_dir):
+    """生成合成视频并展开测试用例"""
+    cases = []
+    for width, height, length in matrix["videos"]:
+        for codec in matrix["codecs"]:
+            video = Path(video_dir) / f"synthetic_{width}x{height}_{length}_{codec}{CODECS[codec]}"
+            if not video.exists() and not make_video(video, width, height, length, codec):
+                print(f"跳过不支持的编码: {codec}", file=sys.stderr)
+                continue
+            base = {"video": str(video), "resolution": f"{width}x{height}", "length": length, "codec": codec}
+            for interval in matrix["intervals"]:
+                cases.append(dict(base, stage="decode", interval=interval))
+            for output_format in matrix["formats"]:
+                cases.append(dict(base, stage="encode", format=output_format))
+                cases.append(dict(base, stage="write", format=output_format))
+            for interval in matrix["intervals"]:
+                for output_format in matrix["formats"]:
+                    for workers in matrix["workers"]:
+                        cases.append(dict(base, stage="end_to_end", interval=interval, format=output_format,
+                                          workers=workers))
+    return cases
+
+
+def case_key(case):
+    """用于在两次结果之间匹配同一用例的键，不含视频的临时路径"""
+    fields = ("stage", "resolution", "length", "codec", "interval", "format", "workers")
+    return tuple(case.get(field) for field in fields)
+
+
+def compare(results, baseline, threshold):
+    """打印与基准结果的速度比较，返回变慢超过阈值的用例数"""
+    previous = {case_key(case): case for case in baseline["cases"]}
+    regressions = 0
+    for case in results["cases"]:
+        old = previous.get(case_key(case))
+        if not old or not old.get("frames_per_s") or not case.get("frames_per_s"):
+            continue
+        ratio = case["frames_per_s"] / old["frames_per_s"]
+        flag = ""
+        if ratio < 1 - threshold:
+            flag = "  <-- 变慢"
+            regressions += 1
+        label = " ".join(str(value) for value in case_key(case) if value is not None)
+        print(f"{label:<50} {old['frames_per_s']:>10.1f} -> {case['frames_per_s']:>10.1f} 帧/秒 ({ratio:6.2f}x){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench_results.json", help="结果JSON文件")
+    parser.add_argument("--quick", action="store_true", help="只运行小矩阵")
+    parser.add_argument("--stages", nargs="+", choices=sorted(STAGES), help="只运行这些阶段")
+    parser.add_argument("--video-dir", help="缓存合成视频的目录（默认使用临时目录）")
+    parser.add_argument("--compare", help="与之前的结果JSON比较")
+    parser.add_argument("--threshold", type=float, default=0.1, help="帧/秒下降超过该比例视为变慢（默认: 0.1）")
+    args = parser.parse_args()
+
+    matrix = QUICK_MATRIX if args.quick else FULL_MATRIX
+    with tempfile.TemporaryDirectory() as temp_dir:
+        video_dir = Path(args.video_dir or temp_dir)
+        video_dir.mkdir(parents=True, exist_ok=True)
+        cases = [case for case in build_cases(matrix, video_dir) if not args.stages or case["stage"] in args.stages]
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "opencv": cv2.__version__,
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "quick": args.quick,
+            },
+            "cases": [],
+        }
+        # 每个用例使用新的子进程，峰值内存互不影响
+        context = multiprocessing.get_context("spawn")
+        for i, case in enumerate(cases, 1):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(_measure, case).result()
+            del result["video"]
+            results["cases"].append(result)
+            label = " ".join(str(value) for value in case_key(result) if value is not None)
+            print(f"[{i}/{len(cases)}] {label:<50} {result['frames_per_s']:>10.1f} 帧/秒 {result['mb_per_s']:>8.1f} MB/秒 "
+                  f"RSS {result['peak_rss_mb']} MB CPU {result['cpu_percent']}%")
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{regressions} 个用例变慢超过 {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""检查多节点共享：多个进程代替多台机器对同一输出文件夹运行，每个视频只被提取一次且输出完整
+
+先用单节点提取一遍作为参照。然后同时启动若干个节点进程运行共享模式（其中一个使用多进程并行），
+并在一个节点取得租约后把它强制结束（SIGKILL）模拟崩溃。所有存活节点结束后检查：每个视频都有完成标记、
+没有残留的租约，输出文件与参照完全一致，各视频在存活节点和崩溃节点之间恰好完成一次，崩溃节点的租约被收回。
+然后把一个正在处理的节点暂停（SIGSTOP）到租约过期，等另一个节点收回并完成后再恢复，检查恢复的节点
+不再写入输出目录（最多完成暂停时正在进行的一次写入）。另外单独检查过期租约的收回、被收回或停顿过久后
+能够发现租约丢失，以及读取租约暂时出错时不会放弃租约。有问题时以退出码 1 结束。
+
+用法:
+    python benchmarks/check_leases.py [--videos 16] [--nodes 3] [--frames 240]
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_suite import make_video  # noqa: E402
+from frame_extractor import (DONE_MARKER_NAME, LEASE_NAME, MANIFEST_NAME, ExtractionOptions, VideoLease,  # noqa: E402
+                             run_batch, run_shared_batch)
+from frame_extractor.lease import load_done_marker  # noqa: E402
+
+# 测试使用的短租约：超时秒数和心跳间隔
+LEASE_TIMEOUT = 3.0
+HEARTBEAT_INTERVAL = 0.5
+RETRY_INTERVAL = 0.5
+
+# 不属于提取结果的记录文件
+BOOKKEEPING = {MANIFEST_NAME, DONE_MARKER_NAME}
+
+
+def _digest_outputs(output_dir):
+    return {str(path.relative_to(output_dir)): hashlib.sha1(path.read_bytes()).hexdigest()
+            for path in sorted(output_dir.rglob("*")) if path.is_file() and path.name not in BOOKKEEPING}
+
+
+def _run_node(input_dir, output_dir, node, workers, result_path):
+    batch = run_shared_batch(input_dir, output_dir, ExtractionOptions(workers=workers), node=node,
+                             lease_timeout=LEASE_TIMEOUT, heartbeat_interval=HEARTBEAT_INTERVAL,
+                             retry_interval=RETRY_INTERVAL)
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump([[result.video_path.name, result.status] for result in batch.results], f)
+
+
+def _run_nodes(work_dir, input_dir, output_dir, nodes):
+    """启动各节点，第一个节点取得租约后强制结束；返回(各存活节点的结果, 崩溃节点被结束时持有租约的视频)"""
+    context = multiprocessing.get_context("spawn")
+    processes = {}
+    for i in range(nodes):
+        node = f"node-{i}"
+        processes[node] = context.Process(target=_run_node, args=(
+            input_dir, output_dir, node, 2 if i == 1 else 1, work_dir / f"{node}.json"))
+    for process in processes.values():
+        process.start()
+
+    crashed, held = "node-0", []
+    deadline = time.monotonic() + 60
+    while not held and time.monotonic() < deadline:
+        held = [lease.parent.name for lease in output_dir.rglob(LEASE_NAME)
+                if (VideoLease(lease.parent, "").holder() or {}).get("node") == crashed]
+        time.sleep(0.05)
+    os.kill(processes[crashed].pid, 9)
+    for process in processes.values():
+        process.join()
+
+    results = {}
+    for node in processes:
+        if node != crashed:
+            with open(work_dir / f"{node}.json", "r", encoding="utf-8") as f:
+                results[node] = json.load(f)
+    return results, held
+
+
+def _snapshot(output_dir):
+    return {str(path): (path.stat().st_mtime_ns, path.stat().st_size)
+            for path in output_dir.rglob("*") if path.is_file()}
+
+
+def _check_stalled(work_dir, frames):
+    """暂停持有租约的节点直到租约被收回并完成，恢复后该节点不应再写入"""
+    input_dir = work_dir / "stall_input"
+    input_dir.mkdir()
+    make_video(input_dir / "long.avi", 320, 180, frames, "MJPG")
+    output_dir = work_dir / "stall_output"
+    context = multiprocessing.get_context("spawn")
+    stalled = context.Process(target=_run_node, args=(input_dir, output_dir, "stalled", 1, work_dir / "stalled.json"))
+    stalled.start()
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and len(list(output_dir.rglob("frame_*"))) < 10:
+        time.sleep(0.05)
+    os.kill(stalled.pid, signal.SIGSTOP)
+    try:
+        rescuer = context.Process(target=_run_node, args=(input_dir, output_dir, "rescuer", 1,
+                                                          work_dir / "rescuer.json"))
+        rescuer.start()
+        rescuer.join()
+        before = _snapshot(output_dir)
+    finally:
+        os.kill(stalled.pid, signal.SIGCONT)
+    stalled.join()
+    after = _snapshot(output_dir)
+    changed = sorted(path for path in set(before) | set(after) if before.get(path) != after.get(path))
+    with open(work_dir / "rescuer.json", "r", encoding="utf-8") as f:
+        rescued = json.load(f)
+    print(f"暂停的节点恢复后改动了 {len(changed)} 个文件；接手的节点: {rescued}")
+    failures = []
+    if rescued != [["long.avi", "done"]]:
+        failures.append(f"暂停节点的租约没有被收回并完成: {rescued}")
+    if len(changed) > 1:
+        failures.append(f"暂停的节点恢复后仍写入了 {len(changed)} 个文件: {changed[:5]}")
+    return failures
+
+
+def _check_reclaim(work_dir):
+    """过期租约可以收回，未过期的不能；被收回的一方在下一次心跳发现租约丢失"""
+    failures = []
+    output_dir = work_dir / "reclaim"
+    output_dir.mkdir()
+    first = VideoLease(output_dir, "first", LEASE_TIMEOUT)
+    if not first.acquire():
+        failures.append("无法在空目录取得租约")
+    if VideoLease(output_dir, "second", LEASE_TIMEOUT).acquire():
+        failures.append("取得了其他节点未过期的租约")
+    stale = time.time() - LEASE_TIMEOUT - 1
+    os.utime(output_dir / LEASE_NAME, (stale, stale))
+    second = VideoLease(output_dir, "second", LEASE_TIMEOUT)
+    if not second.acquire() or second.reclaimed_from != "first":
+        failures.append(f"没有收回过期的租约（收回自 {second.reclaimed_from}）")
+    if first.heartbeat() or not first.lost:
+        failures.append("租约被收回后心跳没有发现")
+    first.release()
+    if (second.holder() or {}).get("node") != "second":
+        failures.append("丢失租约的节点释放时删除了新节点的租约")
+    second.release()
+    if (output_dir / LEASE_NAME).exists():
+        failures.append("释放后租约文件仍然存在")
+
+    # 停顿超过超时时间的3/4后不再续约，也不再允许写入
+    third = VideoLease(output_dir, "third", LEASE_TIMEOUT)
+    third.acquire()
+    third._renewed -= LEASE_TIMEOUT
+    if third.still_held() or third.heartbeat():
+        failures.append("停顿过久后仍认为持有租约")
+    third.release()
+    (output_dir / LEASE_NAME).unlink(missing_ok=True)  # 丢失租约的一方不删除租约，留给收回者
+
+    # 读取租约暂时出错时本次心跳不续约，但不放弃租约
+    fourth = VideoLease(output_dir, "fourth", LEASE_TIMEOUT)
+    fourth.acquire()
+    read = fourth._read
+    errors = iter([OSError("暂时出错")] * 5)
+
+    def flaky_read():
+        error = next(errors, None)
+        if error is not None:
+            raise error
+        return read()
+
+    fourth._read = flaky_read
+    if not fourth.heartbeat() or fourth.lost:
+        failures.append("读取租约暂时出错时放弃了租约")
+    if not fourth.heartbeat() or fourth.lost or not fourth.still_held():
+        failures.append("读取恢复后没有继续持有租约")
+    fourth.release()
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=16, help="视频数（默认: 16）")
+    parser.add_argument("--nodes", type=int, default=3, help="节点进程数，其中一个会被强制结束（默认: 3）")
+    parser.add_argument("--frames", type=int, default=240, help="每个视频的帧数（默认: 240）")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        input_dir = work_dir / "input"
+        for i in range(args.videos):
+            video = input_dir / (f"day_{i % 2}" if i % 3 else "") / f"clip_{i:03d}.avi"
+            video.parent.mkdir(parents=True, exist_ok=True)
+            make_video(video, 320, 180, args.frames, "MJPG")
+
+        start = time.perf_counter()
+        run_batch(input_dir, work_dir / "reference", ExtractionOptions(), probe=False)
+        single = time.perf_counter() - start
+        reference = _digest_outputs(work_dir / "reference")
+
+        output_dir = work_dir / "shared"
+        start = time.perf_counter()
+        results, held = _run_nodes(work_dir, input_dir, output_dir, args.nodes)
+        shared = time.perf_counter() - start
+
+        leftovers = [str(path) for path in output_dir.rglob(LEASE_NAME + "*")]
+        if leftovers:
+            failures.append(f"残留的租约: {leftovers}")
+        outputs = _digest_outputs(output_dir)
+        if outputs != reference:
+            differing = sorted(set(outputs.items()) ^ set(reference.items()))
+            failures.append(f"有 {len(differing)} 个文件与单节点提取不同: {differing[:5]}")
+
+        completions = {}
+        for video in input_dir.rglob("*.avi"):
+            marker = load_done_marker(output_dir / video.parent.relative_to(input_dir) / video.stem)
+            if marker is None:
+                failures.append(f"{video.name} 没有完成标记")
+            elif marker["node"] == "node-0":
+                completions[video.name] = 1  # 崩溃节点在结束前完成的视频
+        for node, node_results in results.items():
+            for name, status in node_results:
+                if status == "done":
+                    completions[name] = completions.get(name, 0) + 1
+                elif status != "unchanged":
+                    failures.append(f"{node}: {name} 的状态为 {status}")
+        repeated = {name: count for name, count in completions.items() if count != 1}
+        if repeated or len(completions) != args.videos:
+            failures.append(f"完成次数不是恰好一次: {repeated}，共完成 {len(completions)} 个视频")
+        counts = {node: sum(1 for _, status in node_results if status == "done")
+                  for node, node_results in results.items()}
+        print(f"{args.nodes} 个节点（node-0 持有 {held} 的租约时被结束）: {shared:.2f} 秒，"
+              f"单节点 {single:.2f} 秒；各存活节点完成的视频数 {counts}")
+
+        failures += _check_stalled(work_dir, args.frames * 3)
+        failures += _check_reclaim(work_dir)
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""检查分段并行提取与顺序提取的输出完全一致
+
+生成确定性的合成视频，分别顺序提取和分段并行提取，比较两次输出的文件名和文件内容（PNG无损，
+任何像素差异都会导致内容不同）。有差异时以退出码 1 结束。
+
+用法:
+    python benchmarks/check_segments.py [--segments 4] [--frames 1500]
+"""
+import argparse
+import hashlib
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_suite import CODECS, make_video  # noqa: E402
+from frame_extractor import ExtractionOptions, extract_video_frames  # noqa: E402
+from frame_extractor.manifest import MANIFEST_NAME  # noqa: E402
+
+# (采样方式, 帧间隔, 秒数)
+CASES = [("frames", 1, 1.0), ("frames", 7, 1.0), ("frames", 97, 1.0), ("seconds", 1, 0.7)]
+
+
+def _digest_outputs(output_dir):
+    """输出目录中除清单外各文件的内容摘要"""
+    return {path.name: hashlib.sha1(path.read_bytes()).hexdigest()
+            for path in Path(output_dir).iterdir() if path.name != MANIFEST_NAME}
+
+
+def _extract(video, output_dir, mode, interval, seconds, segments):
+    options = ExtractionOptions(interval=interval, sampling_mode=mode, seconds=seconds, segments=segments)
+    start = time.perf_counter()
+    result = extract_video_frames(video, output_dir, options)
+    if result.status != "done":
+        raise RuntimeError(f"提取失败: {result.status} {result.error}")
+    return _digest_outputs(output_dir), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=4, help="分段数（默认: 4）")
+    parser.add_argument("--frames", type=int, default=1500, help="合成视频的帧数（默认: 1500）")
+    parser.add_argument("--codecs", nargs="+", default=["mp4v", "MJPG"], choices=sorted(CODECS), help="合成视频的编码")
+    args = parser.parse_args()
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as work_dir:
+        for codec in args.codecs:
+            video = Path(work_dir) / f"segments_{codec}{CODECS[codec]}"
+            if not make_video(video, 320, 180, args.frames, codec):
+                print(f"跳过不支持的编码: {codec}", file=sys.stderr)
+                continue
+            for mode, interval, seconds in CASES:
+                label = f"{codec} {mode} interval={interval} seconds={seconds}"
+                name = f"{codec}_{mode}_{interval}_{seconds}"
+                sequential, sequential_time = _extract(video, Path(work_dir) / f"seq_{name}", mode, interval, seconds, 1)
+                segmented, segmented_time = _extract(video, Path(work_dir) / f"seg_{name}", mode, interval, seconds,
+                                                     args.segments)
+                if sequential == segmented:
+                    print(f"一致  {label:<40} {len(sequential)} 个文件，顺序 {sequential_time:.2f} 秒，"
+                          f"分段 {segmented_time:.2f} 秒")
+                    continue
+                mismatches += 1
+                missing = sorted(set(sequential) - set(segmented))
+                extra = sorted(set(segmented) - set(sequential))
+                different = sorted(file_name for file_name in set(sequential) & set(segmented)
+                                   if sequential[file_name] != segmented[file_name])
+                print(f"不一致 {label}: 缺少 {missing[:5]}，多出 {extra[:5]}，内容不同 {different[:5]}")
+
+    if mismatches:
+        print(f"{mismatches} 个用例的分段输出与顺序输出不一致")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""检查按选择列表提取的帧与逐帧提取的对应帧完全一致，并比较两者的耗时
+
+生成确定性的合成视频，先逐帧提取全部帧作为参照，再用随机的帧序号和时间点（以及超出范围、
+找不到视频和格式错误的项）组成选择列表提取，逐个比较文件内容（PNG无损），并检查汇总文件中的原因计数。
+有差异时以退出码 1 结束。
+
+用法:
+    python benchmarks/check_selection.py [--requests 40] [--frames 1500] [--workers 2]
+"""
+import argparse
+import csv
+import hashlib
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_suite import CODECS, make_video  # noqa: E402
+from frame_extractor import SELECTION_SUMMARY_NAME, ExtractionOptions, extract_video_frames, run_selection  # noqa: E402
+
+FPS = 30
+
+# 选择列表中故意加入的问题项及其预期原因
+EXPECTED_REASONS = {"out_of_range": 2, "missing_video": 1, "invalid": 1}
+
+
+def _digest(path):
+    return hashlib.sha1(Path(path).read_bytes()).hexdigest()
+
+
+def _write_selection(path, videos, frames, count, seed):
+    """随机选择帧，一半按帧序号、一半按时间点；返回{(视频, 输出名称): 帧序号}"""
+    rng = random.Random(seed)
+    expected = {}
+    rows = []
+    for video in videos:
+        for i, frame_index in enumerate(sorted(rng.sample(range(frames), count), key=lambda _: rng.random())):
+            if i % 2:
+                seconds = frame_index / FPS
+                rows.append([video.name, "", f"{int(seconds // 60):02d}:{seconds % 60:06.3f}", ""])
+                expected[(video.name, f"time_{round(seconds, 3):010.3f}")] = frame_index
+            else:
+                rows.append([video.name, frame_index, "", ""])
+                expected[(video.name, f"frame_{frame_index:06d}")] = frame_index
+        rows.append([video.name, frame_index, "", f"named {frame_index}"])
+        expected[(video.name, f"named {frame_index}")] = frame_index
+    rows.append([videos[0].name, frames + 10, "", ""])
+    rows.append([videos[0].name, "", f"{frames / FPS + 5:.3f}", ""])
+    rows.append(["missing.mp4", 0, "", ""])
+    rows.append([videos[0].name, "abc", "", ""])
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["video", "frame", "timestamp", "name"])
+        writer.writerows(rows)
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40, help="每个视频随机选择的帧数（默认: 40）")
+    parser.add_argument("--frames", type=int, default=1500, help="合成视频的帧数（默认: 1500）")
+    parser.add_argument("--workers", type=int, default=2, help="按选择列表提取时的进程数（默认: 2）")
+    parser.add_argument("--codecs", nargs="+", default=["mp4v", "MJPG"], choices=sorted(CODECS), help="合成视频的编码")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        input_dir = work_dir / "input"
+        input_dir.mkdir()
+        videos = []
+        reference = {}
+        full_time = 0.0
+        for codec in args.codecs:
+            video = input_dir / f"selection_{codec}{CODECS[codec]}"
+            if not make_video(video, 320, 180, args.frames, codec, FPS):
+                print(f"跳过不支持的编码: {codec}", file=sys.stderr)
+                continue
+            videos.append(video)
+            start = time.perf_counter()
+            extract_video_frames(video, work_dir / "full" / video.stem, ExtractionOptions())
+            full_time += time.perf_counter() - start
+            reference[video.name] = work_dir / "full" / video.stem
+        if not videos:
+            sys.exit("没有可用的视频编码")
+
+        selection = work_dir / "selection.csv"
+        expected = _write_selection(selection, videos, args.frames, args.requests, 0)
+        for workers in sorted({1, args.workers}):
+            output_dir = work_dir / f"selected_{workers}"
+            start = time.perf_counter()
+            batch = run_selection(selection, input_dir, output_dir, ExtractionOptions(workers=workers))
+            elapsed = time.perf_counter() - start
+            mismatched = [f"{video}/{name}" for (video, name), frame_index in expected.items()
+                          if not (output_dir / Path(video).stem / f"{name}.png").exists() or
+                          _digest(output_dir / Path(video).stem / f"{name}.png") !=
+                          _digest(reference[video] / f"frame_{frame_index:06d}.png")]
+            with open(output_dir / SELECTION_SUMMARY_NAME, "r", encoding="utf-8") as f:
+                reasons = {reason: item["count"] for reason, item in json.load(f)["reasons"].items()}
+            print(f"workers={workers}: 提取 {batch.extracted_frames} 个文件，{elapsed:.2f} 秒"
+                  f"（逐帧提取全部 {args.frames * len(videos)} 帧 {full_time:.2f} 秒），无法提取: {reasons}")
+            if mismatched:
+                failures.append(f"workers={workers} 有 {len(mismatched)} 个文件与参照不同: {mismatched[:5]}")
+            if reasons != EXPECTED_REASONS:
+                failures.append(f"workers={workers} 汇总的原因计数为 {reasons}，预期 {EXPECTED_REASONS}")
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
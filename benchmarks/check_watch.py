@@ -0,0 +1,152 @@
+"""检查监视模式：慢速写入的视频只在写完后处理一次，重启后不重复处理，变化的视频重新处理
+
+在后台线程中运行watch_folder，另一线程把预先生成的合成视频分块、慢速地复制到输入文件夹（部分放入新建的子文件夹），
+检查每个视频恰好处理一次且提取的帧数完整，报告从写完到处理完成的延迟；然后重新启动监视，
+确认没有视频被重复处理，再替换一个视频，确认它被重新处理。分别测试inotify（可用时）和轮询两种方式，
+有问题时以退出码 1 结束。
+
+用法:
+    python benchmarks/check_watch.py [--videos 12] [--workers 2]
+"""
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_suite import make_video  # noqa: E402
+from frame_extractor import ExtractionOptions, Reporter  # noqa: E402
+from frame_extractor.watch import watch_folder  # noqa: E402
+
+FRAMES = 90
+INTERVAL = 10
+SETTLE_SECONDS = 1.0
+POLL_INTERVAL = 0.3
+
+# 复制一个视频分成的块数，以及块之间的间隔（秒）；总耗时超过SETTLE_SECONDS时只有等待写完才能得到完整的帧
+COPY_CHUNKS = 4
+CHUNK_DELAY = 0.2
+
+
+class _Recorder(Reporter):
+    def __init__(self):
+        self.finished = {}  # 视频 -> [(完成时间, 状态, 保存的帧数)]
+        self.lock = threading.Lock()
+
+    def video_finished(self, result):
+        with self.lock:
+            self.finished.setdefault(result.video_path.name, []).append(
+                (time.monotonic(), result.status, result.saved))
+
+
+def _slow_copy(source, target):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    data = source.read_bytes()
+    chunk = -(-len(data) // COPY_CHUNKS)
+    with open(target, "wb") as f:
+        for start in range(0, len(data), chunk):
+            f.write(data[start:start + chunk])
+            f.flush()
+            time.sleep(CHUNK_DELAY)
+
+
+def _run_watch(input_dir, output_dir, workers, use_inotify, action, timeout, until=None):
+    """在后台线程中监视，执行action后等待until()为True或超时，返回记录的结果"""
+    recorder = _Recorder()
+    stop = threading.Event()
+    thread = threading.Thread(target=watch_folder, args=(input_dir, output_dir, ExtractionOptions(
+        interval=INTERVAL, workers=workers), recorder), kwargs=dict(
+        should_continue=lambda: not stop.is_set(), poll_interval=POLL_INTERVAL, settle_seconds=SETTLE_SECONDS,
+        use_inotify=use_inotify))
+    thread.start()
+    try:
+        arrivals = action()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and not (until and until(recorder)):
+            time.sleep(0.1)
+    finally:
+        stop.set()
+        thread.join()
+    return recorder, arrivals
+
+
+def _check_mode(work_dir, sources, workers, use_inotify):
+    label = "inotify" if use_inotify else "轮询"
+    input_dir = work_dir / f"input_{label}"
+    output_dir = work_dir / f"output_{label}"
+    input_dir.mkdir()
+    failures = []
+    expected = -(-FRAMES // INTERVAL)
+
+    def arrive():
+        arrivals = {}
+        for i, source in enumerate(sources):
+            target = input_dir / (f"day_{i % 3}" if i % 2 else "") / source.name
+            _slow_copy(source, target)
+            arrivals[source.name] = time.monotonic()
+        return arrivals
+
+    recorder, arrivals = _run_watch(input_dir, output_dir, workers, use_inotify, arrive, 60,
+                                    lambda r: len(r.finished) >= len(sources))
+    latencies = []
+    for source in sources:
+        runs = recorder.finished.get(source.name, [])
+        if len(runs) != 1:
+            failures.append(f"{label}: {source.name} 被处理 {len(runs)} 次")
+            continue
+        finished, status, saved = runs[0]
+        latencies.append(finished - arrivals[source.name])
+        if status != "done" or saved != expected:
+            failures.append(f"{label}: {source.name} 状态 {status}，保存 {saved} 帧，预期 {expected} 帧")
+    if latencies:
+        print(f"{label}: 处理 {len(latencies)} 个视频，写完到处理完成的延迟 中位 {statistics.median(latencies):.2f} 秒，"
+              f"最长 {max(latencies):.2f} 秒")
+
+    # 重启：所有视频都在完成记录中，不应再处理
+    recorder, _ = _run_watch(input_dir, output_dir, workers, use_inotify, lambda: None, SETTLE_SECONDS + 2)
+    if recorder.finished:
+        failures.append(f"{label}: 重启后重复处理了 {sorted(recorder.finished)}")
+
+    # 替换一个视频：大小或修改时间变化后应重新处理
+    changed = next(input_dir.rglob(sources[0].name))
+    recorder, _ = _run_watch(input_dir, output_dir, workers, use_inotify,
+                             lambda: _slow_copy(sources[-1], changed), 30, lambda r: r.finished)
+    if [run[1] for run in recorder.finished.get(changed.name, [])] != ["done"]:
+        failures.append(f"{label}: 替换的视频没有被重新处理: {recorder.finished}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=12, help="写入的视频数（默认: 12）")
+    parser.add_argument("--workers", type=int, default=2, help="提取进程数（默认: 2）")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        staging = work_dir / "staging"
+        staging.mkdir()
+        sources = []
+        for i in range(args.videos):
+            video = staging / f"clip_{i:03d}.avi"
+            make_video(video, 160 + 16 * (i % 4), 90, FRAMES, "MJPG")
+            sources.append(video)
+        for use_inotify in (True, False):
+            failures += _check_mode(work_dir, sources, args.workers, use_inotify)
+        shutil.rmtree(staging)
+
+    for failure in failures:
+        print(failure)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
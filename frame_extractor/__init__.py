@@ -0,0 +1,131 @@
+"""视频帧提取核心库，不依赖tkinter，可在无界面的环境中使用
+
+示例:
+    from frame_extractor import ExtractionOptions, run_batch
+    batch = run_batch("videos", "frames", ExtractionOptions(interval=30, workers=8))
+"""
+from .budget import BufferPool, MemoryBudget
+from .core import (
+    ERROR_POLICIES,
+    BatchResult,
+    ExtractionOptions,
+    ProgressTracker,
+    Reporter,
+    VideoResult,
+    WorkerPool,
+    extract_video_frames,
+    plan_jobs,
+    plan_segments,
+    run_batch,
+    run_jobs,
+    scan_videos,
+)
+from .dedup import DEDUP_SCOPES, DEFAULT_HASH_DISTANCE, HASH_METHODS, FrameDeduplicator, average_hash, difference_hash
+from .discovery import (
+    PROBE_CACHE_NAME,
+    VIDEO_EXTENSIONS,
+    ProbeCache,
+    VideoInfo,
+    discover_videos,
+    format_duration,
+    iter_video_entries,
+    probe_video,
+)
+from .lease import DONE_MARKER_NAME, LEASE_NAME, VideoLease, extract_leased_video, run_shared_batch
+from .manifest import MANIFEST_NAME, VideoManifest
+from .metrics import STAGES, Histogram, LiveStats, RunMetrics, write_report
+from .pipeline import DEFAULT_ENCODE_WORKERS, DEFAULT_QUEUE_DEPTH, iter_encoded_frames
+from .plan import plan_batch, summarize_plan
+from .sampling import (
+    DEFAULT_SCENE_THRESHOLD,
+    SAMPLING_MODES,
+    SEEK_FRAME_THRESHOLD,
+    build_sampler,
+    iter_sampled_frames,
+    iter_scene_frames,
+    iter_selected_frames,
+    iter_timed_frames,
+)
+from .selection import SELECTION_SUMMARY_NAME, extract_selected_frames, load_selection, run_selection
+from .shards import CONTAINERS, INDEX_NAME, ShardReader, open_sink
+from .stream import stream_frame_batches, stream_frames
+from .transforms import INTERPOLATIONS, FrameTransform
+from .watch import WATCH_JOURNAL_NAME, FolderWatcher, WatchJournal, watch_folder
+from .writer import ENCODE_PRESETS, OUTPUT_FORMATS, encode_frame, write_file_atomic
+
+__all__ = [
+    "BatchResult",
+    "BufferPool",
+    "CONTAINERS",
+    "DEDUP_SCOPES",
+    "DEFAULT_ENCODE_WORKERS",
+    "DEFAULT_HASH_DISTANCE",
+    "DEFAULT_QUEUE_DEPTH",
+    "DEFAULT_SCENE_THRESHOLD",
+    "DONE_MARKER_NAME",
+    "ENCODE_PRESETS",
+    "ERROR_POLICIES",
+    "ExtractionOptions",
+    "FolderWatcher",
+    "FrameDeduplicator",
+    "FrameTransform",
+    "HASH_METHODS",
+    "Histogram",
+    "INDEX_NAME",
+    "INTERPOLATIONS",
+    "LEASE_NAME",
+    "LiveStats",
+    "MANIFEST_NAME",
+    "MemoryBudget",
+    "OUTPUT_FORMATS",
+    "PROBE_CACHE_NAME",
+    "ProbeCache",
+    "ProgressTracker",
+    "Reporter",
+    "RunMetrics",
+    "SAMPLING_MODES",
+    "SEEK_FRAME_THRESHOLD",
+    "SELECTION_SUMMARY_NAME",
+    "STAGES",
+    "ShardReader",
+    "VIDEO_EXTENSIONS",
+    "VideoInfo",
+    "VideoLease",
+    "VideoManifest",
+    "VideoResult",
+    "WATCH_JOURNAL_NAME",
+    "WatchJournal",
+    "WorkerPool",
+    "average_hash",
+    "build_sampler",
+    "difference_hash",
+    "discover_videos",
+    "encode_frame",
+    "extract_leased_video",
+    "extract_selected_frames",
+    "extract_video_frames",
+    "format_duration",
+    "iter_encoded_frames",
+    "iter_sampled_frames",
+    "iter_scene_frames",
+    "iter_selected_frames",
+    "iter_timed_frames",
+    "iter_video_entries",
+    "load_selection",
+    "open_sink",
+    "plan_batch",
+    "plan_jobs",
+    "plan_segments",
+    "probe_video",
+    "run_batch",
+    "run_jobs",
+    "run_selection",
+    "run_shared_batch",
+    "scan_videos",
+    "stream_frame_batches",
+    "stream_frames",
+    "summarize_plan",
+    "watch_folder",
+    "write_file_atomic",
+    "write_report",
+]
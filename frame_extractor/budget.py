@@ -0,0 +1,124 @@
+"""在途帧的内存预算和解码缓冲区复用
+
+已解码但尚未写出的帧在流水线中排队，4K的BGR帧每帧约25 MB，解码快于PNG编码时会迅速堆积。
+MemoryBudget按字节限制所有提取进程中在途帧的总大小，预算用尽时解码线程阻塞，直到有帧写出；
+BufferPool让cap.retrieve()直接写入已写出帧的数组，不再为每帧分配新的内存。
+"""
+import multiprocessing
+import time
+from collections import deque
+
+# 等待预算时检查停止条件的间隔（秒）
+BUDGET_POLL_INTERVAL = 0.1
+
+# 缓冲池中最多保留的空闲数组数，通常不超过流水线的queue_depth
+MAX_POOLED_BUFFERS = 16
+
+
+class MemoryBudget:
+    """所有提取进程共享的在途帧字节预算
+
+    用spawn上下文的共享变量实现，由父进程创建，通过进程池的初始化函数传给子进程。
+    没有其他在途帧时总是允许通过，因此单帧超过整个预算也不会永远阻塞；
+    每个解码线程在第一帧或帧尺寸变大时最多超出预算一帧。
+    """
+
+    def __init__(self, limit):
+        context = multiprocessing.get_context("spawn")
+        self.limit = max(0, int(limit))
+        self._condition = context.Condition()
+        self._used = context.RawValue("q", 0)
+        self._peak = context.RawValue("q", 0)
+        self._waits = context.RawValue("q", 0)     # 解码线程因预算用尽而阻塞的次数
+        self._wait_ns = context.RawValue("q", 0)   # 累计阻塞时间
+
+    def acquire(self, nbytes, should_continue=None):
+        """占用nbytes字节，预算不足时阻塞；should_continue返回False时放弃等待并返回False"""
+        with self._condition:
+            started = None
+            try:
+                while self._used.value and self._used.value + nbytes > self.limit:
+                    if started is None:
+                        started = time.perf_counter_ns()
+                        self._waits.value += 1
+                    if should_continue is not None and not should_continue():
+                        return False
+                    self._condition.wait(BUDGET_POLL_INTERVAL)
+                self._add(nbytes)
+                return True
+            finally:
+                if started is not None:
+                    self._wait_ns.value += time.perf_counter_ns() - started
+
+    def adjust(self, delta):
+        """不等待地修正已占用的字节数，用于按帧的实际大小修正预留"""
+        with self._condition:
+            self._add(delta)
+            if delta < 0:
+                self._condition.notify_all()
+
+    def release(self, nbytes):
+        self.adjust(-nbytes)
+
+    def _add(self, delta):
+        self._used.value += delta
+        self._peak.value = max(self._peak.value, self._used.value)
+
+    def as_dict(self):
+        with self._condition:
+            return {
+                "limit_bytes": self.limit,
+                "in_flight_bytes": self._used.value,
+                "peak_bytes": self._peak.value,
+                "waits": self._waits.value,
+                "wait_s": round(self._wait_ns.value / 1e9, 3),
+            }
+
+    def gauges(self):
+        """供统计文件使用的{名称: 数值}"""
+        stats = self.as_dict()
+        return {
+            "memory_budget_bytes": stats["limit_bytes"],
+            "memory_in_flight_bytes": stats["in_flight_bytes"],
+            "memory_peak_in_flight_bytes": stats["peak_bytes"],
+            "memory_budget_waits": stats["waits"],
+            "memory_budget_wait_seconds": stats["wait_s"],
+        }
+
+
+class BufferPool:
+    """复用已解码帧的数组：cap.retrieve(buffer)在形状和类型相同时直接写入该数组
+
+    只接收不是视图、形状和类型与最近一次解码的帧相同的数组，变换后尺寸不同的帧不会进入池中。
+    帧在写出之后才归还，因此不能用于把帧交给调用方保存的流式接口。
+    """
+
+    def __init__(self, max_buffers=MAX_POOLED_BUFFERS):
+        self.free = deque(maxlen=max(1, int(max_buffers)))
+        self.shape = None
+        self.dtype = None
+        self.allocated = 0  # 由OpenCV新分配的帧数
+        self.reused = 0     # 写入池中数组的帧数
+
+    def retrieve(self, cap):
+        """与cap.retrieve()相同，尽量写入池中的空闲数组"""
+        try:
+            buffer = self.free.pop()
+        except IndexError:
+            buffer = None
+        ret, frame = cap.retrieve(buffer)
+        if frame is None:
+            return ret, frame
+        if frame is buffer:
+            self.reused += 1
+        else:
+            self.allocated += 1
+            self.shape, self.dtype = frame.shape, frame.dtype
+        return ret, frame
+
+    def put(self, frame):
+        """归还调用方不再使用的帧"""
+        if frame is None or frame.base is not None or frame.shape != self.shape or frame.dtype != self.dtype:
+            return
+        if len(self.free) < self.free.maxlen:
+            self.free.append(frame)
@@ -0,0 +1,386 @@
+"""命令行入口：无界面运行，适合没有显示器的服务器和脚本调用
+
+进度以JSON Lines格式输出到标准输出（每行一个事件），日志输出到标准错误。
+"""
+import argparse
+import json
+import logging
+import signal
+import sys
+import threading
+import time
+from pathlib import Path
+
+from .core import ERROR_POLICIES, PROGRESS_UPDATE_INTERVAL, ExtractionOptions, Reporter, run_batch
+from .dedup import DEDUP_SCOPES, DEFAULT_HASH_DISTANCE, DEFAULT_INDEX_SIZE, HASH_METHODS
+from .discovery import PROBE_CACHE_NAME, format_duration
+from .lazy import module_available
+from .lease import DEFAULT_HEARTBEAT_INTERVAL, DEFAULT_LEASE_TIMEOUT, LEASE_NAME, run_shared_batch
+from .manifest import FINGERPRINT_MODES
+from .metrics import write_report
+from .pipeline import DEFAULT_ENCODE_WORKERS, DEFAULT_QUEUE_DEPTH
+from .plan import plan_batch, summarize_plan
+from .sampling import DEFAULT_SCENE_THRESHOLD, SAMPLING_MODES
+from .selection import SELECTION_SUMMARY_NAME, run_selection
+from .shards import CONTAINERS
+from .transforms import INTERPOLATIONS
+from .watch import DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS, WATCH_JOURNAL_NAME, watch_folder
+from .writer import ENCODE_PRESETS, OUTPUT_FORMATS
+
+# 字节数参数允许的单位后缀
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3, "t": 1024 ** 4}
+
+LOG_LEVEL_NAMES = {"debug": logging.DEBUG, "info": logging.INFO, "warning": logging.WARNING, "error": logging.ERROR}
+
+
+class CliReporter(Reporter):
+    """把日志写到标准错误，把进度事件写到标准输出"""
+
+    def __init__(self, log_level=logging.INFO, progress="json", stream=None):
+        self.log_level = log_level
+        self.progress = progress
+        self.stream = stream or sys.stdout
+        self.last_progress = 0.0
+        self.last_estimate = 0.0
+        self.videos = (0, 0)      # (已完成的视频数, 视频总数)
+        self.estimating = False   # 收到按工作量的估计后，文本进度改为显示完成比例和剩余时间
+        self.lock = threading.RLock()
+
+    def emit(self, event, **fields):
+        if self.progress == "json":
+            fields["event"] = event
+            with self.lock:
+                self.stream.write(json.dumps(fields, ensure_ascii=False) + "\n")
+                self.stream.flush()
+
+    def log(self, message, level=logging.INFO):
+        if level >= self.log_level:
+            with self.lock:
+                sys.stderr.write(f"[{time.strftime('%H:%M:%S')}] {logging.getLevelName(level)} {message}\n")
+
+    def notify(self, kind, title, message):
+        self.log(f"{title}: {message}", logging.ERROR if kind == "error" else logging.WARNING)
+
+    def video_started(self, video_path, index, total):
+        self.emit("video_started", video=str(video_path), index=index, total=total)
+
+    def video_progress(self, video_path, frame_index, total_frames):
+        # 限制输出频率，每个视频的开始和结束总会输出
+        now = time.monotonic()
+        if frame_index in (0, total_frames) or now - self.last_progress >= PROGRESS_UPDATE_INTERVAL:
+            self.last_progress = now
+            self.emit("video_progress", video=str(video_path), frame=frame_index, total_frames=total_frames)
+
+    def video_finished(self, result):
+        self.emit("video_finished", **result.as_dict())
+
+    def batch_progress(self, finished, total):
+        self.videos = (int(finished), total)
+        if self.progress == "text" and not self.estimating:
+            with self.lock:
+                sys.stderr.write(f"\r总体进度: {finished / total * 100:6.2f}% ({int(finished)}/{total})")
+                sys.stderr.flush()
+
+    def batch_estimate(self, fraction, remaining_seconds):
+        self.estimating = True
+        if self.progress == "text":
+            with self.lock:
+                sys.stderr.write(f"\r总体进度: {fraction * 100:6.2f}% ({self.videos[0]}/{self.videos[1]}) "
+                                 f"剩余约 {format_duration(remaining_seconds)}  ")
+                sys.stderr.flush()
+            return
+        now = time.monotonic()
+        if fraction >= 1 or now - self.last_estimate >= PROGRESS_UPDATE_INTERVAL:
+            self.last_estimate = now
+            self.emit("batch_progress", fraction=round(fraction, 4), finished_videos=self.videos[0],
+                      total_videos=self.videos[1],
+                      remaining_s=round(remaining_seconds, 1) if remaining_seconds is not None else None)
+
+
+def _int_list(count, separator):
+    """解析如"10,20,640,480"或"640x480"的整数列表参数"""
+    def parse(value):
+        try:
+            numbers = [int(part) for part in value.lower().split(separator)]
+        except ValueError:
+            numbers = []
+        if len(numbers) != count:
+            raise argparse.ArgumentTypeError(f"应为{count}个用'{separator}'分隔的整数: {value}")
+        return numbers
+    return parse
+
+
+def _byte_size(value):
+    """解析如"4G"、"512M"、"1.5g"或字节数的大小参数"""
+    text = value.strip().lower().rstrip("b")
+    unit = text[-1:] if text[-1:] in SIZE_UNITS else ""
+    try:
+        size = float(text[:len(text) - len(unit)]) * SIZE_UNITS[unit]
+    except ValueError:
+        size = -1
+    if size < 0:
+        raise argparse.ArgumentTypeError(f"应为字节数或带K/M/G/T单位的大小: {value}")
+    return int(size)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m frame_extractor",
+        description="从视频中按间隔提取帧（无界面模式）",
+    )
+    parser.add_argument("input", help="包含视频文件的输入文件夹（递归扫描）")
+    parser.add_argument("output", help="保存提取帧的输出文件夹，保持原始文件夹结构")
+    parser.add_argument("-m", "--mode", choices=SAMPLING_MODES, default="frames",
+                        help="采样方式: frames 每隔N帧, seconds 每隔N秒, scene 画面变化时（默认: frames）")
+    parser.add_argument("-n", "--interval", type=int, default=1,
+                        help="每隔多少帧提取一张；scene方式下为每隔多少帧检查一次画面变化（默认: 1）")
+    parser.add_argument("-s", "--seconds", type=float, default=1.0, help="seconds方式下每隔多少秒提取一张（默认: 1）")
+    parser.add_argument("--scene-threshold", type=float, default=DEFAULT_SCENE_THRESHOLD,
+                        help=f"scene方式下画面变化的阈值，0~1，越小保留越多（默认: {DEFAULT_SCENE_THRESHOLD}）")
+    parser.add_argument("--dedup", choices=DEDUP_SCOPES,
+                        help="跳过近似重复的帧: video 每个视频内去重, batch 整个批次共享去重索引（默认不去重）")
+    parser.add_argument("--dedup-hash", choices=sorted(HASH_METHODS), default="dhash", help="去重使用的感知哈希（默认: dhash）")
+    parser.add_argument("--dedup-distance", type=int, default=DEFAULT_HASH_DISTANCE,
+                        help=f"汉明距离不超过该值（0~64）的帧视为重复（默认: {DEFAULT_HASH_DISTANCE}）")
+    parser.add_argument("--dedup-index-size", type=int, default=DEFAULT_INDEX_SIZE,
+                        help=f"与最近多少张保留帧比较（默认: {DEFAULT_INDEX_SIZE}）")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="并行处理视频的进程数（默认: 1）")
+    parser.add_argument("--segments", type=int, default=1,
+                        help="把每个视频的帧范围分为N段，由N个进程并行提取，适合单个很长的视频；"
+                             "输出与顺序提取完全相同（默认: 1，不分段）")
+    parser.add_argument("--encode-workers", type=int, default=DEFAULT_ENCODE_WORKERS,
+                        help=f"每个视频的编码线程数（默认: {DEFAULT_ENCODE_WORKERS}）")
+    parser.add_argument("--queue-depth", type=int, default=DEFAULT_QUEUE_DEPTH,
+                        help=f"每个视频最多缓冲的已解码帧数（默认: {DEFAULT_QUEUE_DEPTH}）")
+    parser.add_argument("--memory-budget", type=_byte_size, default=0, metavar="SIZE",
+                        help="所有进程中已解码但尚未写出的帧占用内存的总上限，如4G、512M；"
+                             "用尽时解码等待写出，可以避免大分辨率视频并行时内存耗尽（默认: 0，不限制）")
+    parser.add_argument("-f", "--format", choices=sorted(OUTPUT_FORMATS), default="png",
+                        help="输出格式: png, jpg, webp（有损）, webp-lossless, raw 原始BGR字节（默认: png）")
+    parser.add_argument("-q", "--quality", type=int,
+                        help="png为压缩级别0~9（默认0）；jpg为质量0~100（默认95）；webp为质量1~100（默认90）")
+    parser.add_argument("--preset", choices=sorted(ENCODE_PRESETS),
+                        help="编码预设，覆盖--format和--quality: fastest JPG质量90, smallest WebP质量80, lossless-balanced PNG压缩级别1")
+    parser.add_argument("--crop", type=_int_list(4, ","), metavar="X,Y,W,H", help="编码前先裁剪到该区域")
+    parser.add_argument("--max-edge", type=int, help="等比缩小，使最长边不超过该像素数（不放大）")
+    parser.add_argument("--resize", type=_int_list(2, "x"), metavar="WxH", help="缩放到固定尺寸；与--letterbox同用时等比缩放后补黑边")
+    parser.add_argument("--interpolation", choices=INTERPOLATIONS, default="area", help="缩放的插值方式（默认: area）")
+    parser.add_argument("--grayscale", action="store_true", help="转为灰度图")
+    parser.add_argument("--letterbox", action="store_true", help="保持宽高比缩放，并居中补黑边到--resize的尺寸（或--max-edge的正方形）")
+    parser.add_argument("--container", choices=CONTAINERS, default="files",
+                        help="输出方式: files 每帧一个图片文件, tar/zip 打包为分片并生成帧索引, npy 原始BGR帧写入内存映射数组（默认: files）")
+    parser.add_argument("--shard-size", type=int, default=0,
+                        help="打包输出时每个分片的帧数，0表示每个视频一个分片（npy为每1000帧一个分片）")
+    parser.add_argument("--on-error", choices=ERROR_POLICIES, default="skip",
+                        help="连续保存失败时: skip 跳过当前视频, continue 继续, abort 停止整个批次（默认: skip）")
+    parser.add_argument("--resume", action="store_true",
+                        help="断点续传：跳过未变化且已完成的视频，未完成的从上次的位置继续")
+    parser.add_argument("--fingerprint", choices=FINGERPRINT_MODES, default="stat",
+                        help="判断源视频是否变化的方式: stat 大小和修改时间, hash 抽样内容哈希（默认: stat）")
+    parser.add_argument("--progress", choices=("json", "text", "none"), default="json",
+                        help="进度输出方式: json 每行一个JSON事件到标准输出, text 在标准错误显示进度, none 不输出")
+    parser.add_argument("--log-level", choices=sorted(LOG_LEVEL_NAMES), default="info", help="日志级别（默认: info）")
+    parser.add_argument("--no-probe", action="store_true",
+                        help="不探测视频的帧数和分辨率：按目录顺序处理，进度按视频个数计算")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="只列出工作计划和估计的输出大小，不打开视频也不写出任何文件；"
+                             "帧数和分辨率来自探测缓存，没有缓存的视频无法估计")
+    parser.add_argument("--select", metavar="PATH",
+                        help="只提取选择列表（CSV或JSON，每项为视频和帧序号或时间点）中的帧，按请求命名输出文件；"
+                             "视频路径相对于输入文件夹，采样方式和去重设置不起作用")
+    parser.add_argument("--selection-summary", metavar="PATH",
+                        help=f"选择列表的汇总文件，记录无法提取的请求及原因（默认: 输出文件夹中的{SELECTION_SUMMARY_NAME}）")
+    parser.add_argument("--watch", action="store_true",
+                        help="监视模式：持续监视输入文件夹，新到达或变化的视频写完后自动提取，直到Ctrl+C或SIGTERM；"
+                             f"完成记录保存在输出文件夹的{WATCH_JOURNAL_NAME}中，重启后不重复处理")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"监视模式下检查新文件的间隔秒数（默认: {DEFAULT_POLL_INTERVAL:g}）")
+    parser.add_argument("--settle-seconds", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help=f"文件大小和修改时间保持不变多少秒后才认为已写完（默认: {DEFAULT_SETTLE_SECONDS:g}）")
+    parser.add_argument("--shared", action="store_true",
+                        help="多节点共享：多台机器对共享文件系统上的同一输出文件夹运行时，每个视频先在输出目录中"
+                             f"创建租约文件（{LEASE_NAME}）再处理，崩溃节点的租约超时后由其他节点收回；总是启用断点续传")
+    parser.add_argument("--node-id", metavar="NAME", help="共享模式下本节点的名称，记录在租约和完成标记中（默认: 主机名-进程号）")
+    parser.add_argument("--lease-timeout", type=float, default=DEFAULT_LEASE_TIMEOUT,
+                        help=f"共享模式下租约多少秒未更新视为节点已崩溃（默认: {DEFAULT_LEASE_TIMEOUT:g}），"
+                             "应远大于各节点之间的时钟偏差")
+    parser.add_argument("--probe-cache", metavar="PATH",
+                        help=f"探测结果的缓存文件（默认: 输出文件夹中的{PROBE_CACHE_NAME}）")
+    parser.add_argument("--metrics-report", metavar="PATH",
+                        help="结束后把各阶段耗时直方图、吞吐量和错误数写为JSON报告")
+    parser.add_argument("--stats-file", metavar="PATH",
+                        help="运行中定期以Prometheus文本格式写入统计，供node_exporter等本地采集程序读取")
+    return parser
+
+
+def dry_run(args, options, reporter):
+    """--dry-run：输出每个视频的计划和汇总"""
+    try:
+        plan = plan_batch(args.input, args.output, options, args.probe_cache)
+    except OSError as e:
+        reporter.log(f"无法扫描输入文件夹: {str(e)}", logging.ERROR)
+        return 1
+    # JSON进度模式下每个视频已有planned_video事件，日志只在debug级别重复一遍
+    item_level = logging.DEBUG if args.progress == "json" else logging.INFO
+    for item in plan:
+        reporter.emit("planned_video", **item)
+        if item["status"] == "unchanged":
+            estimate = "未变化，将跳过"
+        elif item["estimated_bytes"] is None:
+            estimate = "无法估计"
+        else:
+            estimate = f"约 {item['expected_frames']} 帧，{item['estimated_bytes'] / 1024 / 1024:.1f} MB"
+        reporter.log(f"{item['video']} -> {item['output_dir']}: {estimate}"
+                     f"{'（从中途继续）' if item['status'] == 'partial' else ''}", item_level)
+    summary = summarize_plan(plan)
+    reporter.emit("plan_summary", **summary)
+    reporter.log(f"试运行: {summary['videos']} 个视频（{summary['input_bytes'] / 1024 / 1024:.1f} MB），"
+                 f"将跳过 {summary['unchanged']} 个，从中途继续 {summary['partial']} 个；"
+                 f"总时长约 {format_duration(summary['duration_s'])}")
+    reporter.log(f"预计提取 {summary['expected_frames']} 帧，输出约 {summary['estimated_bytes'] / 1024 / 1024:.1f} MB")
+    if summary["unknown"]:
+        reporter.log(f"{summary['unknown']} 个视频没有探测缓存或无法预计帧数，未计入估计；"
+                     f"正常运行一次后会写入探测缓存", logging.WARNING)
+    return 0
+
+
+def watch(args, options, reporter, stop, log_level):
+    """--watch：运行到收到中断信号或SIGTERM为止"""
+
+    def handle_terminate(signum, frame):
+        stop.set()
+        reporter.log("收到SIGTERM，正在停止...", logging.WARNING)
+
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_terminate)
+    result = watch_folder(args.input, args.output, options, reporter, should_continue=lambda: not stop.is_set(),
+                          log_level=log_level, stats_file=args.stats_file, poll_interval=args.poll_interval,
+                          settle_seconds=args.settle_seconds)
+    if args.progress == "text":
+        sys.stderr.write("\n")
+    summary = result.as_dict()
+    reporter.emit("summary", **{key: value for key, value in summary.items() if key != "videos"})
+    reporter.log(f"监视结束，共处理 {result.processed} 个视频，提取 {result.extracted_frames} 帧，失败 {result.failed} 个")
+    if result.extracted_frames:
+        reporter.log(result.metrics.summary_text())
+    if args.metrics_report:
+        try:
+            write_report(args.metrics_report, result)
+            reporter.log(f"统计报告已写入 {args.metrics_report}")
+        except OSError as e:
+            reporter.log(f"无法写入统计报告: {str(e)}", logging.ERROR)
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    log_level = LOG_LEVEL_NAMES[args.log_level]
+
+    try:
+        options = ExtractionOptions(
+            interval=args.interval,
+            output_format=args.format,
+            workers=args.workers,
+            encode_workers=args.encode_workers,
+            queue_depth=args.queue_depth,
+            error_policy=args.on_error,
+            resume=args.resume,
+            fingerprint=args.fingerprint,
+            sampling_mode=args.mode,
+            seconds=args.seconds,
+            scene_threshold=args.scene_threshold,
+            dedup=args.dedup,
+            dedup_hash=args.dedup_hash,
+            dedup_distance=args.dedup_distance,
+            dedup_index_size=args.dedup_index_size,
+            container=args.container,
+            shard_size=args.shard_size,
+            quality=args.quality,
+            preset=args.preset,
+            crop=args.crop,
+            max_edge=args.max_edge,
+            size=args.resize,
+            interpolation=args.interpolation,
+            grayscale=args.grayscale,
+            letterbox=args.letterbox,
+            segments=args.segments,
+            memory_budget=args.memory_budget,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if args.select and (args.dry_run or args.container != "files"):
+        parser.error("--select 不能与 --dry-run 或打包输出（--container）同时使用")
+    if args.watch and (args.dry_run or args.select or args.segments > 1):
+        parser.error("--watch 不能与 --dry-run、--select 或 --segments 同时使用")
+    if args.shared and (args.dry_run or args.select or args.watch):
+        parser.error("--shared 不能与 --dry-run、--select 或 --watch 同时使用")
+    if args.lease_timeout <= 0:
+        parser.error("--lease-timeout 必须大于0")
+    reporter = CliReporter(log_level=log_level, progress=args.progress)
+    if args.dry_run:
+        return dry_run(args, options, reporter)
+
+    if not module_available("cv2"):
+        sys.stderr.write("缺少OpenCV，请先运行: pip install opencv-python\n")
+        return 2
+    stop = threading.Event()
+
+    def handle_interrupt(signum, frame):
+        # 第一次Ctrl+C协作停止，正在处理的视频在下一帧退出；再次按下则立即退出
+        if stop.is_set():
+            raise KeyboardInterrupt
+        stop.set()
+        reporter.log("收到中断信号，正在停止...（再次按Ctrl+C强制退出）", logging.WARNING)
+
+    signal.signal(signal.SIGINT, handle_interrupt)
+    if args.watch:
+        return watch(args, options, reporter, stop, log_level)
+    if args.select:
+        try:
+            batch = run_selection(args.select, args.input, args.output, options, reporter,
+                                  should_continue=lambda: not stop.is_set(), log_level=log_level,
+                                  stats_file=args.stats_file, summary_path=args.selection_summary)
+        except (OSError, ValueError) as e:
+            reporter.log(f"无法读取选择列表: {str(e)}", logging.ERROR)
+            return 1
+    elif args.shared:
+        batch = run_shared_batch(args.input, args.output, options, reporter,
+                                 should_continue=lambda: not stop.is_set(), log_level=log_level,
+                                 stats_file=args.stats_file, node=args.node_id, lease_timeout=args.lease_timeout,
+                                 heartbeat_interval=min(DEFAULT_HEARTBEAT_INTERVAL, args.lease_timeout / 4))
+    else:
+        batch = run_batch(args.input, args.output, options, reporter,
+                          should_continue=lambda: not stop.is_set(), log_level=log_level,
+                          stats_file=args.stats_file, probe=not args.no_probe, probe_cache=args.probe_cache)
+
+    if args.progress == "text":
+        sys.stderr.write("\n")
+    summary = batch.as_dict()
+    reporter.emit("summary", **{key: value for key, value in summary.items() if key != "videos"})
+    reporter.log(f"处理完成，共提取 {batch.extracted_frames} 帧，失败 {len(batch.failed)} 个视频")
+    if batch.extracted_frames:
+        reporter.log(f"写出 {batch.bytes_written / 1024 / 1024:.1f} MB，平均每帧 {summary['bytes_per_frame'] / 1024:.1f} KB，"
+                     f"编码 {summary['encode_ms_per_frame']:.1f} ms/帧")
+        reporter.log(batch.metrics.summary_text())
+    if batch.memory is not None:
+        memory = batch.memory
+        reporter.log(f"在途帧内存上限 {memory['limit_bytes'] / 1024 / 1024:.0f} MB，"
+                     f"峰值 {memory['peak_bytes'] / 1024 / 1024:.1f} MB，"
+                     f"解码等待预算 {memory['waits']} 次，共 {memory['wait_s']:.2f} 秒")
+    if args.select:
+        reporter.log(f"选择列表共 {summary['requested']} 项，提取 {batch.extracted_frames} 个文件，"
+                     f"已存在 {summary['existing']} 个，无法提取 {summary['problems']} 项，详见 "
+                     f"{args.selection_summary or Path(args.output) / SELECTION_SUMMARY_NAME}",
+                     logging.WARNING if summary["problems"] else logging.INFO)
+    elif options.dedup is not None:
+        reporter.log(f"去重跳过 {summary['duplicate_frames']} 帧，约节省 {summary['duplicate_bytes_saved'] / 1024 / 1024:.1f} MB")
+    if args.metrics_report:
+        try:
+            write_report(args.metrics_report, batch)
+            reporter.log(f"统计报告已写入 {args.metrics_report}")
+        except OSError as e:
+            reporter.log(f"无法写入统计报告: {str(e)}", logging.ERROR)
+    if stop.is_set():
+        return 130
+    return 1 if batch.failed or batch.stopped else 0
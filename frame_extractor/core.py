@@ -0,0 +1,1070 @@
+"""不依赖界面的提取核心：扫描视频、逐个或并行提取、汇总结果"""
+import logging
+import math
+import multiprocessing
+import queue
+import signal
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from functools import partial
+from pathlib import Path
+
+from .budget import BufferPool, MemoryBudget
+from .dedup import (DEDUP_SCOPES, DEFAULT_HASH_DISTANCE, DEFAULT_INDEX_SIZE, HASH_METHODS, FrameDeduplicator,
+                    dedup_sampler)
+from .discovery import PROBE_CACHE_NAME, VIDEO_EXTENSIONS, discover_videos, format_duration, iter_video_entries
+from .lazy import cv2
+from .manifest import FINGERPRINT_MODES, VideoManifest, extraction_settings, source_fingerprint
+from .metrics import LiveStats, RunMetrics
+from .pipeline import DEFAULT_ENCODE_WORKERS, DEFAULT_QUEUE_DEPTH, iter_encoded_frames
+from .sampling import DEFAULT_SCENE_THRESHOLD, SAMPLING_MODES, build_sampler
+from .shards import CONTAINERS, frame_file_name, open_sink
+from .transforms import FrameTransform, transform_sampler
+from .writer import ENCODE_PRESETS, OUTPUT_FORMATS, check_quality, encode_frame, format_extension, get_short_path_name
+
+# 连续保存失败达到该次数时按错误策略处理
+MAX_SAVE_ERRORS = 5
+
+# 连续保存失败时的处理方式：跳过当前视频 / 忽略错误继续 / 停止整个批次
+ERROR_POLICIES = ("skip", "continue", "abort")
+
+# 子进程回报进度的最小间隔（秒）
+PROGRESS_UPDATE_INTERVAL = 0.2
+
+# 分段并行时每段至少包含的帧数，较短的视频使用较少的分段（每段都要启动进程、打开视频并定位）
+MIN_SEGMENT_FRAMES = 300
+
+
+class ExtractionOptions:
+    """一次提取任务的设置，需要能被pickle以传给子进程"""
+
+    def __init__(self, interval=1, output_format="png", workers=1,
+                 encode_workers=DEFAULT_ENCODE_WORKERS, queue_depth=DEFAULT_QUEUE_DEPTH,
+                 error_policy="skip", resume=False, fingerprint="stat", sampling_mode="frames",
+                 seconds=1.0, scene_threshold=DEFAULT_SCENE_THRESHOLD, dedup=None, dedup_hash="dhash",
+                 dedup_distance=DEFAULT_HASH_DISTANCE, dedup_index_size=DEFAULT_INDEX_SIZE, container="files",
+                 shard_size=0, quality=None, preset=None, crop=None, max_edge=None, size=None,
+                 interpolation="area", grayscale=False, letterbox=False, segments=1, memory_budget=0):
+        if preset is not None:
+            if preset not in ENCODE_PRESETS:
+                raise ValueError(f"不支持的编码预设: {preset}")
+            output_format, quality = ENCODE_PRESETS[preset]
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        check_quality(output_format, quality)
+        if error_policy not in ERROR_POLICIES:
+            raise ValueError(f"不支持的错误处理策略: {error_policy}")
+        if fingerprint not in FINGERPRINT_MODES:
+            raise ValueError(f"不支持的指纹方式: {fingerprint}")
+        if sampling_mode not in SAMPLING_MODES:
+            raise ValueError(f"不支持的采样方式: {sampling_mode}")
+        if float(seconds) <= 0:
+            raise ValueError(f"时间间隔必须大于0: {seconds}")
+        if not 0 <= float(scene_threshold) <= 1:
+            raise ValueError(f"场景变化阈值必须在0到1之间: {scene_threshold}")
+        if dedup is not None and dedup not in DEDUP_SCOPES:
+            raise ValueError(f"不支持的去重范围: {dedup}")
+        if dedup_hash not in HASH_METHODS:
+            raise ValueError(f"不支持的哈希方式: {dedup_hash}")
+        if container not in CONTAINERS:
+            raise ValueError(f"不支持的输出方式: {container}")
+        if int(segments) > 1:
+            # 分段之间相互独立，只支持不依赖之前保留帧的采样方式
+            if sampling_mode == "scene" or dedup is not None:
+                raise ValueError("场景变化采样和去重依赖之前保留的帧，不能分段并行")
+            if container != "files":
+                raise ValueError("分段并行只支持每帧一个文件的输出方式")
+            if int(workers) > 1:
+                raise ValueError("分段并行不能与多进程处理多个视频同时使用")
+        self.interval = max(1, int(interval))
+        self.output_format = output_format
+        self.quality = quality              # PNG压缩级别或JPG/WebP质量，None使用格式默认值
+        self.workers = max(1, int(workers))
+        self.encode_workers = max(1, int(encode_workers))
+        self.queue_depth = max(1, int(queue_depth))
+        self.error_policy = error_policy
+        self.resume = resume                # 跳过未变化且已完成的视频，未完成的从上次的位置继续
+        self.fingerprint = fingerprint
+        self.sampling_mode = sampling_mode  # frames 每隔interval帧 / seconds 每隔seconds秒 / scene 画面变化时
+        self.seconds = float(seconds)
+        self.scene_threshold = float(scene_threshold)
+        self.dedup = dedup                  # None 不去重 / video 每个视频内去重 / batch 整个批次共享索引
+        self.dedup_hash = dedup_hash
+        self.dedup_distance = max(0, int(dedup_distance))
+        self.dedup_index_size = max(1, int(dedup_index_size))
+        self.container = container          # files 每帧一个文件 / tar、zip 打包分片 / npy 原始帧数组
+        self.shard_size = max(0, int(shard_size))  # 每个分片的帧数，0表示每个视频一个分片（npy为1000帧）
+        # 编码前的帧变换，参数含义见transforms.FrameTransform
+        self.crop = crop
+        self.max_edge = max_edge
+        self.size = size
+        self.interpolation = interpolation
+        self.grayscale = grayscale
+        self.letterbox = letterbox
+        self.segments = max(1, int(segments))  # 大于1时每个视频分为多段，由多个进程并行提取
+        self.memory_budget = max(0, int(memory_budget))  # 所有进程中在途帧的总字节数上限，0表示不限制
+        self.make_transform()  # 尽早检查变换参数
+
+    def make_transform(self):
+        if self.crop is None and self.max_edge is None and self.size is None and not (self.grayscale or self.letterbox):
+            return None
+        return FrameTransform(self.crop, self.max_edge, self.size, self.interpolation, self.grayscale, self.letterbox)
+
+    def make_memory_budget(self):
+        if not self.memory_budget:
+            return None
+        return MemoryBudget(self.memory_budget)
+
+    def make_deduplicator(self):
+        if self.dedup is None:
+            return None
+        return FrameDeduplicator(self.dedup_hash, self.dedup_distance, self.dedup_index_size)
+
+    def expected_frames(self, total_frames, fps):
+        """预计提取的帧数，无法预计时返回None"""
+        if total_frames <= 0:
+            return 0
+        if self.sampling_mode == "frames":
+            return -(-total_frames // self.interval)
+        if self.sampling_mode == "seconds" and fps > 0:
+            return math.ceil(total_frames / (self.seconds * fps))
+        return None
+
+
+class VideoResult:
+    """单个视频的处理结果
+
+    status取值: done 完成 / unchanged 续传时视频未变化且已完成 / stopped 被停止 /
+    skipped 跳过 / failed 出错 / aborted 按错误策略停止批次 / leased 正由其他节点处理（见lease.py）
+    """
+
+    def __init__(self, video_path, output_dir, saved=0, status="done", error=None):
+        self.video_path = Path(video_path)
+        self.output_dir = Path(output_dir)
+        self.saved = saved
+        self.status = status
+        self.error = error
+        self.bytes_written = 0
+        self.encode_seconds = 0.0  # 各编码线程累计的编码耗时
+        self.duplicates = 0  # 被去重跳过的帧数
+        self.metrics = RunMetrics()  # 各阶段耗时，见metrics.RunMetrics
+        self.frame_shape = None  # 第一个写出帧的尺寸
+
+    @property
+    def duplicate_bytes_saved(self):
+        """按本视频已写出帧的平均大小估算去重节省的字节数"""
+        if not self.saved:
+            return 0
+        return int(self.duplicates * self.bytes_written / self.saved)
+
+    def as_dict(self):
+        return {
+            "video": str(self.video_path),
+            "output_dir": str(self.output_dir),
+            "saved": self.saved,
+            "status": self.status,
+            "error": self.error,
+            "bytes_written": self.bytes_written,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "duplicates": self.duplicates,
+            "duplicate_bytes_saved": self.duplicate_bytes_saved,
+            "errors": self.metrics.errors,
+            "frames_per_s": round(self.metrics.frames_per_s, 2),
+        }
+
+
+class BatchResult:
+    """一批视频的处理结果"""
+
+    def __init__(self, total_videos):
+        self.total_videos = total_videos
+        self.results = []
+        self.stopped = False
+        self.elapsed = 0.0  # 整个批次的耗时（秒）
+        self.memory = None  # 设置了内存预算时为MemoryBudget.as_dict()
+
+    @property
+    def extracted_frames(self):
+        return sum(result.saved for result in self.results)
+
+    @property
+    def bytes_written(self):
+        return sum(result.bytes_written for result in self.results)
+
+    @property
+    def encode_ms_per_frame(self):
+        if not self.extracted_frames:
+            return 0.0
+        return sum(result.encode_seconds for result in self.results) * 1000 / self.extracted_frames
+
+    @property
+    def metrics(self):
+        """合并所有视频的统计，速度按整个批次的耗时计算"""
+        metrics = RunMetrics()
+        for result in self.results:
+            metrics.merge(result.metrics)
+        metrics.elapsed = self.elapsed
+        return metrics
+
+    @property
+    def failed(self):
+        return [result for result in self.results if result.status in ("failed", "aborted")]
+
+    def as_dict(self):
+        return {
+            "total_videos": self.total_videos,
+            "processed_videos": len(self.results),
+            "extracted_frames": self.extracted_frames,
+            "failed_videos": len(self.failed),
+            "unchanged_videos": sum(1 for result in self.results if result.status == "unchanged"),
+            "bytes_written": self.bytes_written,
+            "bytes_per_frame": int(self.bytes_written / self.extracted_frames) if self.extracted_frames else 0,
+            "encode_ms_per_frame": round(self.encode_ms_per_frame, 2),
+            "duplicate_frames": sum(result.duplicates for result in self.results),
+            "duplicate_bytes_saved": sum(result.duplicate_bytes_saved for result in self.results),
+            "elapsed_s": round(self.elapsed, 3),
+            "stopped": self.stopped,
+            "memory_budget": self.memory,
+            "videos": [result.as_dict() for result in self.results],
+        }
+
+
+class Reporter:
+    """提取过程的回调接口，默认实现什么都不做
+
+    界面和命令行各自继承并实现需要的方法。ask_continue为None时
+    按ExtractionOptions.error_policy处理连续的保存错误。
+    """
+
+    ask_continue = None
+
+    def log(self, message, level=logging.INFO):
+        pass
+
+    def status(self, message):
+        pass
+
+    def notify(self, kind, title, message):
+        pass
+
+    def video_started(self, video_path, index, total):
+        pass
+
+    def video_progress(self, video_path, frame_index, total_frames):
+        pass
+
+    def video_finished(self, result):
+        pass
+
+    def batch_progress(self, finished, total):
+        """finished为已完成的视频数，包含正在处理视频的完成比例"""
+
+    def batch_estimate(self, fraction, remaining_seconds):
+        """按探测得到的工作量（帧数x分辨率）计算的总体完成比例，以及预计剩余秒数（尚无法估计时为None）"""
+
+
+def scan_videos(input_dir):
+    """递归查找输入目录中的视频文件"""
+    return [path for path, _ in iter_video_entries(input_dir)]
+
+
+def plan_jobs(input_dir, output_dir, video_files):
+    """为每个视频计算输出子目录，保持原始文件夹结构"""
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    jobs = []
+    for video_path in video_files:
+        video_path = Path(video_path)
+        rel_path = video_path.parent.relative_to(input_dir)
+        jobs.append((video_path, output_dir / rel_path / video_path.stem))
+    return jobs
+
+
+def plan_segments(start_frame, total_frames, segments, min_frames=MIN_SEGMENT_FRAMES):
+    """把[start_frame, total_frames)均分为至多segments段，返回[(起始帧, 结束帧)]
+
+    最后一段的结束帧为None，一直读到视频末尾，因此总帧数不准确时也不会漏帧。
+    """
+    remaining = total_frames - start_frame
+    count = max(1, min(int(segments), remaining // max(1, int(min_frames))))
+    starts = [start_frame + remaining * i // count for i in range(count)]
+    return list(zip(starts, starts[1:] + [None]))
+
+
+def extract_video_frames(video_path, output_dir, options, reporter=None, should_continue=None, deduplicator=None,
+                         log_level=logging.INFO, budget=None, fence=None):
+    """提取单个视频的帧，返回VideoResult
+
+    逐帧的日志只使用DEBUG级别；should_continue返回False时尽快停止。
+    deduplicator用于在多个视频之间共享去重索引，为None时按options为本视频新建。
+    options.segments大于1时把视频分段交给多个进程，log_level用于在这些进程内预先过滤日志。
+    budget为多个视频共享的内存预算（见budget.MemoryBudget），为None时按options为本视频新建。
+    fence不为None时在写出每帧、提交分片和保存清单之前调用，返回False表示已无权写入output_dir
+    （如多节点共享时租约已被收回），此时立即停止，已解码的帧也不再写出。
+    """
+    reporter = reporter or Reporter()
+    log = reporter.log
+    if fence is not None:
+        keep_going = should_continue
+
+        def should_continue():
+            return fence() and (keep_going is None or keep_going())
+    notify = reporter.notify
+    result = VideoResult(video_path, output_dir)
+    metrics = result.metrics
+    started = time.perf_counter()
+    try:
+        # 使用Path对象处理路径，增强对中文和特殊字符的支持
+        video_path = Path(video_path)
+        output_dir = Path(output_dir)
+        try:
+            # 每个视频只解析一次输出目录的绝对路径
+            output_dir = output_dir.resolve()
+        except OSError:
+            pass
+
+        video_name = video_path.name
+        log(f"开始处理视频: {video_path}")
+
+        # 确保输出目录存在
+        try:
+            if not output_dir.exists():
+                output_dir.mkdir(parents=True, exist_ok=True)
+                log(f"创建输出目录: {output_dir}")
+
+            # 检查目录写入权限
+            test_file_path = output_dir / "test_write_permission.tmp"
+            try:
+                with open(test_file_path, 'w', encoding='utf-8') as f:
+                    f.write("test")
+                if test_file_path.exists():
+                    test_file_path.unlink()
+            except Exception as perm_error:
+                log(f"警告: 输出目录可能没有写入权限: {str(perm_error)}", logging.WARNING)
+                notify("warning", "权限警告", f"输出目录可能没有写入权限，请选择其他目录或检查权限设置。\n{output_dir}")
+                result.status, result.error = "skipped", str(perm_error)
+                return result
+        except Exception as dir_error:
+            log(f"错误: 无法创建或访问输出目录: {str(dir_error)}", logging.ERROR)
+            notify("error", "目录错误", f"无法创建或访问输出目录，请检查路径是否包含特殊字符或权限设置。\n{output_dir}")
+            result.status, result.error = "failed", str(dir_error)
+            return result
+
+        # 读取提取清单，决定跳过、继续还是重新提取
+        source = source_fingerprint(video_path, options.fingerprint)
+        settings = extraction_settings(options)
+        start_frame = 0
+        manifest = VideoManifest.load(output_dir) if options.resume else None
+        if manifest is not None and manifest.matches(source, settings):
+            if manifest.completed:
+                log(f"视频未变化且已提取完成，跳过: {video_name}")
+                result.status = "unchanged"
+                return result
+            start_frame = manifest.last_frame + 1
+            log(f"从第 {start_frame} 帧继续提取，此前已保存 {manifest.saved} 帧")
+        else:
+            if manifest is not None:
+                log("源视频或提取设置已变化，重新提取", logging.WARNING)
+            manifest = VideoManifest(output_dir, source, settings)
+        manifest.fence = fence
+
+        # 打开视频文件
+        # 将Path对象转换为字符串，确保cv2.VideoCapture能正确处理中文和特殊字符路径
+        video_path_str = str(video_path.resolve())
+        log(f"尝试打开视频文件: {video_path_str}")
+
+        # 对于包含特殊字符的路径，尝试使用绝对路径打开
+        opened_path = video_path_str
+        cap = cv2.VideoCapture(video_path_str)
+        if not cap.isOpened():
+            log(f"无法打开视频: {video_path}，尝试其他方法...", logging.WARNING)
+
+            # 在Windows系统上，尝试使用短路径名
+            short_path = get_short_path_name(video_path_str)
+            if short_path:
+                log(f"尝试使用短路径名打开: {short_path}")
+                opened_path = short_path
+                cap = cv2.VideoCapture(short_path)
+
+            # 如果仍然无法打开，返回错误
+            if not cap.isOpened():
+                log(f"所有尝试都失败，无法打开视频: {video_path}", logging.ERROR)
+                result.status, result.error = "failed", "无法打开视频"
+                return result
+
+        # 获取视频信息
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+
+        log(f"视频信息: 总帧数={total_frames}, FPS={fps:.2f}")
+        reporter.video_progress(video_path, start_frame, total_frames)
+        manifest.total_frames = total_frames
+        manifest.completed = False
+        manifest.save()
+
+        # 提取帧
+        deduplicator = deduplicator or options.make_deduplicator()
+        budget = budget or options.make_memory_budget()
+        if deduplicator is not None:
+            duplicates_before = deduplicator.duplicates
+        segments = [(start_frame, None)]
+        if options.segments > 1:
+            if options.sampling_mode == "seconds" and fps <= 0:
+                log("视频FPS未知，无法按时间点分段，改为顺序提取", logging.WARNING)
+            else:
+                segments = plan_segments(start_frame, total_frames, options.segments)
+        if len(segments) > 1:
+            # 各分段进程自行打开视频，父进程只汇总结果
+            cap.release()
+            log(f"分为 {len(segments)} 段并行提取，各段起始帧: {', '.join(str(start) for start, _ in segments)}")
+            _extract_segments(opened_path, output_dir, options, segments, fps, total_frames, manifest, result,
+                              reporter, should_continue, log_level, budget)
+        else:
+            # 写出即提交的帧才记入清单；打包输出在分片完成时提交
+            sink = open_sink(options.container, output_dir, format_extension(options.output_format),
+                             options.shard_size, on_commit=manifest.record, resume=start_frame > 0)
+            buffers = BufferPool()
+            sampler = frame_sampler(options, fps, start_frame, deduplicator=deduplicator, buffers=buffers)
+            _write_frames(cap, sampler, sink, output_dir, options, result, reporter, should_continue,
+                          video_path, total_frames, start_frame, manifest, budget, buffers)
+            cap.release()
+        if result.status == "done" and should_continue is not None and not should_continue():
+            result.status = "stopped"
+        reporter.video_progress(video_path, total_frames, total_frames)
+
+        # 根据清单检查保存结果，无需再列出输出目录
+        manifest.completed = result.status == "done"
+        manifest.save()
+        expected = options.expected_frames(total_frames, fps)
+        expected_text = f"（预期约 {expected} 帧）" if expected is not None else ""
+        log(f"视频 {video_name} 处理完成，本次提取 {result.saved} 帧，清单记录共 {manifest.saved} 帧{expected_text}")
+        if result.saved:
+            log(f"写出 {result.bytes_written / 1024 / 1024:.1f} MB，平均每帧 {result.bytes_written / result.saved / 1024:.1f} KB，"
+                f"编码 {result.encode_seconds * 1000 / result.saved:.1f} ms/帧")
+        if deduplicator is not None:
+            result.duplicates = deduplicator.duplicates - duplicates_before
+            log(f"跳过 {result.duplicates} 个重复帧，约节省 {result.duplicate_bytes_saved / 1024 / 1024:.1f} MB")
+        # 被去重跳过的帧不算保存失败
+        if manifest.completed and manifest.saved == 0 and expected and expected > result.duplicates:
+            log(f"警告: 没有帧被保存到 {output_dir}，请检查权限或磁盘空间", logging.WARNING)
+            notify("warning", "警告", f"预期保存约 {expected} 帧，但实际没有保存任何帧。\n请检查输出目录的权限或磁盘空间。")
+
+    except Exception as e:
+        log(f"处理视频 {Path(video_path).name} 时出错: {str(e)}", logging.ERROR)
+        log(f"错误详情: {traceback.format_exc()}", logging.ERROR)
+        notify("error", "处理错误", f"处理视频时出错: {str(e)}")
+        result.status, result.error = "failed", str(e)
+
+    metrics.frames = result.saved
+    metrics.bytes_written = result.bytes_written
+    metrics.elapsed = time.perf_counter() - started
+    return result
+
+
+def frame_sampler(options, fps, start_frame, end_frame=None, deduplicator=None, buffers=None):
+    """按选项组合sampler：采样 -> 变换 -> 去重，都在解码线程中执行，之后才交给编码线程
+
+    只解码需要保留的帧，跳过的帧通过grab或定位推进。写出文件和流式接口（stream.py）共用。
+    buffers不为None时帧解码到该缓冲池的数组中，被丢弃的帧立即归还；保留的帧由写出循环归还，
+    因此不能用于把帧交给调用方的场合。
+    """
+    sampler = build_sampler(options.sampling_mode, options.interval, options.seconds, options.scene_threshold,
+                            fps=fps, start_frame=start_frame, end_frame=end_frame, buffers=buffers)
+    transform = options.make_transform()
+    if transform is not None:
+        sampler = transform_sampler(sampler, transform, buffers)
+    if deduplicator is not None:
+        sampler = dedup_sampler(sampler, deduplicator, buffers)
+    return sampler
+
+
+def _write_frames(cap, sampler, sink, output_dir, options, result, reporter, should_continue, video_path,
+                  total_frames, start_frame, manifest=None, budget=None, buffers=None):
+    """解码、编码并写出sampler产出的帧，结果累加到result；编码在线程池中与解码并行进行
+
+    在途帧计入budget，写出后的帧归还到buffers（sampler使用的同一个缓冲池）。
+    """
+    log = reporter.log
+    metrics = result.metrics
+    extension = format_extension(options.output_format)
+    error_count = 0  # 记录连续错误次数
+    if options.container == "npy":
+        encode = raw_frame  # 原始帧直接写入数组，不需要编码
+    else:
+        encode = partial(encode_frame, output_format=options.output_format, quality=options.quality)
+    encode_times = []
+
+    def timed_encode(frame):
+        start = time.perf_counter()
+        try:
+            return encode(frame)
+        finally:
+            encode_times.append(time.perf_counter() - start)
+
+    last_progress_frame = start_frame
+    frames = iter_encoded_frames(cap, options.interval, timed_encode, encode_workers=options.encode_workers,
+                                 queue_depth=options.queue_depth, should_continue=should_continue, sampler=sampler,
+                                 metrics=metrics, budget=budget, buffers=buffers)
+    while True:
+        # 写出线程等待下一帧解码和编码完成的时间
+        wait_start = time.perf_counter()
+        item = next(frames, None)
+        metrics.observe("wait", time.perf_counter() - wait_start)
+        if item is None:
+            break
+        frame_count, frame, encoded = item
+        if should_continue is not None and not should_continue():
+            # 停止后已解码、编码的帧也不再写出
+            break
+        try:
+            # 处理文件名，使用Path对象处理路径
+            output_path = output_dir / frame_file_name(frame_count, extension)
+
+            # 逐帧输出时直接写入目标目录中的临时文件再原子重命名，Python的文件接口可以正确处理中文路径
+            if encoded is not None:
+                if result.frame_shape is None:
+                    # raw格式的文件中没有尺寸信息，记录变换后的帧尺寸
+                    result.frame_shape = list(frame.shape)
+                    if manifest is not None:
+                        manifest.frame_shape = result.frame_shape
+                write_start = time.perf_counter()
+                result.bytes_written += sink.write(frame_count, frame, encoded)
+                metrics.observe("write", time.perf_counter() - write_start)
+                result.saved += 1
+                error_count = 0  # 重置错误计数
+                log(f"已保存图片: {output_path}", logging.DEBUG)
+            else:
+                # 编码失败与写出失败一样交给下面的JPG回退
+                raise ValueError(f"无法编码图片: {output_path}")
+        except Exception as save_error:
+            log(f"保存帧时出错: {str(save_error)}", logging.ERROR)
+            metrics.errors += 1
+            error_count += 1
+
+            # 尝试使用不同的格式保存
+            if error_count <= MAX_SAVE_ERRORS and options.output_format != "jpg" and options.container != "npy":
+                try:
+                    jpg_path = output_dir / frame_file_name(frame_count, ".jpg")
+                    jpg_data = encode_frame(frame, "jpg")
+                    if jpg_data is not None:
+                        result.bytes_written += sink.write(frame_count, frame, jpg_data, ".jpg")
+                        log(f"成功使用JPG格式保存: {jpg_path}", logging.WARNING)
+                        result.saved += 1
+                        error_count = 0
+                except Exception as jpg_error:
+                    log(f"尝试JPG格式保存也失败: {str(jpg_error)}", logging.ERROR)
+
+        # 如果连续错误次数过多，询问用户或按错误策略处理
+        if error_count >= MAX_SAVE_ERRORS:
+            log(f"连续出现{MAX_SAVE_ERRORS}次保存错误，可能是路径问题或磁盘空间不足", logging.WARNING)
+            if reporter.ask_continue is not None:
+                keep_going = reporter.ask_continue("错误", f"连续出现{MAX_SAVE_ERRORS}次保存错误，是否继续处理？\n\n可能的原因:\n- 输出路径包含特殊字符\n- 磁盘空间不足\n- 没有写入权限")
+                policy = "continue" if keep_going else "skip"
+            else:
+                policy = options.error_policy
+
+            if policy == "continue":
+                error_count = 0  # 重置错误计数
+            else:
+                log("中断该视频的处理" if policy == "skip" else "按错误策略停止整个批次", logging.WARNING)
+                result.status = "skipped" if policy == "skip" else "aborted"
+                result.error = f"连续出现{MAX_SAVE_ERRORS}次保存错误"
+                break
+
+        if total_frames > 0 and frame_count - last_progress_frame >= 10:  # 至少每10帧更新一次进度，减少UI更新频率
+            last_progress_frame = frame_count
+            reporter.video_progress(video_path, frame_count, total_frames)
+
+    frames.close()
+    if manifest is None or manifest.fence is None or manifest.fence():
+        sink.close()  # 无权写入时不提交未写满的分片，留下的临时文件由下一个处理者覆盖
+    result.encode_seconds += sum(encode_times)
+    for seconds in encode_times:
+        metrics.observe("encode", seconds)
+    if buffers is not None:
+        log(f"帧缓冲区: 新分配 {buffers.allocated} 次，复用 {buffers.reused} 次", logging.DEBUG)
+
+
+def raw_frame(frame):
+    """不编码，原样返回帧；用于npy输出和流式接口"""
+    return frame
+
+
+class ProgressTracker(Reporter):
+    """包装调用方的Reporter，根据各视频进度计算总体进度，并定期更新统计文件"""
+
+    def __init__(self, reporter, total_videos, stats_file=None, works=None, budget=None):
+        self.reporter = reporter
+        self.ask_continue = reporter.ask_continue
+        self.total_videos = total_videos
+        self.finished = 0
+        self.running = {}  # 正在处理的视频 -> 已完成比例；不在其中的视频的进度事件（结束后才到达）被忽略
+        self.works = works or {}  # 视频 -> 估计的工作量，见discovery.estimate_work
+        self.total_work = sum(self.works.values())
+        self.finished_work = 0
+        self.stats = LiveStats(stats_file) if stats_file else None
+        self.budget = budget
+        self.metrics = RunMetrics()  # 已完成视频的合并统计
+        self.started = time.perf_counter()
+
+    def update_stats(self, force=False):
+        if self.stats is None:
+            return
+        self.metrics.elapsed = time.perf_counter() - self.started
+        gauges = {
+            "videos_total": self.total_videos,
+            "videos_finished": self.finished,
+            "videos_running": len(self.running),
+            "batch_progress": round((self.finished + sum(self.running.values())) / max(1, self.total_videos), 4),
+            "work_total_pixels": self.total_work,
+            "work_finished_pixels": self.finished_work,
+            "elapsed_seconds": round(self.metrics.elapsed, 3),
+            "frames_per_second": round(self.metrics.frames_per_s, 2),
+        }
+        if self.budget is not None:
+            gauges.update(self.budget.gauges())
+        try:
+            self.stats.update(self.metrics, gauges, force)
+        except OSError as e:
+            self.reporter.log(f"无法写入统计文件: {str(e)}", logging.WARNING)
+
+    def log(self, message, level=logging.INFO):
+        self.reporter.log(message, level)
+
+    def status(self, message):
+        self.reporter.status(message)
+
+    def notify(self, kind, title, message):
+        self.reporter.notify(kind, title, message)
+
+    def video_started(self, video_path, index, total):
+        self.running[str(video_path)] = 0.0
+        self.reporter.video_started(video_path, index, total)
+
+    def video_progress(self, video_path, frame_index, total_frames):
+        if total_frames > 0 and str(video_path) in self.running:
+            self.running[str(video_path)] = min(frame_index / total_frames, 1.0)
+        self.reporter.video_progress(video_path, frame_index, total_frames)
+        self.report_batch()
+        self.update_stats()
+
+    def video_finished(self, result):
+        self.running.pop(str(result.video_path), None)
+        self.finished += 1
+        work = self.works.get(str(result.video_path), 0)
+        if result.status == "unchanged":
+            self.total_work -= work  # 未变化的视频几乎不耗时，不计入速度
+        else:
+            self.finished_work += work
+        self.metrics.merge(result.metrics)
+        self.reporter.video_finished(result)
+        self.report_batch()
+        self.update_stats()
+
+    def report_batch(self):
+        self.reporter.batch_progress(self.finished + sum(self.running.values()), self.total_videos)
+        if self.total_work <= 0:
+            return
+        done = self.finished_work + sum(fraction * self.works.get(video, 0) for video, fraction in self.running.items())
+        done = min(done, self.total_work)
+        elapsed = time.perf_counter() - self.started
+        remaining = elapsed * (self.total_work - done) / done if done > 0 else None
+        self.reporter.batch_estimate(done / self.total_work, remaining)
+
+
+class _QueueReporter(Reporter):
+    """子进程中使用的Reporter，把回调转发到父进程的事件队列"""
+
+    def __init__(self, events, log_level, video_name):
+        self.events = events
+        self.log_level = log_level
+        self.prefix = f"[{video_name}] "
+        self.last_progress = 0.0
+
+    def log(self, message, level=logging.INFO):
+        # 在子进程内先按级别过滤，减少跨进程传递的消息
+        if level >= self.log_level:
+            self.events.put(("log", (self.prefix + message, level)))
+
+    def notify(self, kind, title, message):
+        self.events.put(("notify", (kind, self.prefix + title, message)))
+
+    def video_progress(self, video_path, frame_index, total_frames):
+        now = time.monotonic()
+        if now - self.last_progress >= PROGRESS_UPDATE_INTERVAL or frame_index >= total_frames:
+            self.last_progress = now
+            self.events.put(("video_progress", (str(video_path), frame_index, total_frames)))
+
+
+class _SegmentReporter(_QueueReporter):
+    """分段进程中使用的Reporter，进度按分段回报，由父进程合并为整个视频的进度"""
+
+    def __init__(self, events, log_level, video_name, segment_index):
+        super().__init__(events, log_level, f"{video_name}#{segment_index + 1}")
+        self.segment_index = segment_index
+
+    def video_progress(self, video_path, frame_index, total_frames):
+        now = time.monotonic()
+        if now - self.last_progress >= PROGRESS_UPDATE_INTERVAL:
+            self.last_progress = now
+            self.events.put(("segment_progress", (self.segment_index, frame_index)))
+
+
+# 并行模式下由进程池初始化函数注入的事件队列和停止标志
+_worker_events = None
+_worker_stop = None
+_worker_budget = None  # 所有子进程共享的内存预算
+_worker_deduplicator = None  # 去重范围为batch时，同一进程处理的视频共享去重索引
+
+
+def _init_worker(events, stop_event, budget=None):
+    global _worker_events, _worker_stop, _worker_budget
+    # 中断信号由父进程处理，再通过停止标志通知子进程
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _worker_events = events
+    _worker_stop = stop_event
+    _worker_budget = budget
+
+
+def _extract_video_worker(video_path, output_dir, options, log_level):
+    """子进程入口：每个进程自行打开VideoCapture，通过事件队列回报日志和进度"""
+    global _worker_deduplicator
+    reporter = _QueueReporter(_worker_events, log_level, Path(video_path).name)
+    if options.dedup == "batch" and _worker_deduplicator is None:
+        _worker_deduplicator = options.make_deduplicator()
+    deduplicator = _worker_deduplicator if options.dedup == "batch" else None
+    return extract_video_frames(video_path, output_dir, options, reporter,
+                                should_continue=lambda: not _worker_stop.is_set(), deduplicator=deduplicator,
+                                budget=_worker_budget)
+
+
+def _run_job_worker(extract, video_path, output_dir, options, log_level, *job_args):
+    """run_jobs的子进程入口：为extract提供转发到主进程的reporter、停止标志和共享的内存预算"""
+    reporter = _QueueReporter(_worker_events, log_level, Path(video_path).name)
+    return extract(video_path, output_dir, options, log_level, *job_args, reporter=reporter,
+                   should_continue=lambda: not _worker_stop.is_set(), budget=_worker_budget)
+
+
+def _extract_segment_worker(video_path, output_dir, options, segment_index, segment, fps, total_frames, log_level):
+    """子进程入口：提取视频的一段，只写出帧，不修改提取清单
+
+    每个分段自行打开VideoCapture，按帧位置定位到分段起点（后端从之前的关键帧解码到该帧，
+    定位不准确时回退为逐帧grab），因此各段的帧序号和文件名与顺序提取完全相同。
+    """
+    start_frame, end_frame = segment
+    reporter = _SegmentReporter(_worker_events, log_level, Path(video_path).name, segment_index)
+    result = VideoResult(video_path, output_dir)
+    started = time.perf_counter()
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        result.status, result.error = "failed", "无法打开视频"
+        return result
+    try:
+        sink = open_sink(options.container, output_dir, format_extension(options.output_format))
+        buffers = BufferPool()
+        sampler = frame_sampler(options, fps, start_frame, end_frame, buffers=buffers)
+        _write_frames(cap, sampler, sink, Path(output_dir), options, result, reporter,
+                      lambda: not _worker_stop.is_set(), video_path, total_frames, start_frame, budget=_worker_budget,
+                      buffers=buffers)
+    finally:
+        cap.release()
+    if result.status == "done" and _worker_stop.is_set():
+        result.status = "stopped"
+    result.metrics.frames = result.saved
+    result.metrics.bytes_written = result.bytes_written
+    result.metrics.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_batch(input_dir, output_dir, options, reporter=None, should_continue=None, log_level=logging.INFO,
+              stats_file=None, probe=True, probe_cache=None):
+    """扫描输入目录并提取所有视频的帧，返回BatchResult
+
+    options.workers大于1时把视频分发到进程池并行处理。
+    log_level用于在子进程内预先过滤日志。
+    stats_file不为None时定期把统计以Prometheus文本格式写入该文件。
+    probe为True时先并行探测各视频的帧数和分辨率（结果缓存在probe_cache，默认为输出目录中的
+    PROBE_CACHE_NAME），据此按工作量从大到小分发给进程池，并报告按工作量计算的进度和剩余时间。
+    """
+    started = time.perf_counter()
+    reporter = reporter or Reporter()
+    should_continue = should_continue or (lambda: True)
+
+    reporter.status("正在扫描视频文件...")
+    reporter.log("开始扫描视频文件...")
+    works = None
+    if probe:
+        infos = discover_videos(input_dir, probe_cache or Path(output_dir) / PROBE_CACHE_NAME, log=reporter.log,
+                                should_continue=should_continue)
+        video_files = [info.path for info in infos]
+        works = {str(info.path): info.work for info in infos}
+        reporter.log(f"找到 {len(video_files)} 个视频文件，总时长约 {format_duration(sum(info.duration for info in infos))}，"
+                     f"共约 {sum(info.frames for info in infos)} 帧")
+    else:
+        video_files = scan_videos(input_dir)
+        reporter.log(f"找到 {len(video_files)} 个视频文件")
+
+    batch = BatchResult(len(video_files))
+    jobs = plan_jobs(input_dir, output_dir, video_files)
+    # 内存预算由所有进程共享，整个批次只创建一个
+    budget = options.make_memory_budget()
+    tracker = ProgressTracker(reporter, len(jobs), stats_file, works, budget)
+    if not jobs:
+        reporter.status("未找到视频文件")
+        return batch
+
+    workers = min(options.workers, len(jobs))
+    if workers > 1:
+        if works:
+            # 最大的视频最先开始，避免批次末尾只剩一个很长的视频在运行
+            jobs.sort(key=lambda job: works.get(str(job[0]), 0), reverse=True)
+        _run_parallel(jobs, options, tracker, batch, should_continue, workers, log_level, budget)
+    else:
+        deduplicator = options.make_deduplicator() if options.dedup == "batch" else None
+        # 处理每个视频
+        for index, (video_path, output_subdir) in enumerate(jobs):
+            if not should_continue():
+                break
+            reporter.status(f"正在处理: {video_path.name}")
+            tracker.video_started(video_path, index, len(jobs))
+            result = extract_video_frames(video_path, output_subdir, options, tracker, should_continue, deduplicator,
+                                          log_level, budget)
+            batch.results.append(result)
+            tracker.video_finished(result)
+            if result.status == "aborted":
+                break
+
+    batch.stopped = not should_continue() or any(result.status == "aborted" for result in batch.results)
+    batch.elapsed = time.perf_counter() - started
+    if budget is not None:
+        batch.memory = budget.as_dict()
+    tracker.update_stats(force=True)
+    return batch
+
+
+def _run_parallel(jobs, options, tracker, batch, should_continue, workers, log_level, budget=None, worker=None):
+    """把视频分发到进程池，汇总各进程回报的进度和结果
+
+    jobs为[(视频路径, 输出子目录, *附加参数)]，worker(视频, 输出子目录, options, log_level, *附加参数)
+    在子进程中处理一个视频，默认为_extract_video_worker。
+    """
+    worker = worker or _extract_video_worker
+    # 使用spawn避免在带有界面线程的进程中fork
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    stop_event = context.Event()
+
+    tracker.status(f"正在使用 {workers} 个进程并行处理...")
+    tracker.log(f"使用 {workers} 个进程并行处理 {len(jobs)} 个视频")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(events, stop_event, budget)) as executor:
+        futures = {}
+        for index, (video_path, output_subdir, *job_args) in enumerate(jobs):
+            future = executor.submit(worker, str(video_path), str(output_subdir), options, log_level, *job_args)
+            futures[future] = (index, video_path, output_subdir)
+        pending = set(futures)
+        started = set()
+
+        while pending:
+            if not stop_event.is_set() and (not should_continue() or
+                                            any(result.status == "aborted" for result in batch.results)):
+                # 取消尚未开始的任务，正在运行的进程在下一帧检查停止标志后退出
+                stop_event.set()
+                for future in pending:
+                    future.cancel()
+
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+
+            for future in pending:
+                if future.running() and future not in started:
+                    started.add(future)
+                    index, video_path, _ = futures[future]
+                    tracker.video_started(video_path, index, len(jobs))
+            _drain_worker_events(events, tracker)
+
+            for future in done:
+                index, video_path, output_subdir = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    result = future.result()
+                except Exception as e:
+                    tracker.log(f"处理视频 {video_path.name} 时出错: {str(e)}", logging.ERROR)
+                    result = VideoResult(video_path, output_subdir, status="failed", error=str(e))
+                batch.results.append(result)
+                tracker.video_finished(result)
+
+    _drain_worker_events(events, tracker)
+
+
+def run_jobs(jobs, options, reporter, batch, extract, should_continue=None, log_level=logging.INFO, stats_file=None,
+             budget=None):
+    """按options.workers处理jobs并报告总体进度，结果追加到batch.results，供其他提取方式复用进程池和进度统计
+
+    jobs为[(视频路径, 输出子目录, *附加参数)]。extract(视频, 输出子目录, options, log_level, *附加参数,
+    reporter=, should_continue=, budget=)处理一个视频并返回VideoResult；进程数大于1时在子进程中调用，
+    因此必须是模块级函数，reporter和should_continue由进程池转发进度和停止标志。
+    stats_file和budget与run_batch相同，budget由调用方用options.make_memory_budget()创建。
+    """
+    should_continue = should_continue or (lambda: True)
+    tracker = ProgressTracker(reporter, len(jobs), stats_file, budget=budget)
+    workers = min(options.workers, len(jobs))
+    if workers > 1:
+        _run_parallel(jobs, options, tracker, batch, should_continue, workers, log_level, budget,
+                      partial(_run_job_worker, extract))
+    else:
+        for index, (video_path, output_subdir, *job_args) in enumerate(jobs):
+            if not should_continue():
+                break
+            reporter.status(f"正在处理: {Path(video_path).name}")
+            tracker.video_started(video_path, index, len(jobs))
+            result = extract(video_path, output_subdir, options, log_level, *job_args, reporter=tracker,
+                             should_continue=should_continue, budget=budget)
+            batch.results.append(result)
+            tracker.video_finished(result)
+            if result.status == "aborted":
+                break
+    tracker.update_stats(force=True)
+
+
+class WorkerPool:
+    """可以随时提交视频的进程池，供监视模式等事先不知道全部视频、持续运行的调用方使用
+
+    子进程与run_batch相同，回报的日志和进度由drain()转交给tracker。子进程异常退出（例如解码器崩溃）后
+    进程池不能再使用，restart()连同事件队列、停止标志和内存预算一起重新创建，
+    已退出的子进程没有归还的内存预算不会带到新的进程池。
+    """
+
+    def __init__(self, workers, options, tracker):
+        self.workers = workers
+        self.options = options
+        self.tracker = tracker
+        # 使用spawn避免在带有界面线程的进程中fork
+        self.context = multiprocessing.get_context("spawn")
+        self.executor = None
+        self.restart()
+
+    def restart(self):
+        """转交旧进程池剩余的事件并关闭它（不等待），然后重新创建进程池"""
+        if self.executor is not None:
+            self.drain()
+            self.stop_event.set()
+            self.executor.shutdown(wait=False)
+        self.events = self.context.Queue()
+        self.stop_event = self.context.Event()
+        self.budget = self.options.make_memory_budget()
+        self.tracker.budget = self.budget
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=self.context, initializer=_init_worker,
+                                            initargs=(self.events, self.stop_event, self.budget))
+
+    def submit(self, video_path, output_dir, log_level=logging.INFO):
+        """在子进程中用extract_video_frames处理一个视频，返回结果为VideoResult的Future"""
+        return self.executor.submit(_extract_video_worker, str(video_path), str(output_dir), self.options, log_level)
+
+    def drain(self):
+        _drain_worker_events(self.events, self.tracker)
+
+    def stop(self):
+        """通知正在运行的视频在下一帧停止"""
+        self.stop_event.set()
+
+    def close(self):
+        """停止并等待所有子进程退出"""
+        self.stop()
+        self.executor.shutdown(wait=True)
+        self.drain()
+
+
+def _extract_segments(video_path, output_dir, options, segments, fps, total_frames, manifest, result, reporter,
+                      should_continue, log_level, budget=None):
+    """把一个视频的各分段分发到进程池，合并各段的结果和进度
+
+    提取清单只记录从起点开始连续完成的分段，中断后从第一个未完成的分段继续。
+    """
+    context = multiprocessing.get_context("spawn")
+    events = context.Queue()
+    stop_event = context.Event()
+    positions = [start for start, _ in segments]  # 各段已处理到的帧
+    finished = {}
+    saved_before = manifest.saved
+
+    def segment_progress(segment_index, frame_index):
+        positions[segment_index] = frame_index
+        done = sum(position - start for position, (start, _) in zip(positions, segments))
+        reporter.video_progress(result.video_path, segments[0][0] + done, total_frames)
+
+    with ProcessPoolExecutor(max_workers=len(segments), mp_context=context,
+                             initializer=_init_worker, initargs=(events, stop_event, budget)) as executor:
+        futures = {}
+        for index, segment in enumerate(segments):
+            future = executor.submit(_extract_segment_worker, video_path, str(output_dir), options, index, segment,
+                                     fps, total_frames, log_level)
+            futures[future] = index
+        pending = set(futures)
+
+        while pending:
+            if not stop_event.is_set() and should_continue is not None and not should_continue():
+                stop_event.set()
+
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            _drain_worker_events(events, reporter, segment_progress)
+
+            for future in done:
+                index = futures[future]
+                try:
+                    segment = future.result()
+                except Exception as e:
+                    segment = VideoResult(result.video_path, output_dir, status="failed", error=str(e))
+                finished[index] = segment
+                result.saved += segment.saved
+                result.bytes_written += segment.bytes_written
+                result.encode_seconds += segment.encode_seconds
+                result.metrics.merge(segment.metrics)
+                result.frame_shape = result.frame_shape or segment.frame_shape
+                if segment.status not in ("done", "stopped"):
+                    # 任何一段失败时整个视频都不完整，停止其余分段
+                    reporter.log(f"第 {index + 1} 段处理失败: {segment.error}", logging.ERROR)
+                    stop_event.set()
+                _record_segments(manifest, segments, finished, saved_before, total_frames)
+                manifest.frame_shape = manifest.frame_shape or result.frame_shape
+                manifest.save()
+
+    _drain_worker_events(events, reporter, segment_progress)
+    for status in ("failed", "aborted", "skipped", "stopped"):
+        failed = [segment for segment in finished.values() if segment.status == status]
+        if failed:
+            result.status, result.error = status, failed[0].error
+            break
+
+
+def _record_segments(manifest, segments, finished, saved_before, total_frames):
+    """把从起点开始连续完成的分段记入清单"""
+    manifest.saved = saved_before
+    manifest.last_frame = segments[0][0] - 1
+    for index, (start, end) in enumerate(segments):
+        segment = finished.get(index)
+        if segment is None or segment.status != "done":
+            break
+        manifest.saved += segment.saved
+        manifest.last_frame = (end if end is not None else max(start, total_frames)) - 1
+
+
+def _drain_worker_events(events, tracker, segment_progress=None):
+    """把子进程回报的日志、进度和提示转交给父进程的Reporter"""
+    while True:
+        try:
+            method, args = events.get_nowait()
+        except queue.Empty:
+            break
+        if method == "log":
+            message, level = args
+            tracker.log(message, level)
+        elif method == "video_progress":
+            tracker.video_progress(*args)
+        elif method == "segment_progress" and segment_progress is not None:
+            segment_progress(*args)
+        elif method == "notify":
+            kind, title, message = args
+            tracker.log(f"{title}: {message}", logging.WARNING)
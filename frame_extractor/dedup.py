@@ -0,0 +1,83 @@
+"""近似重复帧过滤：用感知哈希跳过与最近保留帧几乎相同的帧
+
+屏幕录像和监控视频中大量画面完全不变，逐帧保存会产生成千上万张相同的图片。
+每个候选帧先缩小为很小的灰度图并计算64位感知哈希（aHash或dHash），
+与最近保留帧的哈希比较汉明距离，不超过阈值的帧在编码前就被跳过。
+"""
+
+from .lazy import cv2, np
+
+# 去重范围：video 每个视频单独去重 / batch 整个批次共享索引（并行时每个进程各自共享）
+DEDUP_SCOPES = ("video", "batch")
+
+# 汉明距离不超过该值（64位哈希）的帧视为重复
+DEFAULT_HASH_DISTANCE = 4
+
+# 索引中最多保留的最近保留帧哈希数量，超出后覆盖最旧的
+DEFAULT_INDEX_SIZE = 256
+
+
+def _gray_thumbnail(frame, size):
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
+
+
+def average_hash(frame):
+    """aHash：8x8灰度图中每个像素是否高于平均值，返回8字节数组"""
+    thumbnail = _gray_thumbnail(frame, (8, 8))
+    return np.packbits(thumbnail > thumbnail.mean())
+
+
+def difference_hash(frame):
+    """dHash：9x8灰度图中每个像素是否比左边的像素亮，返回8字节数组"""
+    thumbnail = _gray_thumbnail(frame, (9, 8))
+    return np.packbits(thumbnail[:, 1:] > thumbnail[:, :-1])
+
+
+HASH_METHODS = {"dhash": difference_hash, "ahash": average_hash}
+
+
+class FrameDeduplicator:
+    """最近保留帧的哈希索引，大小固定，按环形缓冲区覆盖"""
+
+    def __init__(self, method="dhash", max_distance=DEFAULT_HASH_DISTANCE, index_size=DEFAULT_INDEX_SIZE):
+        if method not in HASH_METHODS:
+            raise ValueError(f"不支持的哈希方式: {method}")
+        self.hash_frame = HASH_METHODS[method]
+        self.max_distance = max(0, int(max_distance))
+        self.hashes = np.zeros((max(1, int(index_size)), 8), dtype=np.uint8)
+        self.count = 0      # 索引中的有效哈希数
+        self.next = 0       # 下一个写入位置
+        self.duplicates = 0
+
+    def is_duplicate(self, frame):
+        """帧与最近保留的某一帧足够接近时返回True，否则把它加入索引并返回False"""
+        frame_hash = self.hash_frame(frame)
+        if self.count:
+            # 一次计算与索引中所有哈希的汉明距离
+            distances = np.unpackbits(self.hashes[:self.count] ^ frame_hash, axis=1).sum(axis=1)
+            if distances.min() <= self.max_distance:
+                self.duplicates += 1
+                return True
+        self.hashes[self.next] = frame_hash
+        self.next = (self.next + 1) % len(self.hashes)
+        self.count = min(self.count + 1, len(self.hashes))
+        return False
+
+
+def iter_unique_frames(frames, deduplicator, buffers=None):
+    """从(帧序号, 帧)序列中去掉近似重复的帧；buffers不为None时重复帧归还到该缓冲池"""
+    for frame_index, frame in frames:
+        if not deduplicator.is_duplicate(frame):
+            yield frame_index, frame
+        elif buffers is not None:
+            buffers.put(frame)
+
+
+def dedup_sampler(sampler, deduplicator, buffers=None):
+    """包装sampling.build_sampler返回的sampler，在解码线程中编码之前去重"""
+    def sample(cap, should_continue=None):
+        return iter_unique_frames(sampler(cap, should_continue=should_continue), deduplicator, buffers)
+    return sample
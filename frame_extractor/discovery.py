@@ -0,0 +1,214 @@
+"""发现阶段：用os.scandir扫描视频，并行探测帧数、FPS、分辨率和时长，结果按路径+大小+修改时间缓存
+
+探测结果用于按工作量从大到小调度（避免最后只剩一个很长的视频在运行），
+以及按工作量而不是视频个数计算总体进度和剩余时间。
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from .lazy import cv2
+from .writer import write_file_atomic
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm')
+
+# 探测缓存文件，默认放在输出目录中
+PROBE_CACHE_NAME = ".video_probe_cache.json"
+PROBE_CACHE_VERSION = 1
+
+# 缓存条目中各探测结果字段的类型，类型不符的条目按未缓存处理
+PROBE_FIELD_TYPES = {"frames": int, "fps": (int, float), "width": int, "height": int, "probed": bool}
+
+# 并行探测的线程数；打开视频主要是文件读取和容器解析，OpenCV在此期间会释放GIL
+DEFAULT_PROBE_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+
+
+def iter_video_entries(input_dir):
+    """递归查找视频文件，产出(路径, os.stat_result)
+
+    与os.walk的顺序相同：先产出目录中的文件，再依次进入子目录；不进入指向目录的符号链接，
+    无法访问的目录被跳过。
+    """
+    stack = [Path(input_dir)]
+    while stack:
+        directory = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                subdirs.append(Path(entry.path))
+                        elif entry.name.lower().endswith(VIDEO_EXTENSIONS):
+                            yield Path(entry.path), entry.stat()
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+        stack.extend(reversed(subdirs))
+
+
+class VideoInfo:
+    """一个视频文件的元数据；无法打开时probed为False，帧数等为0"""
+
+    def __init__(self, path, size, mtime_ns, frames=0, fps=0.0, width=0, height=0, probed=False):
+        self.path = Path(path)
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.frames = frames
+        self.fps = fps
+        self.width = width
+        self.height = height
+        self.probed = probed
+        self.work = 0  # 估计的工作量（解码的像素数），见estimate_work
+
+    @property
+    def duration(self):
+        return self.frames / self.fps if self.fps > 0 else 0.0
+
+    def metadata(self):
+        """缓存中保存的探测结果"""
+        return {"frames": self.frames, "fps": self.fps, "width": self.width, "height": self.height,
+                "probed": self.probed}
+
+
+def format_duration(seconds):
+    """把秒数格式化为H:MM:SS，未知时为"--:--"""
+    if seconds is None:
+        return "--:--"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def probe_video(path, size, mtime_ns):
+    """打开视频读取帧数、FPS和分辨率，返回VideoInfo"""
+    info = VideoInfo(path, size, mtime_ns)
+    cap = cv2.VideoCapture(str(path))
+    try:
+        if cap.isOpened():
+            info.frames = max(0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT)))
+            info.fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+            info.width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            info.height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            info.probed = True
+    finally:
+        cap.release()
+    return info
+
+
+def _is_probe_result(info):
+    """缓存中的探测结果字段齐全且类型正确；bool是int的子类，只有probed可以是True/False"""
+    return (isinstance(info, dict) and set(info) == set(PROBE_FIELD_TYPES)
+            and all(isinstance(info[name], types) and (types is bool or not isinstance(info[name], bool))
+                    for name, types in PROBE_FIELD_TYPES.items()))
+
+
+class ProbeCache:
+    """探测结果的磁盘缓存，文件未变化（路径、大小和修改时间都相同）时直接使用"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        self.seen = set()
+        self.changed = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == PROBE_CACHE_VERSION and isinstance(data["videos"], dict):
+                self.entries = data["videos"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+
+    def get(self, path, size, mtime_ns):
+        key = str(path)
+        self.seen.add(key)
+        entry = self.entries.get(key)
+        try:
+            if entry is None or entry["size"] != size or entry["mtime_ns"] != mtime_ns:
+                return None
+            if not _is_probe_result(entry["info"]):
+                return None
+            return VideoInfo(path, size, mtime_ns, **entry["info"])
+        except (KeyError, TypeError):
+            # 旧格式或被手工修改的条目按未缓存处理，重新探测
+            return None
+
+    def put(self, info):
+        key = str(info.path)
+        self.seen.add(key)
+        self.entries[key] = {"size": info.size, "mtime_ns": info.mtime_ns, "info": info.metadata()}
+        self.changed = True
+
+    def save(self):
+        """写回缓存，去掉本次扫描中没有出现的视频"""
+        stale = set(self.entries) - self.seen
+        if not self.changed and not stale:
+            return
+        for key in stale:
+            del self.entries[key]
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": PROBE_CACHE_VERSION, "videos": self.entries}
+        write_file_atomic(self.path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self.changed = False
+
+
+def estimate_work(infos):
+    """按帧数x分辨率估计各视频的工作量；帧数未知的视频按文件大小和其他视频的平均比例估算"""
+    known = [info for info in infos if info.frames > 0 and info.width > 0 and info.height > 0]
+    for info in known:
+        info.work = info.frames * info.width * info.height
+    known_size = sum(info.size for info in known)
+    per_byte = sum(info.work for info in known) / known_size if known_size else 1.0
+    for info in infos:
+        if info.work <= 0:
+            info.work = int(info.size * per_byte)
+    return infos
+
+
+def discover_videos(input_dir, cache_path=None, workers=DEFAULT_PROBE_WORKERS, log=None, should_continue=None):
+    """扫描并探测输入目录中的视频，返回[VideoInfo]，顺序与扫描顺序相同
+
+    cache_path不为None时读取并更新探测缓存；should_continue返回False时未探测的视频按未知处理。
+    """
+    log = log or (lambda message, level=logging.INFO: None)
+    start = time.perf_counter()
+    cache = ProbeCache(cache_path) if cache_path is not None else None
+    infos = []
+    missing = []
+    for path, stat in iter_video_entries(input_dir):
+        info = cache.get(path, stat.st_size, stat.st_mtime_ns) if cache is not None else None
+        if info is None:
+            info = VideoInfo(path, stat.st_size, stat.st_mtime_ns)
+            missing.append(len(infos))
+        infos.append(info)
+
+    def probe(index):
+        info = infos[index]
+        if should_continue is not None and not should_continue():
+            return index, info, False
+        try:
+            return index, probe_video(info.path, info.size, info.mtime_ns), True
+        except Exception as e:
+            log(f"探测视频失败: {info.path}: {str(e)}", logging.WARNING)
+            return index, info, False
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+            for index, info, probed in executor.map(probe, missing):
+                infos[index] = info
+                # 无法打开的视频也缓存，文件不变时不再重复尝试
+                if cache is not None and probed:
+                    cache.put(info)
+    if cache is not None:
+        try:
+            cache.save()
+        except OSError as e:
+            log(f"无法写入探测缓存: {str(e)}", logging.WARNING)
+    log(f"扫描并探测 {len(infos)} 个视频（其中 {len(infos) - len(missing)} 个来自缓存），"
+        f"耗时 {time.perf_counter() - start:.2f} 秒")
+    return estimate_work(infos)
@@ -0,0 +1,34 @@
+"""延迟导入OpenCV和NumPy
+
+导入cv2（连同numpy）需要数百毫秒。各模块通过这里的代理对象使用它们，第一次访问属性时才真正导入，
+因此--help、--dry-run和只做扫描的调用不会加载OpenCV。
+"""
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    """模块代理：第一次访问属性时导入模块，之后把属性缓存在代理上"""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        value = getattr(self._module, attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        return f"<延迟导入的模块 {self._name!r}>"
+
+
+def module_available(name):
+    """检查模块是否已安装，不导入它"""
+    return importlib.util.find_spec(name) is not None
+
+
+cv2 = LazyModule("cv2")
+np = LazyModule("numpy")
@@ -0,0 +1,368 @@
+"""多节点共享：多台机器对同一个共享文件系统（如NFS）上的输入和输出文件夹运行时，用租约文件分配视频
+
+每个视频在处理前先在它的输出目录中取得租约：用O_CREAT|O_EXCL创建租约文件，只有一个节点能成功；
+持有期间定期更新租约的修改时间（心跳），完成后写入完成标记再删除租约。节点崩溃后租约不再更新，
+超过超时时间后由其他节点收回，并借助提取清单从中断的帧继续。
+
+持有者在写出每帧、提交分片和保存清单之前确认租约：距上次续约超过超时时间的LOCAL_EXPIRY_RATIO时，
+不读取共享文件就自行视为过期（停顿过久的节点恢复后立即停止，也不再续约），并定期重新读取租约核对令牌。
+在各节点与文件服务器的时钟偏差小于超时时间的1/4时，被收回的节点最多再完成正在进行的一次写入；
+文件系统不提供隔离手段，这不是严格的互斥，但单个文件都是原子写出的，不会出现写了一半的帧。
+"""
+import copy
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from .core import BatchResult, Reporter, VideoResult, extract_video_frames, plan_jobs, run_jobs, scan_videos
+from .manifest import extraction_settings, source_fingerprint
+from .writer import write_file_atomic
+
+# 输出目录中的租约文件和完成标记
+LEASE_NAME = ".extract_lease"
+DONE_MARKER_NAME = ".extract_done.json"
+
+# 收回过期租约时使用的锁文件后缀
+RECLAIM_SUFFIX = ".reclaim"
+
+# 租约多少秒未更新视为过期，以及持有期间更新租约的间隔（秒）
+DEFAULT_LEASE_TIMEOUT = 120.0
+DEFAULT_HEARTBEAT_INTERVAL = 15.0
+
+# 还有视频正由其他节点处理时，每隔多少秒重新检查一次
+DEFAULT_RETRY_INTERVAL = 10.0
+
+# 等待重新检查时响应停止的间隔（秒）
+RETRY_POLL_INTERVAL = 0.2
+
+# 距上次续约超过超时时间的该比例时，持有者自行视为租约过期；心跳间隔不超过超时时间的一半，
+# 余下的部分留给时钟偏差和文件系统的延迟
+LOCAL_EXPIRY_RATIO = 0.75
+
+# 持有者在写出前重新读取租约核对令牌的最短间隔（秒）
+LEASE_CHECK_INTERVAL = 1.0
+
+# 读取租约暂时出错（如NFS超时）时的重试次数和间隔（秒），都失败时本次不判断为丢失
+LEASE_READ_RETRIES = 3
+LEASE_READ_RETRY_DELAY = 0.1
+
+
+def default_node_id():
+    """主机名和进程号，同一台机器上的多个进程也各不相同"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _age(path):
+    """文件修改时间距今的秒数，文件不存在时为None"""
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class VideoLease:
+    """一个视频输出目录中的租约
+
+    收回过期租约时先同样用O_EXCL创建锁文件，在锁内确认租约仍然过期后删除并重新创建，
+    两个节点同时收回时不会删除对方刚取得的租约。判断过期使用文件服务器记录的修改时间和本机时钟，
+    各节点的时钟应大致同步，timeout要远大于可能的时钟偏差。
+    """
+
+    def __init__(self, output_dir, node, timeout=DEFAULT_LEASE_TIMEOUT):
+        self.path = Path(output_dir) / LEASE_NAME
+        self.node = node
+        self.timeout = timeout
+        self.token = None          # 本节点写入租约的随机令牌，用于确认租约仍属于自己
+        self.reclaimed_from = None  # 收回的过期租约原来所属的节点
+        self.lost = False          # 持有期间租约被其他节点收回，或本节点停顿过久
+        self._renewed = 0.0        # 上一次确认续约（或取得租约）开始时的time.monotonic()
+        self._checked = 0.0        # 上一次读取租约核对令牌的time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _create(self):
+        token = uuid.uuid4().hex
+        renewed = time.monotonic()
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+        try:
+            os.write(fd, json.dumps({"node": self.node, "token": token, "host": socket.gethostname(),
+                                     "pid": os.getpid(), "acquired": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                                    ensure_ascii=False).encode("utf-8"))
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.token = token
+        self._renewed = self._checked = renewed
+        return True
+
+    def _read(self):
+        """读取租约的内容，没有租约时为None；读取出错或内容不完整时抛出OSError或ValueError"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        if not isinstance(data, dict):
+            raise ValueError("租约内容不是对象")
+        return data
+
+    def holder(self):
+        """租约的内容；没有租约时为None，内容尚未写入或已损坏时为{}"""
+        try:
+            return self._read()
+        except (OSError, ValueError):
+            return {}
+
+    def _owned(self):
+        """租约仍属于本节点时返回True，已被删除或令牌不同时返回False，多次读取都出错时返回None"""
+        for attempt in range(LEASE_READ_RETRIES):
+            if attempt:
+                time.sleep(LEASE_READ_RETRY_DELAY)
+            try:
+                data = self._read()
+            except (OSError, ValueError):
+                continue
+            return data is not None and data.get("token") == self.token
+        return None
+
+    def expired(self):
+        """按本机时钟，距上次续约是否已久到其他节点可能开始收回"""
+        return time.monotonic() - self._renewed > self.timeout * LOCAL_EXPIRY_RATIO
+
+    def acquire(self):
+        """取得租约时返回True；租约由其他节点持有且未过期时返回False"""
+        if self._create():
+            return True
+        age = _age(self.path)
+        if age is None:
+            return self._create()  # 租约刚被释放
+        if age <= self.timeout:
+            return False
+        return self._reclaim()
+
+    def _reclaim(self):
+        lock = self.path.with_name(self.path.name + RECLAIM_SUFFIX)
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+        except FileExistsError:
+            # 另一个节点正在收回；收回者自己崩溃留下的锁同样在超时后删除
+            age = _age(lock)
+            if age is not None and age > self.timeout:
+                _remove(lock)
+            return False
+        try:
+            age = _age(self.path)
+            if age is not None and age <= self.timeout:
+                return False
+            stale = self.holder() or {}
+            _remove(self.path)
+            if not self._create():
+                return False
+            self.reclaimed_from = stale.get("node", "未知节点")
+            return True
+        finally:
+            _remove(lock)
+
+    def heartbeat(self):
+        """续约：更新租约的修改时间
+
+        租约已被删除或收回、或本节点停顿过久（其他节点可能正在收回，不能再续约）时把lost置为True并返回False；
+        暂时无法读取或更新租约时本次不续约，返回True，由下一次心跳重试。
+        """
+        if self.lost:
+            return False
+        if self.expired():
+            self.lost = True
+            return False
+        renewed = time.monotonic()
+        owned = self._owned()
+        if owned is None:
+            return True
+        if not owned:
+            self.lost = True
+            return False
+        try:
+            os.utime(self.path)
+        except FileNotFoundError:
+            self.lost = True
+            return False
+        except OSError:
+            return True
+        self._renewed = self._checked = renewed
+        return True
+
+    def still_held(self):
+        """写入输出目录之前调用：租约丢失或按本机时钟已接近过期时返回False
+
+        每隔LEASE_CHECK_INTERVAL秒重新读取租约核对令牌，其余调用只比较时间，可以在每帧写出前调用。
+        """
+        if self.lost:
+            return False
+        if self.expired():
+            self.lost = True
+            return False
+        now = time.monotonic()
+        if now - self._checked >= LEASE_CHECK_INTERVAL:
+            self._checked = now
+            if self._owned() is False:
+                self.lost = True
+        return not self.lost
+
+    def start_heartbeat(self, interval=DEFAULT_HEARTBEAT_INTERVAL):
+        """在后台线程中每隔interval秒调用heartbeat()，直到release()或租约丢失"""
+
+        def run():
+            while not self._stop.wait(interval):
+                if not self.heartbeat():
+                    break
+
+        self._thread = threading.Thread(target=run, name=f"lease-{self.path.parent.name}", daemon=True)
+        self._thread.start()
+
+    def release(self):
+        """停止心跳并删除仍属于自己的租约"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if not self.lost and self._owned():
+            _remove(self.path)
+
+
+def load_done_marker(output_dir):
+    """读取完成标记，不存在或已损坏时返回None"""
+    try:
+        with open(Path(output_dir) / DONE_MARKER_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_done(output_dir, source, settings):
+    marker = load_done_marker(output_dir)
+    return marker is not None and marker.get("source") == source and marker.get("settings") == settings
+
+
+def _write_done_marker(output_dir, node, source, settings, result):
+    marker = {"node": node, "source": source, "settings": settings, "status": result.status, "saved": result.saved,
+              "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    write_file_atomic(Path(output_dir) / DONE_MARKER_NAME, json.dumps(marker, ensure_ascii=False).encode("utf-8"))
+
+
+def extract_leased_video(video_path, output_dir, options, node, reporter=None, should_continue=None,
+                         deduplicator=None, log_level=logging.INFO, budget=None, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                         heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL):
+    """取得租约后提取单个视频，返回VideoResult
+
+    完成标记与源视频指纹和提取设置一致（已由某个节点完成）时status为unchanged；
+    租约由其他节点持有、或处理中被其他节点收回时status为leased，调用方稍后再试。
+    其余参数与extract_video_frames相同，options.resume应为True，收回的视频才能从中断处继续。
+    """
+    reporter = reporter or Reporter()
+    video_path = Path(video_path)
+    output_dir = Path(output_dir)
+    try:
+        source = source_fingerprint(video_path, options.fingerprint)
+        output_dir.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        reporter.log(f"无法访问视频或输出目录: {str(e)}", logging.ERROR)
+        return VideoResult(video_path, output_dir, status="failed", error=str(e))
+    settings = extraction_settings(options)
+    if _is_done(output_dir, source, settings):
+        reporter.log(f"已由其他节点完成，跳过: {video_path.name}", logging.DEBUG)
+        return VideoResult(video_path, output_dir, status="unchanged")
+
+    lease = VideoLease(output_dir, node, lease_timeout)
+    if not lease.acquire():
+        holder = (lease.holder() or {}).get("node", "未知节点")
+        return VideoResult(video_path, output_dir, status="leased", error=f"正由节点 {holder} 处理")
+    try:
+        if lease.reclaimed_from is not None:
+            reporter.log(f"节点 {lease.reclaimed_from} 的租约已过期，收回后继续处理: {video_path.name}",
+                         logging.WARNING)
+        # 另一个节点可能在检查完成标记之后、取得租约之前刚好完成
+        if _is_done(output_dir, source, settings):
+            return VideoResult(video_path, output_dir, status="unchanged")
+        lease.start_heartbeat(heartbeat_interval)
+        result = extract_video_frames(video_path, output_dir, options, reporter, should_continue, deduplicator,
+                                      log_level, budget, fence=lease.still_held)
+        if not lease.still_held():
+            reporter.log(f"租约已被其他节点收回或已过期，停止处理: {video_path.name}", logging.WARNING)
+            result.status, result.error = "leased", "租约已被其他节点收回或已过期"
+        elif result.status in ("done", "unchanged"):
+            _write_done_marker(output_dir, node, source, settings, result)
+        return result
+    finally:
+        lease.release()
+
+
+def _extract_leased_job(video_path, output_dir, options, log_level, node, lease_timeout, heartbeat_interval,
+                        reporter=None, should_continue=None, budget=None):
+    """run_jobs使用的extract，取得租约后提取一个视频"""
+    return extract_leased_video(video_path, output_dir, options, node, reporter, should_continue, log_level=log_level,
+                                budget=budget, lease_timeout=lease_timeout, heartbeat_interval=heartbeat_interval)
+
+
+def run_shared_batch(input_dir, output_dir, options, reporter=None, should_continue=None, log_level=logging.INFO,
+                     stats_file=None, node=None, lease_timeout=DEFAULT_LEASE_TIMEOUT,
+                     heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL, retry_interval=DEFAULT_RETRY_INTERVAL):
+    """多个节点共享输出文件夹时的run_batch，返回本节点的BatchResult
+
+    每个视频先取得租约再处理；正由其他节点处理的视频每隔retry_interval秒重新检查，
+    直到它们完成、或租约过期后由本节点收回。所有视频都已完成（由任一节点）或本节点已处理过时返回，
+    失败的视频留给其他节点重试。总是启用断点续传；去重范围为batch时每个视频单独去重。
+    """
+    if heartbeat_interval <= 0 or heartbeat_interval * 2 > lease_timeout:
+        raise ValueError("心跳间隔必须大于0，租约超时时间至少应为心跳间隔的两倍")
+    options = copy.copy(options)
+    options.resume = True
+    if options.dedup == "batch":
+        options.dedup = "video"
+    started = time.perf_counter()
+    reporter = reporter or Reporter()
+    should_continue = should_continue or (lambda: True)
+    node = node or default_node_id()
+
+    reporter.status("正在扫描视频文件...")
+    video_files = scan_videos(input_dir)
+    jobs = plan_jobs(input_dir, output_dir, video_files)
+    reporter.log(f"节点 {node}: 找到 {len(jobs)} 个视频文件，租约超时 {lease_timeout:g} 秒")
+    batch = BatchResult(len(jobs))
+    budget = options.make_memory_budget()
+    while jobs and should_continue():
+        # 每一轮处理所有尚未确定结果的视频，被其他节点租用的留到下一轮
+        round_batch = BatchResult(len(jobs))
+        run_jobs([(video_path, output_subdir, node, lease_timeout, heartbeat_interval)
+                  for video_path, output_subdir in jobs], options, reporter, round_batch, _extract_leased_job,
+                 should_continue, log_level, stats_file, budget)
+        leased = {str(result.video_path) for result in round_batch.results if result.status == "leased"}
+        batch.results.extend(result for result in round_batch.results if result.status != "leased")
+        jobs = [job for job in jobs if str(job[0]) in leased]
+        if any(result.status == "aborted" for result in round_batch.results):
+            break
+        if jobs and should_continue():
+            reporter.status(f"等待其他节点处理 {len(jobs)} 个视频...")
+            reporter.log(f"{len(jobs)} 个视频正由其他节点处理，{retry_interval:g} 秒后重新检查")
+            deadline = time.monotonic() + retry_interval
+            while time.monotonic() < deadline and should_continue():
+                time.sleep(RETRY_POLL_INTERVAL)
+
+    batch.stopped = not should_continue() or any(result.status == "aborted" for result in batch.results)
+    batch.elapsed = time.perf_counter() - started
+    if budget is not None:
+        batch.memory = budget.as_dict()
+    return batch
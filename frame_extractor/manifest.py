@@ -0,0 +1,124 @@
+"""每个输出子目录中的提取清单，用于断点续传和增量提取
+
+清单记录源视频的指纹（大小和修改时间，或抽样内容哈希）、提取设置以及
+最后一个已写出的帧序号。重新运行时，指纹和设置都未变化的视频：
+已完成的直接跳过，未完成的从最后一帧之后继续。
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from .writer import write_file_atomic
+
+MANIFEST_NAME = ".extract_manifest.json"
+MANIFEST_VERSION = 1
+
+# 提取过程中写入清单的最小间隔（秒），程序崩溃时最多重做这段时间内的帧
+MANIFEST_FLUSH_INTERVAL = 2.0
+
+# 指纹方式：stat 只比较大小和修改时间；hash 额外计算抽样内容哈希，文件被复制或touch后仍能识别
+FINGERPRINT_MODES = ("stat", "hash")
+
+# 抽样哈希读取文件开头、中间和结尾各这么多字节
+HASH_SAMPLE_SIZE = 1024 * 1024
+
+
+def _sample_hash(path, size):
+    digest = hashlib.sha256(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        for offset in sorted({0, max(0, size // 2 - HASH_SAMPLE_SIZE // 2), max(0, size - HASH_SAMPLE_SIZE)}):
+            f.seek(offset)
+            digest.update(f.read(HASH_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def source_fingerprint(video_path, mode="stat"):
+    """计算源视频的指纹"""
+    stat = os.stat(video_path)
+    fingerprint = {"size": stat.st_size}
+    if mode == "hash":
+        fingerprint["sha256_sample"] = _sample_hash(video_path, stat.st_size)
+    else:
+        fingerprint["mtime_ns"] = stat.st_mtime_ns
+    return fingerprint
+
+
+def extraction_settings(options):
+    """影响输出内容的设置；这些设置变化后需要重新提取"""
+    settings = {"sampling_mode": options.sampling_mode, "output_format": options.output_format}
+    if options.quality is not None:
+        settings["quality"] = options.quality
+    if options.sampling_mode == "seconds":
+        settings["seconds"] = options.seconds
+    else:
+        settings["interval"] = options.interval
+    if options.sampling_mode == "scene":
+        settings["scene_threshold"] = options.scene_threshold
+    if options.container != "files":
+        settings["container"] = [options.container, options.shard_size]
+    transform = options.make_transform()
+    if transform is not None:
+        settings["transform"] = transform.describe()
+    if options.dedup is not None:
+        settings["dedup"] = [options.dedup, options.dedup_hash, options.dedup_distance]
+    return settings
+
+
+class VideoManifest:
+    """单个视频的提取清单"""
+
+    def __init__(self, output_dir, source=None, settings=None, total_frames=0,
+                 last_frame=-1, saved=0, completed=False, frame_shape=None):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.source = source or {}
+        self.settings = settings or {}
+        self.total_frames = total_frames
+        self.last_frame = last_frame
+        self.saved = saved
+        self.completed = completed
+        self.frame_shape = frame_shape  # [高, 宽, 通道]，读取raw格式输出时需要
+        self.fence = None  # 不为None时每次写入前调用，返回False时不再写入（见core.extract_video_frames）
+        self._last_flush = 0.0
+
+    @classmethod
+    def load(cls, output_dir):
+        """读取清单，不存在或已损坏时返回None"""
+        path = Path(output_dir) / MANIFEST_NAME
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return None
+            return cls(output_dir, data["source"], data["settings"], data.get("total_frames", 0),
+                       data["last_frame"], data["saved"], data["completed"], data.get("frame_shape"))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def matches(self, source, settings):
+        return self.source == source and self.settings == settings
+
+    def record(self, frame_index):
+        """记录一个已写出的帧，按间隔写入磁盘"""
+        self.last_frame = frame_index
+        self.saved += 1
+        if time.monotonic() - self._last_flush >= MANIFEST_FLUSH_INTERVAL:
+            self.save()
+
+    def save(self):
+        if self.fence is not None and not self.fence():
+            return
+        data = {
+            "version": MANIFEST_VERSION,
+            "source": self.source,
+            "settings": self.settings,
+            "total_frames": self.total_frames,
+            "last_frame": self.last_frame,
+            "saved": self.saved,
+            "completed": self.completed,
+            "frame_shape": self.frame_shape,
+            "updated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        write_file_atomic(self.path, json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+        self._last_flush = time.monotonic()
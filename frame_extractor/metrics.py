@@ -0,0 +1,167 @@
+"""各阶段耗时与资源统计：解码、编码、写出和等待的直方图，运行结束后的JSON报告，
+以及供本地采集程序轮询的Prometheus文本格式统计文件
+"""
+import json
+import time
+
+from .writer import write_file_atomic
+
+# 统计的阶段：decode 取得一个采样帧（含定位、变换和去重）/ encode 编码一帧 /
+# write 写出一帧 / wait 写出线程等待下一帧编码完成 / budget 解码前等待内存预算（只在设置了预算时统计）
+STAGES = ("decode", "encode", "write", "wait", "budget")
+
+# 直方图各桶的上限（秒），最后还有一个无上限的桶
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+
+# 统计文件的最小更新间隔（秒）
+STATS_WRITE_INTERVAL = 2.0
+
+METRIC_PREFIX = "frame_extractor"
+
+
+class Histogram:
+    """固定桶的耗时直方图，可以在进程之间传递并合并"""
+
+    def __init__(self):
+        self.counts = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = 0
+        while index < len(HISTOGRAM_BUCKETS) and seconds > HISTOGRAM_BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """按桶估算分位数，返回所在桶的上限（秒）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return HISTOGRAM_BUCKETS[index] if index < len(HISTOGRAM_BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "total_s": round(self.sum, 4),
+            "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.5) * 1000, 3),
+            "p90_ms": round(self.quantile(0.9) * 1000, 3),
+            "p99_ms": round(self.quantile(0.99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+            "buckets": {str(bound): count for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), self.counts)},
+        }
+
+
+class RunMetrics:
+    """一个视频或整个批次的统计"""
+
+    def __init__(self):
+        self.stages = {stage: Histogram() for stage in STAGES}
+        self.frames = 0
+        self.bytes_written = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def observe(self, stage, seconds):
+        self.stages[stage].observe(seconds)
+
+    def merge(self, other):
+        for stage, histogram in other.stages.items():
+            self.stages[stage].merge(histogram)
+        self.frames += other.frames
+        self.bytes_written += other.bytes_written
+        self.errors += other.errors
+
+    @property
+    def frames_per_s(self):
+        return self.frames / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "frames": self.frames,
+            "bytes_written": self.bytes_written,
+            "errors": self.errors,
+            "elapsed_s": round(self.elapsed, 3),
+            "frames_per_s": round(self.frames_per_s, 2),
+            "mb_per_s": round(self.bytes_written / 1024 / 1024 / self.elapsed, 2) if self.elapsed else 0.0,
+            "stages": {stage: histogram.as_dict() for stage, histogram in self.stages.items()},
+        }
+
+    def summary_text(self):
+        """一行文字的各阶段平均耗时，用于日志"""
+        parts = [f"{stage} {histogram.sum / histogram.count * 1000:.1f} ms"
+                 for stage, histogram in self.stages.items() if histogram.count]
+        return f"{self.frames_per_s:.1f} 帧/秒，各阶段平均每帧: " + "，".join(parts)
+
+    def prometheus_text(self, gauges=None):
+        """Prometheus文本格式；gauges为额外的{名称: 数值}"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{METRIC_PREFIX}_{name}{suffix}{labels} {value}")
+
+        metric("frames_total", "counter", "Frames written", [("", "", self.frames)])
+        metric("bytes_written_total", "counter", "Bytes written", [("", "", self.bytes_written)])
+        metric("errors_total", "counter", "Frame save errors", [("", "", self.errors)])
+        samples = []
+        for stage, histogram in self.stages.items():
+            cumulative = 0
+            for bound, count in zip(HISTOGRAM_BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += count
+                samples.append(("_bucket", f'{{stage="{stage}",le="{bound}"}}', cumulative))
+            samples.append(("_sum", f'{{stage="{stage}"}}', round(histogram.sum, 6)))
+            samples.append(("_count", f'{{stage="{stage}"}}', histogram.count))
+        metric("stage_seconds", "histogram", "Per-frame time spent in each stage", samples)
+        for name, value in (gauges or {}).items():
+            metric(name, "gauge", name.replace("_", " "), [("", "", value)])
+        return "\n".join(lines) + "\n"
+
+
+class LiveStats:
+    """定期把批次统计写入Prometheus文本格式的文件，写入是原子的"""
+
+    def __init__(self, path, interval=STATS_WRITE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.last_write = 0.0
+
+    def update(self, metrics, gauges, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_write < self.interval:
+            return
+        self.last_write = now
+        write_file_atomic(self.path, metrics.prometheus_text(gauges).encode("utf-8"))
+
+
+def write_report(path, batch):
+    """把批次结果和各阶段统计写为JSON报告"""
+    summary = batch.as_dict()
+    videos = summary.pop("videos")
+    for video, result in zip(videos, batch.results):
+        video["metrics"] = result.metrics.as_dict()
+    report = {
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": summary,
+        "metrics": batch.metrics.as_dict(),
+        "videos": videos,
+    }
+    write_file_atomic(path, json.dumps(report, ensure_ascii=False, indent=2).encode("utf-8"))
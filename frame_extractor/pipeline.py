@@ -0,0 +1,104 @@
+"""单个视频内的解码 -> 编码 -> 写出流水线"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .sampling import iter_sampled_frames
+
+# 单个视频内的流水线设置：编码线程数，以及已解码但尚未写出的最大帧数
+DEFAULT_ENCODE_WORKERS = min(4, os.cpu_count() or 1)
+DEFAULT_QUEUE_DEPTH = 8
+
+
+def iter_encoded_frames(cap, interval, encode, encode_workers=DEFAULT_ENCODE_WORKERS,
+                        queue_depth=DEFAULT_QUEUE_DEPTH, should_continue=None, start_frame=0, sampler=None,
+                        metrics=None, budget=None, buffers=None):
+    """解码 -> 编码 -> 写出的流水线
+
+    解码线程按间隔（或按sampler，见sampling.build_sampler）读取帧，编码线程池调用encode(frame)并行编码（cv2.imencode会释放GIL），
+    按解码顺序产出(帧序号, 帧, 编码结果)供调用方写出。已解码但调用方
+    尚未处理完的帧不超过queue_depth个，以限制内存占用。
+    metrics不为None时在解码线程中记录每个采样帧的decode耗时（见metrics.RunMetrics）。
+    budget不为None时在途帧按字节计入共享的内存预算（见budget.MemoryBudget），预算用尽时解码线程阻塞；
+    buffers不为None时调用方处理完的帧归还到该缓冲池（见budget.BufferPool），调用方在下一次迭代后不能再使用该帧。
+    """
+    sampler = sampler or partial(iter_sampled_frames, interval=interval, start_frame=start_frame)
+    slots = threading.Semaphore(max(1, int(queue_depth)))
+    pending = queue.Queue()
+    stopped = threading.Event()
+    failures = []
+    
+    def keep_going():
+        return not stopped.is_set() and (should_continue is None or should_continue())
+    
+    def decode():
+        held = 0  # 解码线程已占用、尚未随帧交给写出线程的预算字节数
+        try:
+            frames = sampler(cap, should_continue=keep_going)
+            frame_bytes = 0  # 上一帧的大小，解码下一帧之前先预留这么多预算
+            while True:
+                if budget is not None:
+                    start = time.perf_counter()
+                    if not budget.acquire(frame_bytes, keep_going):
+                        return
+                    held = frame_bytes
+                    if metrics is not None:
+                        metrics.observe("budget", time.perf_counter() - start)
+                start = time.perf_counter()
+                item = next(frames, None)
+                if item is None:
+                    break
+                if metrics is not None:
+                    metrics.observe("decode", time.perf_counter() - start)
+                frame_index, frame = item
+                frame_bytes = frame.nbytes
+                if budget is not None:
+                    # 按帧的实际大小修正预留
+                    budget.adjust(frame_bytes - held)
+                    held = frame_bytes
+                while not slots.acquire(timeout=0.1):
+                    if not keep_going():
+                        return
+                pending.put((frame_index, frame, held, encoder.submit(encode, frame)))
+                held = 0
+        except Exception as e:
+            failures.append(e)
+        finally:
+            if held:
+                budget.release(held)
+            pending.put(None)
+    
+    with ThreadPoolExecutor(max_workers=max(1, int(encode_workers))) as encoder:
+        decoder = threading.Thread(target=decode, daemon=True)
+        decoder.start()
+        try:
+            while True:
+                item = pending.get()
+                if item is None:
+                    break
+                frame_index, frame, nbytes, future = item
+                try:
+                    yield frame_index, frame, future.result()
+                finally:
+                    slots.release()
+                    if nbytes:
+                        budget.release(nbytes)
+                    if buffers is not None:
+                        buffers.put(frame)
+        finally:
+            # 调用方提前结束时通知解码线程退出，并归还没有写出的帧占用的预算
+            stopped.set()
+            decoder.join()
+            while True:
+                try:
+                    item = pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None and item[2]:
+                    budget.release(item[2])
+    
+    if failures:
+        raise failures[0]
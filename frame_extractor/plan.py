@@ -0,0 +1,80 @@
+"""试运行：列出工作计划并估计输出大小，不打开任何视频，也不导入OpenCV
+
+帧数、FPS和分辨率来自探测缓存（之前正常运行时写入），没有缓存的视频只能列出，无法估计。
+启用续传时读取各输出目录中的提取清单，标出将被跳过或从中途继续的视频。
+"""
+from pathlib import Path
+
+from .core import plan_jobs
+from .discovery import PROBE_CACHE_NAME, ProbeCache, iter_video_entries
+from .manifest import VideoManifest, extraction_settings, source_fingerprint
+
+# 各输出格式每个样本（像素x通道）的估计字节数，按常见的自然画面粗略估计，实际大小随画面内容变化很大
+ESTIMATED_BYTES_PER_SAMPLE = {
+    "png": 0.5,
+    "jpg": 0.08,
+    "webp": 0.04,
+    "webp-lossless": 0.35,
+    "raw": 1.0,
+}
+
+
+def estimate_frame_bytes(options, width, height):
+    """按输出格式和变换后的尺寸估计每帧写出的字节数"""
+    transform = options.make_transform()
+    shape = transform.output_shape(width, height) if transform is not None else (height, width, 3)
+    samples = shape[0] * shape[1] * shape[2]
+    if options.container == "npy":
+        return samples
+    return int(samples * ESTIMATED_BYTES_PER_SAMPLE[options.output_format])
+
+
+def plan_batch(input_dir, output_dir, options, probe_cache=None):
+    """返回每个视频的计划[dict]，顺序与run_batch单进程处理时相同
+
+    status取值: pending 将从头提取 / partial 续传时从中途继续 / unchanged 续传时将被跳过。
+    frames、expected_frames和estimated_bytes在没有探测缓存或无法预计（场景变化采样）时为None；
+    去重跳过的帧无法预计，估计值是上限。
+    """
+    cache = ProbeCache(probe_cache or Path(output_dir) / PROBE_CACHE_NAME)
+    entries = list(iter_video_entries(input_dir))
+    jobs = plan_jobs(input_dir, output_dir, [path for path, _ in entries])
+    settings = extraction_settings(options) if options.resume else None
+    plan = []
+    for (video_path, stat), (_, output_subdir) in zip(entries, jobs):
+        item = {"video": str(video_path), "output_dir": str(output_subdir), "size": stat.st_size, "status": "pending",
+                "frames": None, "duration_s": None, "resolution": None, "expected_frames": None,
+                "estimated_bytes": None}
+        saved = 0
+        if options.resume:
+            manifest = VideoManifest.load(output_subdir)
+            if manifest is not None and manifest.matches(source_fingerprint(video_path, options.fingerprint), settings):
+                item["status"] = "unchanged" if manifest.completed else "partial"
+                saved = manifest.saved
+        info = cache.get(video_path, stat.st_size, stat.st_mtime_ns)
+        if info is not None and info.probed:
+            item["frames"] = info.frames
+            item["duration_s"] = round(info.duration, 1)
+            item["resolution"] = [info.width, info.height]
+            expected = options.expected_frames(info.frames, info.fps)
+            if item["status"] == "unchanged":
+                expected = 0
+            if expected is not None:
+                expected = max(0, expected - saved)
+                item["expected_frames"] = expected
+                if info.width > 0 and info.height > 0:
+                    item["estimated_bytes"] = expected * estimate_frame_bytes(options, info.width, info.height)
+        plan.append(item)
+    return plan
+
+
+def summarize_plan(plan):
+    """计划的汇总，未知的视频不计入帧数和大小"""
+    summary = {"videos": len(plan), "input_bytes": sum(item["size"] for item in plan)}
+    for status in ("pending", "partial", "unchanged"):
+        summary[status] = sum(item["status"] == status for item in plan)
+    summary["unknown"] = sum(item["estimated_bytes"] is None and item["status"] != "unchanged" for item in plan)
+    summary["duration_s"] = round(sum(item["duration_s"] or 0 for item in plan), 1)
+    summary["expected_frames"] = sum(item["expected_frames"] or 0 for item in plan)
+    summary["estimated_bytes"] = sum(item["estimated_bytes"] or 0 for item in plan)
+    return summary
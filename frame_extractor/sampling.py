@@ -0,0 +1,184 @@
+"""采样引擎：只解码需要保留的帧
+
+支持三种采样方式：每隔N帧、每隔N秒、画面变化（场景切换）时。
+"""
+import itertools
+import math
+from functools import partial
+
+from .lazy import cv2, np
+
+# 两个采样帧之间的间隔达到该值时改用定位(seek)跳帧，小间隔下逐帧grab更快
+SEEK_FRAME_THRESHOLD = 60
+
+# 采样方式：frames 每隔N帧 / seconds 每隔N秒 / scene 画面变化超过阈值时
+SAMPLING_MODES = ("frames", "seconds", "scene")
+
+# 场景变化检测使用的缩略图尺寸（宽, 高），以及默认阈值（缩略图平均绝对差，范围0~1）
+SCENE_THUMBNAIL_SIZE = (64, 36)
+DEFAULT_SCENE_THRESHOLD = 0.12
+
+
+def _seek_to_frame(cap, frame_index):
+    """定位到指定帧，并确认后端报告的位置与目标一致"""
+    if not cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index):
+        return False
+    return int(round(cap.get(cv2.CAP_PROP_POS_FRAMES))) == frame_index
+
+
+def _iter_target_frames(cap, targets, seek_threshold=SEEK_FRAME_THRESHOLD, should_continue=None, end_frame=None,
+                        buffers=None):
+    """产出targets中各帧序号对应的(帧序号, 帧)，targets必须严格递增
+
+    被跳过的帧只调用grab()推进而不解码转换，只有保留的帧才retrieve()。
+    间隔较大时按帧位置定位，定位不准确时回退为逐帧grab。
+    end_frame不为None时只产出序号小于它的帧。buffers不为None时帧解码到缓冲池中的数组（见budget.BufferPool）。
+    """
+    position = 0       # 下一次grab将得到的帧序号
+    seek_enabled = bool(seek_threshold)
+
+    for target in targets:
+        if should_continue is not None and not should_continue():
+            return
+        if end_frame is not None and target >= end_frame:
+            return
+        if seek_enabled and target - position >= seek_threshold:
+            if _seek_to_frame(cap, target):
+                position = target
+            else:
+                # 定位不准确，之后只用grab；先回到已知位置
+                seek_enabled = False
+                if not _seek_to_frame(cap, position):
+                    if not _seek_to_frame(cap, 0):
+                        return
+                    skipped = 0
+                    while skipped < position:
+                        if not cap.grab():
+                            return
+                        skipped += 1
+
+        while position < target:
+            if should_continue is not None and not should_continue():
+                return
+            if not cap.grab():
+                return
+            position += 1
+
+        if not cap.grab():
+            return
+        position += 1
+        ret, frame = buffers.retrieve(cap) if buffers is not None else cap.retrieve()
+        if not ret:
+            return
+        yield target, frame
+
+
+def iter_sampled_frames(cap, interval, seek_threshold=SEEK_FRAME_THRESHOLD, should_continue=None, start_frame=0,
+                        end_frame=None, buffers=None):
+    """按间隔产出(帧序号, 帧)
+
+    start_frame用于断点续传和分段提取，从不小于它的第一个采样帧开始，帧序号仍从视频开头计算；
+    end_frame不为None时在该帧之前结束。
+    """
+    interval = max(1, int(interval))
+    first = -(-max(0, int(start_frame)) // interval) * interval
+    yield from _iter_target_frames(cap, itertools.count(first, interval), seek_threshold, should_continue, end_frame,
+                                   buffers)
+
+
+def _time_targets(step, start_frame):
+    """把每隔step帧（可以是小数）的时间点换算为严格递增的帧序号"""
+    k = max(0, math.floor((start_frame - 0.5) / step))
+    last = start_frame - 1
+    for k in itertools.count(k):
+        target = int(round(k * step))
+        if target > last:
+            last = target
+            yield target
+
+
+def iter_timed_frames(cap, seconds, fps=0, seek_threshold=SEEK_FRAME_THRESHOLD, should_continue=None, start_frame=0,
+                      end_frame=None, buffers=None):
+    """每隔seconds秒产出一帧(帧序号, 帧)
+
+    FPS有效时把时间点换算为帧序号，与按帧间隔一样用定位和grab跳帧；
+    FPS未知时逐帧grab，根据CAP_PROP_POS_MSEC判断是否到达下一个时间点。
+    """
+    seconds = float(seconds)
+    if fps and fps > 0:
+        yield from _iter_target_frames(cap, _time_targets(seconds * fps, start_frame), seek_threshold, should_continue,
+                                       end_frame, buffers)
+        return
+
+    step_ms = seconds * 1000.0
+    next_ms = None
+    for index in itertools.count():
+        if should_continue is not None and not should_continue():
+            return
+        if end_frame is not None and index >= end_frame:
+            return
+        if not cap.grab():
+            return
+        if index < start_frame:
+            continue
+        msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+        if next_ms is None:
+            next_ms = math.ceil(msec / step_ms - 1e-6) * step_ms
+        if msec + 1e-3 >= next_ms:
+            ret, frame = buffers.retrieve(cap) if buffers is not None else cap.retrieve()
+            if not ret:
+                return
+            yield index, frame
+            next_ms = (math.floor(msec / step_ms + 1e-6) + 1) * step_ms
+
+
+def iter_selected_frames(cap, frame_indices, seek_threshold=SEEK_FRAME_THRESHOLD, should_continue=None, buffers=None):
+    """按任意的帧序号列表产出(帧序号, 帧)，序号先去重并从小到大排序，负数被忽略
+
+    整个列表只顺序读一遍视频：相邻请求相距较远时定位，较近时逐帧grab前进。
+    """
+    targets = sorted({int(index) for index in frame_indices if index >= 0})
+    yield from _iter_target_frames(cap, targets, seek_threshold, should_continue, buffers=buffers)
+
+
+def iter_scene_frames(frames, threshold=DEFAULT_SCENE_THRESHOLD, buffers=None):
+    """从(帧序号, 帧)序列中只保留画面明显变化的帧
+
+    每帧缩小为缩略图后与上一次保留帧的缩略图求平均绝对差（归一化到0~1），
+    超过threshold时保留。与上一次保留帧而不是上一帧比较，缓慢的镜头移动累积到阈值后也会被保留。
+    第一帧总是保留。buffers不为None时未保留的帧归还到该缓冲池。
+    """
+    reference = None
+    for frame_index, frame in frames:
+        thumbnail = cv2.resize(frame, SCENE_THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+        if reference is None or np.abs(thumbnail - reference).mean() / 255.0 > threshold:
+            reference = thumbnail
+            yield frame_index, frame
+        elif buffers is not None:
+            buffers.put(frame)
+
+
+def _scene_sampler(cap, interval, threshold, start_frame, end_frame, seek_threshold, buffers=None,
+                   should_continue=None):
+    candidates = iter_sampled_frames(cap, interval, seek_threshold, should_continue, start_frame, end_frame, buffers)
+    return iter_scene_frames(candidates, threshold, buffers)
+
+
+def build_sampler(mode="frames", interval=1, seconds=1.0, scene_threshold=DEFAULT_SCENE_THRESHOLD,
+                  fps=0, start_frame=0, seek_threshold=SEEK_FRAME_THRESHOLD, end_frame=None, buffers=None):
+    """按采样方式返回sampler(cap, should_continue=None)，产出(帧序号, 帧)
+
+    scene方式每隔interval帧检查一次画面变化。
+    start_frame和end_frame限定帧范围[start_frame, end_frame)，end_frame为None时读到视频末尾。
+    buffers为解码使用的缓冲池（见budget.BufferPool），None时每帧由OpenCV新分配。
+    """
+    if mode == "frames":
+        return partial(iter_sampled_frames, interval=interval, seek_threshold=seek_threshold, start_frame=start_frame,
+                       end_frame=end_frame, buffers=buffers)
+    if mode == "seconds":
+        return partial(iter_timed_frames, seconds=seconds, fps=fps, seek_threshold=seek_threshold,
+                       start_frame=start_frame, end_frame=end_frame, buffers=buffers)
+    if mode == "scene":
+        return partial(_scene_sampler, interval=interval, threshold=scene_threshold, start_frame=start_frame,
+                       end_frame=end_frame, seek_threshold=seek_threshold, buffers=buffers)
+    raise ValueError(f"不支持的采样方式: {mode}")
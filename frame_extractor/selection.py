@@ -0,0 +1,473 @@
+"""按选择列表提取指定的帧：每项为(视频, 帧序号或时间点)
+
+选择列表可以是CSV（带表头，列为video、frame或timestamp、可选的name）或JSON
+（对象的列表，或{视频: [帧序号、时间点或对象]}）。请求按视频分组、按帧序号排序后每个视频只顺序读一遍：
+相邻请求相距较远时定位，较近时逐帧grab。输出文件按请求命名，无法提取的请求连同原因写入汇总文件。
+
+示例CSV:
+    video,frame,timestamp,name
+    cam1/a.mp4,120,,
+    cam1/a.mp4,,00:01:05.5,goal
+"""
+import csv
+import json
+import logging
+import math
+import re
+import time
+import traceback
+from functools import partial
+from pathlib import Path
+
+from .budget import BufferPool
+from .core import BatchResult, Reporter, VideoResult, run_jobs
+from .lazy import cv2
+from .pipeline import iter_encoded_frames
+from .sampling import iter_selected_frames
+from .shards import frame_file_name
+from .stream import open_video
+from .transforms import transform_sampler
+from .writer import encode_frame, format_extension, write_file_atomic
+
+SELECTION_SUMMARY_NAME = "selection_summary.json"
+
+# 各字段可以使用的列名或键名（不区分大小写）
+SELECTION_COLUMNS = {
+    "video": ("video", "path", "file"),
+    "frame": ("frame", "frame_index"),
+    "timestamp": ("timestamp", "time", "seconds"),
+    "name": ("name", "id"),
+}
+
+# 无法提取的请求的原因
+PROBLEM_REASONS = {
+    "invalid": "请求格式错误",
+    "missing_video": "找不到视频或无法打开",
+    "fps_unknown": "视频FPS未知，无法把时间点换算为帧序号",
+    "out_of_range": "超出视频的帧范围",
+    "duplicate_name": "输出名称与另一帧的请求重复",
+    "unreadable": "无法读取该帧（视频提前结束或解码失败）",
+    "write_failed": "编码或写出失败",
+    "failed": "处理视频时出错",
+    "stopped": "被停止，未处理",
+}
+
+# 输出文件名中不允许的字符
+_UNSAFE_NAME = re.compile(r'[\x00-\x1f<>:"/\\|?*]')
+
+
+class SelectionRequest:
+    """选择列表中的一项：视频中的一帧，由帧序号或时间点（秒）指定
+
+    line为该项在CSV中的行号，或在JSON中是第几项（从1开始）。
+    """
+
+    def __init__(self, video, frame=None, timestamp=None, name=None, line=None):
+        self.video = str(video)
+        self.frame = frame
+        self.timestamp = timestamp
+        self.name = name
+        self.line = line
+
+    def identifier(self):
+        """输出文件名（不含扩展名）：name列，或frame_000120 / time_000065.500"""
+        if self.name:
+            return self.name
+        if self.frame is not None:
+            return frame_file_name(self.frame, "")
+        return f"time_{self.timestamp:010.3f}"
+
+    def as_dict(self):
+        return {"video": self.video, "frame": self.frame, "timestamp": self.timestamp, "name": self.name,
+                "line": self.line}
+
+
+def parse_timestamp(value):
+    """把秒数或[HH:]MM:SS[.fff]换算为秒"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = float(value)
+    else:
+        parts = str(value).strip().split(":")
+        if len(parts) > 3:
+            raise ValueError(f"无法识别的时间点: {value}")
+        seconds = 0.0
+        try:
+            for part in parts:
+                seconds = seconds * 60 + float(part)
+        except ValueError:
+            raise ValueError(f"无法识别的时间点: {value}") from None
+    if seconds < 0 or not math.isfinite(seconds):
+        raise ValueError(f"无法识别的时间点: {value}")
+    return seconds
+
+
+def _safe_name(name):
+    name = _UNSAFE_NAME.sub("_", str(name)).strip(" .")
+    if not name:
+        raise ValueError("name为空或只包含不允许的字符")
+    return name
+
+
+def _field(record, field):
+    for key in SELECTION_COLUMNS[field]:
+        value = record.get(key)
+        if value is not None and value != "":
+            return value
+    return None
+
+
+def _parse_frame(value):
+    """帧序号为整数，或小数部分为0的数（表格软件导出的CSV中常写成12.0）"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    try:
+        number = float(value) if isinstance(value, (str, float)) else math.nan
+    except ValueError:
+        number = math.nan
+    if not number.is_integer():
+        raise ValueError(f"无法识别的帧序号: {value}")
+    return int(number)
+
+
+def _parse_request(record, line):
+    """把一行CSV或一个JSON对象（键已转为小写）转为SelectionRequest，格式错误时抛出ValueError"""
+    video = _field(record, "video")
+    if video is None:
+        raise ValueError("缺少视频")
+    frame = _field(record, "frame")
+    timestamp = _field(record, "timestamp")
+    if (frame is None) == (timestamp is None):
+        raise ValueError("帧序号和时间点必须且只能指定一个")
+    if frame is not None:
+        frame = _parse_frame(frame)
+    else:
+        timestamp = parse_timestamp(timestamp)
+    name = _field(record, "name")
+    return SelectionRequest(video, frame, timestamp, _safe_name(name) if name is not None else None, line)
+
+
+def _invalid(record, line, error):
+    return {"video": None if _field(record, "video") is None else str(_field(record, "video")),
+            "frame": _field(record, "frame"), "timestamp": _field(record, "timestamp"), "name": _field(record, "name"),
+            "line": line, "reason": "invalid", "detail": str(error)}
+
+
+def _json_records(data):
+    """JSON选择列表转为[(对象, 第几项)]；{视频: [...]}中的整数为帧序号，字符串或小数为时间点"""
+    if isinstance(data, list):
+        items = [(item, None) for item in data]
+    elif isinstance(data, dict):
+        items = []
+        for video, entries in data.items():
+            for entry in entries if isinstance(entries, list) else [entries]:
+                if isinstance(entry, dict):
+                    entry = dict(entry, video=video)
+                elif isinstance(entry, int) and not isinstance(entry, bool):
+                    entry = {"video": video, "frame": entry}
+                else:
+                    entry = {"video": video, "timestamp": entry}
+                items.append((entry, video))
+    else:
+        raise ValueError("JSON选择列表必须是对象的列表，或{视频: [帧序号或时间点]}")
+    for line, (item, video) in enumerate(items, 1):
+        if not isinstance(item, dict):
+            item = {"video": video, "value": item}
+        yield {str(key).strip().lower(): value for key, value in item.items()}, line
+
+
+def load_selection(path):
+    """读取选择列表，返回([SelectionRequest], [格式错误的项])
+
+    按扩展名识别.json，其余按CSV读取（兼容带BOM的UTF-8）。文件本身无法解析时抛出ValueError。
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".json":
+        with open(path, "r", encoding="utf-8-sig") as f:
+            try:
+                records = list(_json_records(json.load(f)))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"无法解析JSON选择列表: {str(e)}") from None
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            reader = csv.DictReader(f)
+            columns = {str(name).strip().lower() for name in reader.fieldnames or ()}
+            if not columns & set(SELECTION_COLUMNS["video"]):
+                raise ValueError(f"选择列表缺少视频列（{'/'.join(SELECTION_COLUMNS['video'])}）")
+            if not columns & set(SELECTION_COLUMNS["frame"] + SELECTION_COLUMNS["timestamp"]):
+                raise ValueError("选择列表缺少帧序号列或时间点列")
+            records = [({str(key).strip().lower(): (value or "").strip() for key, value in row.items() if key},
+                        reader.line_num) for row in reader]
+    requests, problems = [], []
+    for record, line in records:
+        try:
+            requests.append(_parse_request(record, line))
+        except ValueError as e:
+            problems.append(_invalid(record, line, e))
+    return requests, problems
+
+
+def plan_selection(requests, input_dir, output_dir):
+    """按视频分组，返回[(视频路径, 输出子目录, [SelectionRequest])]，顺序为各视频在列表中首次出现的顺序
+
+    相对路径相对于input_dir；输入文件夹中的视频与run_batch一样保持原始文件夹结构，其他视频直接输出到output_dir下。
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    groups = {}
+    for request in requests:
+        video_path = Path(request.video)
+        if not video_path.is_absolute():
+            video_path = input_dir / video_path
+        groups.setdefault(video_path, []).append(request)
+    jobs = []
+    for video_path, video_requests in groups.items():
+        try:
+            rel_path = video_path.parent.relative_to(input_dir)
+        except ValueError:
+            rel_path = Path()
+        jobs.append((video_path, output_dir / rel_path / video_path.stem, video_requests))
+    return jobs
+
+
+class SelectionResult(VideoResult):
+    """按选择列表提取一个视频的结果，problems为无法提取的请求"""
+
+    def __init__(self, video_path, output_dir, requested=0):
+        super().__init__(video_path, output_dir)
+        self.requested = requested
+        self.existing = 0  # 续传时输出文件已存在而跳过的请求数
+        self.problems = []
+
+    def as_dict(self):
+        result = super().as_dict()
+        result.update(requested=self.requested, existing=self.existing, problems=len(self.problems))
+        return result
+
+
+def extract_selected_frames(video_path, output_dir, requests, options, reporter=None, should_continue=None,
+                            budget=None):
+    """提取一个视频中被请求的帧，写出为output_dir/<请求名称><扩展名>，返回SelectionResult
+
+    时间点按FPS换算为最近的帧序号；多个请求对应同一帧时只解码一次，按各自的名称分别写出。
+    只使用options中的输出格式、质量、变换和流水线设置；resume为True时跳过输出文件已存在的请求。
+    """
+    reporter = reporter or Reporter()
+    log = reporter.log
+    video_path = Path(video_path)
+    output_dir = Path(output_dir)
+    result = SelectionResult(video_path, output_dir, len(requests))
+    started = time.perf_counter()
+
+    def problem(request, reason, detail=None):
+        result.problems.append(dict(request.as_dict(), reason=reason, detail=detail))
+
+    cap = open_video(video_path, log) if video_path.is_file() else None
+    if cap is None:
+        log(f"找不到视频或无法打开: {video_path}", logging.WARNING)
+        for request in requests:
+            problem(request, "missing_video")
+        result.status, result.error = "skipped", PROBLEM_REASONS["missing_video"]
+        return result
+
+    targets = {}   # 帧序号 -> [(输出名称, 请求)]
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        extension = format_extension(options.output_format)
+        names = {}  # 输出名称 -> 帧序号
+        for request in requests:
+            frame_index = request.frame
+            if frame_index is None:
+                if not fps or fps <= 0:
+                    problem(request, "fps_unknown")
+                    continue
+                frame_index = int(round(request.timestamp * fps))
+            if frame_index < 0 or (total_frames > 0 and frame_index >= total_frames):
+                problem(request, "out_of_range", f"帧 {frame_index}，视频共 {total_frames} 帧")
+                continue
+            name = request.identifier()
+            if name in names:
+                # 完全相同的请求只写出一次
+                if names[name] != frame_index:
+                    problem(request, "duplicate_name", f"{name} 已用于帧 {names[name]}")
+                continue
+            names[name] = frame_index
+            if options.resume and (output_dir / f"{name}{extension}").exists():
+                result.existing += 1
+                continue
+            targets.setdefault(frame_index, []).append((name, request))
+
+        log(f"请求 {len(requests)} 项，需要读取 {len(targets)} 帧（视频共 {total_frames} 帧）")
+        if targets:
+            output_dir.mkdir(parents=True, exist_ok=True)
+            _write_selected(cap, targets, output_dir, extension, options, result, reporter, should_continue, budget,
+                            problem)
+    except Exception as e:
+        log(f"处理视频 {video_path.name} 时出错: {str(e)}", logging.ERROR)
+        log(f"错误详情: {traceback.format_exc()}", logging.ERROR)
+        result.status, result.error = "failed", str(e)
+    finally:
+        cap.release()
+
+    stopped = should_continue is not None and not should_continue()
+    if result.status == "done" and stopped:
+        result.status = "stopped"
+    # 剩下的请求没有被读到：被停止、出错，或视频实际比报告的帧数短
+    reason = "failed" if result.status == "failed" else "stopped" if stopped else "unreadable"
+    for entries in targets.values():
+        for _, request in entries:
+            problem(request, reason, result.error if reason == "failed" else None)
+    if result.problems:
+        log(f"{len(result.problems)} 个请求无法提取", logging.WARNING)
+    result.metrics.frames = result.saved
+    result.metrics.bytes_written = result.bytes_written
+    result.metrics.elapsed = time.perf_counter() - started
+    return result
+
+
+def _write_selected(cap, targets, output_dir, extension, options, result, reporter, should_continue, budget, problem):
+    """解码targets中的各帧并按请求名称写出，已写出的帧序号从targets中移除"""
+    metrics = result.metrics
+    buffers = BufferPool()
+    sampler = partial(iter_selected_frames, frame_indices=list(targets), buffers=buffers)
+    transform = options.make_transform()
+    if transform is not None:
+        sampler = transform_sampler(sampler, transform, buffers)
+    encode = partial(encode_frame, output_format=options.output_format, quality=options.quality)
+    encode_times = []
+
+    def timed_encode(frame):
+        start = time.perf_counter()
+        try:
+            return encode(frame)
+        finally:
+            encode_times.append(time.perf_counter() - start)
+
+    total = len(targets)
+    frames = iter_encoded_frames(cap, 1, timed_encode, encode_workers=options.encode_workers,
+                                 queue_depth=options.queue_depth, should_continue=should_continue, sampler=sampler,
+                                 metrics=metrics, budget=budget, buffers=buffers)
+    try:
+        for done, (frame_index, frame, encoded) in enumerate(frames, 1):
+            if result.frame_shape is None:
+                result.frame_shape = list(frame.shape)
+            for name, request in targets.pop(frame_index):
+                if encoded is None:
+                    metrics.errors += 1
+                    problem(request, "write_failed", "无法编码图片")
+                    continue
+                write_start = time.perf_counter()
+                try:
+                    write_file_atomic(output_dir / f"{name}{extension}", encoded)
+                except OSError as e:
+                    reporter.log(f"保存帧时出错: {str(e)}", logging.ERROR)
+                    metrics.errors += 1
+                    problem(request, "write_failed", str(e))
+                    continue
+                metrics.observe("write", time.perf_counter() - write_start)
+                result.saved += 1
+                result.bytes_written += len(encoded)
+            reporter.video_progress(result.video_path, done, total)
+    finally:
+        frames.close()
+    result.encode_seconds += sum(encode_times)
+    for seconds in encode_times:
+        metrics.observe("encode", seconds)
+
+
+def _extract_selection_job(video_path, output_dir, options, log_level, requests, reporter=None, should_continue=None,
+                           budget=None):
+    """run_jobs使用的extract，按请求列表提取一个视频"""
+    return extract_selected_frames(video_path, output_dir, requests, options, reporter, should_continue, budget)
+
+
+class SelectionBatchResult(BatchResult):
+    """整个选择列表的处理结果，problems为所有无法提取的请求（包括格式错误的项）"""
+
+    def __init__(self, total_videos, requested=0):
+        super().__init__(total_videos)
+        self.requested = requested
+        self.problems = []
+
+    def as_dict(self):
+        result = super().as_dict()
+        result.update(requested=self.requested,
+                      existing=sum(getattr(video, "existing", 0) for video in self.results),
+                      problems=len(self.problems))
+        return result
+
+
+def write_selection_summary(path, selection_path, batch):
+    """写出汇总文件：各项计数、按原因统计的无法提取的请求，以及每个请求的详细信息"""
+    reasons = {}
+    for problem in batch.problems:
+        reasons[problem["reason"]] = reasons.get(problem["reason"], 0) + 1
+    summary = {
+        "selection": str(selection_path),
+        "requested": batch.requested,
+        "extracted_frames": batch.extracted_frames,
+        "existing": batch.as_dict()["existing"],
+        "problems": len(batch.problems),
+        "reasons": {reason: {"count": count, "description": PROBLEM_REASONS[reason]}
+                    for reason, count in sorted(reasons.items())},
+        "stopped": batch.stopped,
+        "videos": [result.as_dict() for result in batch.results],
+        "problem_requests": batch.problems,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_file_atomic(path, json.dumps(summary, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def run_selection(selection_path, input_dir, output_dir, options, reporter=None, should_continue=None,
+                  log_level=logging.INFO, stats_file=None, summary_path=None):
+    """按选择列表提取帧，返回SelectionBatchResult，并写出汇总文件（默认为输出文件夹中的SELECTION_SUMMARY_NAME）
+
+    options.workers大于1时把视频分发到进程池，请求多的视频最先开始。采样方式、去重和分段设置不起作用；
+    只支持每帧一个文件的输出方式，其他方式抛出ValueError。
+    """
+    if options.container != "files":
+        raise ValueError("选择列表只支持每帧一个文件的输出方式（--container files）")
+    started = time.perf_counter()
+    reporter = reporter or Reporter()
+    should_continue = should_continue or (lambda: True)
+
+    requests, invalid = load_selection(selection_path)
+    jobs = plan_selection(requests, input_dir, output_dir)
+    reporter.log(f"选择列表中有 {len(requests) + len(invalid)} 项，涉及 {len(jobs)} 个视频"
+                 f"{f'，{len(invalid)} 项格式错误' if invalid else ''}")
+    batch = SelectionBatchResult(len(jobs), len(requests) + len(invalid))
+    batch.problems.extend(invalid)
+    budget = options.make_memory_budget()
+    # 请求多的视频最先开始
+    jobs.sort(key=lambda job: len(job[2]), reverse=True)
+    run_jobs(jobs, options, reporter, batch, _extract_selection_job, should_continue, log_level, stats_file, budget)
+
+    # 汇总各视频的问题；子进程出错或未开始的视频，其请求全部记为无法提取
+    processed = {}
+    for result in batch.results:
+        processed[str(result.video_path)] = result
+    for video_path, _, video_requests in jobs:
+        result = processed.get(str(video_path))
+        if isinstance(result, SelectionResult):
+            batch.problems.extend(result.problems)
+            continue
+        reason = "failed" if result is not None else "stopped"
+        for request in video_requests:
+            batch.problems.append(dict(request.as_dict(), reason=reason, detail=result.error if result else None))
+
+    batch.stopped = not should_continue()
+    batch.elapsed = time.perf_counter() - started
+    if budget is not None:
+        batch.memory = budget.as_dict()
+    summary_path = summary_path or Path(output_dir) / SELECTION_SUMMARY_NAME
+    try:
+        write_selection_summary(summary_path, selection_path, batch)
+    except OSError as e:
+        reporter.log(f"无法写入选择列表汇总: {str(e)}", logging.ERROR)
+    return batch
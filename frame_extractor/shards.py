@@ -0,0 +1,283 @@
+"""打包输出：把帧写入tar/zip分片或内存映射的.npy数组，而不是每帧一个文件
+
+逐帧输出时一小时30fps的视频就会在一个目录中产生十万个小文件。打包模式在提取循环中
+流式写入分片，每个分片完成后更新帧序号 -> 偏移量的索引；ShardReader根据索引
+直接读取任意一帧，无需解包。
+"""
+import io
+import json
+import os
+import tarfile
+import time
+import zipfile
+from pathlib import Path
+
+from .lazy import cv2, np
+from .writer import write_file_atomic
+
+# 输出方式：files 每帧一个图片文件 / tar、zip 打包分片 / npy 原始BGR帧的内存映射数组
+CONTAINERS = ("files", "tar", "zip", "npy")
+
+INDEX_NAME = "frames_index.json"
+INDEX_VERSION = 1
+
+# npy数组的形状必须预先确定，未指定分片大小时每个分片最多容纳的帧数
+DEFAULT_NPY_SHARD_FRAMES = 1000
+
+TAR_BLOCK_SIZE = 512
+
+
+def frame_file_name(frame_index, extension):
+    return f"frame_{frame_index:06d}{extension}"
+
+
+class FileSink:
+    """每帧一个文件，写出即提交"""
+
+    def __init__(self, output_dir, extension, on_commit=None):
+        self.output_dir = Path(output_dir)
+        self.extension = extension
+        self.on_commit = on_commit
+
+    def write(self, frame_index, frame, data, extension=None):
+        """写出一帧，返回写出的字节数"""
+        write_file_atomic(self.output_dir / frame_file_name(frame_index, extension or self.extension), data)
+        if self.on_commit is not None:
+            self.on_commit(frame_index)
+        return len(data)
+
+    def close(self):
+        pass
+
+
+class _ShardSink:
+    """分片输出的公共部分：分片轮换、索引维护和提交
+
+    分片先写入隐藏的临时文件，写满或结束时重命名为正式文件并更新索引，
+    之后才通过on_commit通知调用方（用于断点续传清单），因此清单中记录的帧一定已在完整的分片中。
+    """
+
+    suffix = ""
+
+    def __init__(self, output_dir, extension, shard_size=0, on_commit=None, resume=False):
+        self.output_dir = Path(output_dir)
+        self.extension = extension
+        self.shard_size = max(0, int(shard_size))
+        self.on_commit = on_commit
+        index = _load_index(self.output_dir) if resume else {}
+        self.frames = index.get("frames", {})
+        self.frame_shape = index.get("frame_shape")
+        used = {entry[0] for entry in self.frames.values()}
+        self.shard_number = len(used)
+        while self._shard_name(self.shard_number) in used:
+            self.shard_number += 1
+        self.shard_path = None
+        self.pending = []   # 当前分片中的(帧序号, 索引项)
+
+    def _shard_name(self, number):
+        return f"frames_{number:04d}{self.suffix}"
+
+    def write(self, frame_index, frame, data, extension=None):
+        """把一帧追加到当前分片，返回写出的字节数"""
+        if self.frame_shape is None:
+            self.frame_shape = list(frame.shape)
+        if self.shard_path is None:
+            self.shard_path = self.output_dir / self._shard_name(self.shard_number)
+            self._open(self.shard_path.with_name(f".{self.shard_path.name}.partial"), frame)
+        entry, size = self._append(frame_index, frame, data, extension or self.extension)
+        self.pending.append((frame_index, entry))
+        if self.shard_size and len(self.pending) >= self.shard_size:
+            self._close_shard()
+        return size
+
+    def close(self):
+        if self.shard_path is not None:
+            self._close_shard()
+
+    def _close_shard(self):
+        partial_path = self.shard_path.with_name(f".{self.shard_path.name}.partial")
+        self._finish(partial_path, len(self.pending))
+        os.replace(partial_path, self.shard_path)
+        for frame_index, entry in self.pending:
+            self.frames[str(frame_index)] = [self.shard_path.name] + entry
+        index = {"version": INDEX_VERSION, "container": self.suffix.lstrip("."), "frame_shape": self.frame_shape,
+                 "frames": self.frames}
+        write_file_atomic(self.output_dir / INDEX_NAME, json.dumps(index).encode("utf-8"))
+        if self.on_commit is not None:
+            for frame_index, _ in self.pending:
+                self.on_commit(frame_index)
+        self.pending = []
+        self.shard_path = None
+        self.shard_number += 1
+
+
+class TarSink(_ShardSink):
+    """不压缩的tar分片，成员为编码后的图片，索引记录数据在分片中的偏移和长度"""
+
+    suffix = ".tar"
+
+    def _open(self, path, frame):
+        self.file = open(path, "wb")
+        self.tar = tarfile.open(fileobj=self.file, mode="w", format=tarfile.PAX_FORMAT)
+
+    def _append(self, frame_index, frame, data, extension):
+        data = memoryview(data).cast("B")
+        info = tarfile.TarInfo(frame_file_name(frame_index, extension))
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar.addfile(info, io.BytesIO(data))
+        # addfile写出头部、数据，并把数据补齐到512字节的整数倍
+        padded = -(-info.size // TAR_BLOCK_SIZE) * TAR_BLOCK_SIZE
+        return [self.file.tell() - padded, info.size], info.size
+
+    def _finish(self, path, count):
+        self.tar.close()
+        self.file.close()
+
+
+class ZipSink(_ShardSink):
+    """不压缩（ZIP_STORED）的zip分片，PNG/JPG本身已经压缩过"""
+
+    suffix = ".zip"
+
+    def _open(self, path, frame):
+        self.file = open(path, "wb")
+        self.zip = zipfile.ZipFile(self.file, "w", zipfile.ZIP_STORED, allowZip64=True)
+
+    def _append(self, frame_index, frame, data, extension):
+        data = memoryview(data).cast("B")
+        info = zipfile.ZipInfo(frame_file_name(frame_index, extension), date_time=time.localtime()[:6])
+        self.zip.writestr(info, data)
+        # 可定位的文件不写数据描述符，写完后文件位置就是数据末尾
+        return [self.file.tell() - len(data), len(data)], len(data)
+
+    def _finish(self, path, count):
+        self.zip.close()
+        self.file.close()
+
+
+class NpySink(_ShardSink):
+    """原始BGR帧写入内存映射的.npy数组，形状为(帧数, 高, 宽, 通道)，适合直接用于机器学习
+
+    数组形状在第一帧时按分片大小确定，分片未写满时结束会缩小数组头部中的帧数并截断文件。
+    """
+
+    suffix = ".npy"
+
+    def _open(self, path, frame):
+        capacity = self.shard_size or DEFAULT_NPY_SHARD_FRAMES
+        self.array = np.lib.format.open_memmap(path, mode="w+", dtype=frame.dtype, shape=(capacity,) + frame.shape)
+
+    def _append(self, frame_index, frame, data, extension):
+        row = len(self.pending)
+        if frame.shape != self.array.shape[1:]:
+            raise ValueError(f"帧尺寸 {frame.shape} 与数组 {self.array.shape[1:]} 不一致")
+        self.array[row] = frame
+        return [row], frame.nbytes
+
+    def _finish(self, path, count):
+        shape, dtype = self.array.shape, self.array.dtype
+        self.array.flush()
+        del self.array
+        if count < shape[0]:
+            _shrink_npy(path, (count,) + shape[1:], dtype)
+
+
+def _shrink_npy(path, shape, dtype):
+    """把.npy头部中的形状改为更少的帧并截断文件；头部长度变化时保持原样（索引仍然正确）"""
+    header = io.BytesIO()
+    np.lib.format.write_array_header_1_0(
+        header, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": shape})
+    with open(path, "r+b") as f:
+        np.lib.format.read_magic(f)
+        np.lib.format.read_array_header_1_0(f)
+        data_offset = f.tell()
+        if len(header.getvalue()) != data_offset:
+            return
+        f.seek(0)
+        f.write(header.getvalue())
+        f.truncate(data_offset + int(np.prod(shape)) * dtype.itemsize)
+
+
+SINKS = {"tar": TarSink, "zip": ZipSink, "npy": NpySink}
+
+
+def open_sink(container, output_dir, extension, shard_size=0, on_commit=None, resume=False):
+    """按输出方式创建写出器；resume为True时在已有索引的基础上追加新的分片"""
+    if container == "files":
+        return FileSink(output_dir, extension, on_commit)
+    return SINKS[container](output_dir, extension, shard_size, on_commit, resume)
+
+
+def _load_index(output_dir):
+    try:
+        with open(Path(output_dir) / INDEX_NAME, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return index if index.get("version") == INDEX_VERSION else {}
+
+
+class ShardReader:
+    """按帧序号随机读取打包输出中的帧，不需要解包
+
+    示例:
+        with ShardReader("frames/video") as reader:
+            frame = reader.read(reader.frame_indices[0])
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        index = _load_index(self.output_dir)
+        if not index:
+            raise FileNotFoundError(f"找不到帧索引: {self.output_dir / INDEX_NAME}")
+        self.container = index["container"]
+        self.frame_shape = tuple(index.get("frame_shape") or ())
+        self.frames = {int(frame_index): entry for frame_index, entry in index["frames"].items()}
+        self.frame_indices = sorted(self.frames)
+        self._open_shards = {}
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, frame_index):
+        return frame_index in self.frames
+
+    def _shard(self, name):
+        shard = self._open_shards.get(name)
+        if shard is None:
+            path = self.output_dir / name
+            shard = np.load(path, mmap_mode="r") if self.container == "npy" else open(path, "rb")
+            self._open_shards[name] = shard
+        return shard
+
+    def read_bytes(self, frame_index):
+        """返回tar/zip分片中该帧编码后的字节"""
+        if self.container == "npy":
+            raise ValueError("npy输出保存的是原始帧，请使用read()")
+        name, offset, size = self.frames[frame_index]
+        shard = self._shard(name)
+        shard.seek(offset)
+        return shard.read(size)
+
+    def read(self, frame_index):
+        """返回该帧的BGR数组"""
+        if self.container == "npy":
+            name, row = self.frames[frame_index]
+            return self._shard(name)[row]
+        data = np.frombuffer(self.read_bytes(frame_index), dtype=np.uint8)
+        if self.frame_shape and data.size == np.prod(self.frame_shape):
+            return data.reshape(self.frame_shape)  # raw格式的原始BGR字节
+        return cv2.imdecode(data, cv2.IMREAD_UNCHANGED)
+
+    def close(self):
+        for shard in self._open_shards.values():
+            if hasattr(shard, "close"):
+                shard.close()
+        self._open_shards = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
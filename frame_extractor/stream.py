@@ -0,0 +1,100 @@
+"""流式接口：在内存中逐帧或按批产出采样帧，不写任何文件
+
+训练或推理程序可以直接消费帧，不需要先把图片写到磁盘再读回。采样、变换和去重规则与
+extract_video_frames相同；解码在后台线程中进行，调用方来不及处理时最多缓冲queue_depth帧。
+
+示例:
+    options = ExtractionOptions(sampling_mode="seconds", seconds=1.0)
+    for video_path, frame_index, timestamp, frame in stream_frames("videos", options):
+        ...
+    for video_paths, frame_indices, timestamps, frames in stream_frame_batches("videos", 32):
+        model(frames)   # frames的形状为(N, 高, 宽, 通道)
+"""
+import logging
+from pathlib import Path
+
+from .core import ExtractionOptions, Reporter, frame_sampler, raw_frame, scan_videos
+from .lazy import cv2, np
+from .pipeline import iter_encoded_frames
+from .writer import get_short_path_name
+
+
+def _video_paths(source):
+    """source可以是视频文件、目录（递归扫描）或它们的列表"""
+    if isinstance(source, (str, Path)):
+        source = [source]
+    for path in source:
+        path = Path(path)
+        if path.is_dir():
+            yield from scan_videos(path)
+        else:
+            yield path
+
+
+def open_video(video_path, log):
+    """打开视频，失败时在Windows上改用短路径名重试；仍无法打开时记录警告并返回None"""
+    path_str = str(video_path.resolve())
+    cap = cv2.VideoCapture(path_str)
+    if not cap.isOpened():
+        # 在Windows系统上，尝试使用短路径名
+        short_path = get_short_path_name(path_str)
+        if short_path:
+            cap = cv2.VideoCapture(short_path)
+    if not cap.isOpened():
+        log(f"无法打开视频，跳过: {video_path}", logging.WARNING)
+        return None
+    return cap
+
+
+def stream_frames(source, options=None, should_continue=None, reporter=None):
+    """逐帧产出(视频路径, 帧序号, 时间戳秒, 帧数组)
+
+    时间戳按帧序号和FPS计算，FPS未知时为None。无法打开的视频记录警告后跳过。
+    只使用options中的采样、变换和去重设置；提前结束迭代时会释放视频。
+    """
+    options = options or ExtractionOptions()
+    reporter = reporter or Reporter()
+    deduplicator = options.make_deduplicator() if options.dedup == "batch" else None
+    for video_path in _video_paths(source):
+        if should_continue is not None and not should_continue():
+            return
+        cap = open_video(video_path, reporter.log)
+        if cap is None:
+            continue
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        sampler = frame_sampler(options, fps, 0, deduplicator=deduplicator or options.make_deduplicator())
+        # 原样传递帧，只借用流水线的解码线程和有界缓冲
+        frames = iter_encoded_frames(cap, options.interval, raw_frame, encode_workers=1,
+                                     queue_depth=options.queue_depth, should_continue=should_continue, sampler=sampler)
+        try:
+            for frame_index, frame, _ in frames:
+                yield video_path, frame_index, frame_index / fps if fps > 0 else None, frame
+        finally:
+            frames.close()
+            cap.release()
+
+
+def stream_frame_batches(source, batch_size, options=None, should_continue=None, reporter=None, per_video=False):
+    """按批产出(视频路径列表, 帧序号数组, 时间戳数组, 帧数组)，帧数组的形状为(N, 高, 宽, 通道)
+
+    帧尺寸变化时（不同分辨率的视频）先产出不足batch_size的当前批次；per_video为True时
+    每批只包含同一个视频的帧。未知的时间戳为NaN。
+    """
+    batch_size = max(1, int(batch_size))
+    batch = []
+
+    def flush():
+        video_paths, frame_indices, timestamps, frames = zip(*batch)
+        batch.clear()
+        timestamps = [np.nan if timestamp is None else timestamp for timestamp in timestamps]
+        return (list(video_paths), np.array(frame_indices, dtype=np.int64), np.array(timestamps, dtype=np.float64),
+                np.stack(frames))
+
+    for item in stream_frames(source, options, should_continue, reporter):
+        if batch and (item[3].shape != batch[0][3].shape or (per_video and item[0] != batch[0][0])):
+            yield flush()
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield flush()
+    if batch:
+        yield flush()
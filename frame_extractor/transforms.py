@@ -0,0 +1,117 @@
+"""解码之后、编码之前的帧变换：裁剪、灰度、缩放和加黑边
+
+在提取时直接输出模型需要的尺寸，省去之后再读取、缩小并重写所有图片的第二遍处理；
+编码耗时和输出大小也随像素数成比例下降。
+"""
+
+from .lazy import cv2, np
+
+# 插值方式名称 -> OpenCV常量名；缩小时area效果最好
+INTERPOLATIONS = {
+    "nearest": "INTER_NEAREST",
+    "linear": "INTER_LINEAR",
+    "area": "INTER_AREA",
+    "cubic": "INTER_CUBIC",
+    "lanczos": "INTER_LANCZOS4",
+}
+
+
+class FrameTransform:
+    """依次执行：裁剪到ROI -> 转为灰度 -> 缩放（可选加黑边）
+
+    crop为(x, y, 宽, 高)；max_edge只缩小、保持宽高比，使最长边不超过该值；
+    size为(宽, 高)，不加黑边时直接拉伸到该尺寸，加黑边时等比缩放到能放入该尺寸再居中补边。
+    只设置max_edge并加黑边时补成max_edge x max_edge的正方形。
+    """
+
+    def __init__(self, crop=None, max_edge=None, size=None, interpolation="area", grayscale=False,
+                 letterbox=False, pad_value=0):
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"不支持的插值方式: {interpolation}")
+        if crop is not None and (len(crop) != 4 or min(crop[2:]) <= 0 or min(crop[:2]) < 0):
+            raise ValueError(f"裁剪区域应为非负的x,y和正的宽,高: {crop}")
+        if size is not None and (len(size) != 2 or min(size) <= 0):
+            raise ValueError(f"输出尺寸应为正的宽,高: {size}")
+        if max_edge is not None and max_edge <= 0:
+            raise ValueError(f"最长边必须大于0: {max_edge}")
+        if letterbox and size is None and max_edge is None:
+            raise ValueError("加黑边需要同时指定输出尺寸或最长边")
+        self.crop = tuple(crop) if crop is not None else None
+        self.max_edge = max_edge
+        self.size = tuple(size) if size is not None else None
+        self.interpolation = interpolation
+        self.grayscale = grayscale
+        self.letterbox = letterbox
+        self.pad_value = pad_value
+
+    def describe(self):
+        """影响输出内容的参数，用于提取清单（元组转为列表，与读回的JSON一致）"""
+        return {
+            "crop": list(self.crop) if self.crop else None,
+            "max_edge": self.max_edge,
+            "size": list(self.size) if self.size else None,
+            "interpolation": self.interpolation,
+            "grayscale": self.grayscale,
+            "letterbox": self.letterbox,
+        }
+
+    def _resize_target(self, width, height):
+        """返回(外框尺寸, 缩放后的尺寸)，都为(宽, 高)；不缩放时外框为None"""
+        box = self.size or ((self.max_edge, self.max_edge) if self.max_edge else None)
+        if box is None:
+            return None, (width, height)
+        if self.size is not None and not self.letterbox:
+            return box, self.size
+        scale = min(box[0] / width, box[1] / height)
+        if not self.letterbox:
+            scale = min(scale, 1.0)  # 按最长边缩放时不放大
+        return box, (max(1, round(width * scale)), max(1, round(height * scale)))
+
+    def output_shape(self, width, height, channels=3):
+        """按输入分辨率计算输出帧的(高, 宽, 通道)，不需要实际的帧"""
+        if self.crop is not None:
+            x, y, crop_width, crop_height = self.crop
+            width, height = max(0, min(crop_width, width - x)), max(0, min(crop_height, height - y))
+            if not width or not height:
+                raise ValueError(f"裁剪区域 {self.crop} 超出画面范围")
+        if self.grayscale:
+            channels = 1
+        box, new_size = self._resize_target(width, height)
+        width, height = box if self.letterbox else new_size
+        return height, width, channels
+
+    def __call__(self, frame):
+        if self.crop is not None:
+            x, y, width, height = self.crop
+            frame = frame[y:y + height, x:x + width]
+            if frame.size == 0:
+                raise ValueError(f"裁剪区域 {self.crop} 超出画面范围")
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        height, width = frame.shape[:2]
+        box, new_size = self._resize_target(width, height)
+        if box is None:
+            return frame
+        if new_size != (width, height):
+            frame = cv2.resize(frame, new_size, interpolation=getattr(cv2, INTERPOLATIONS[self.interpolation]))
+        if self.letterbox:
+            top = (box[1] - new_size[1]) // 2
+            left = (box[0] - new_size[0]) // 2
+            frame = cv2.copyMakeBorder(frame, top, box[1] - new_size[1] - top, left, box[0] - new_size[0] - left,
+                                       cv2.BORDER_CONSTANT, value=self.pad_value)
+        return frame
+
+
+def transform_sampler(sampler, transform, buffers=None):
+    """包装sampling.build_sampler返回的sampler，在解码线程中对每个保留的帧做变换
+
+    buffers不为None时，变换结果不再引用原帧的数组（缩放、转灰度后）就立即把原帧归还到缓冲池。
+    """
+    def sample(cap, should_continue=None):
+        for frame_index, frame in sampler(cap, should_continue=should_continue):
+            transformed = transform(frame)
+            if buffers is not None and not np.may_share_memory(transformed, frame):
+                buffers.put(frame)
+            yield frame_index, transformed
+    return sample
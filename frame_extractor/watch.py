@@ -0,0 +1,434 @@
+"""监视模式：持续监视输入文件夹，把新到达或变化的视频交给进程池增量提取
+
+摄像头全天把新片段写入采集文件夹时，不需要反复手动开始、也不会每次重新处理整个目录。
+发现文件有两种方式：没有inotify时每隔poll_interval秒用iter_video_entries完整扫描；Linux上用inotify
+得到新建、写完和移入的文件，只对这些文件调用stat，并每隔rescan_interval秒完整扫描一次补上漏掉的事件
+（例如网络文件系统上由其他机器写入的文件）。文件大小和修改时间保持不变settle_seconds秒后才认为已写完。
+处理完成的视频追加到输出文件夹中的完成记录，重启后未变化的视频不再处理。
+"""
+import copy
+import json
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from .core import ProgressTracker, Reporter, VideoResult, WorkerPool, plan_jobs
+from .discovery import VIDEO_EXTENSIONS, iter_video_entries
+from .metrics import RunMetrics
+
+# 完成记录文件，默认放在输出目录中
+WATCH_JOURNAL_NAME = ".watch_journal.jsonl"
+
+# 检查新文件的间隔（秒）；文件大小和修改时间保持不变多少秒后才认为已写完
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_SETTLE_SECONDS = 5.0
+
+# 使用inotify时完整扫描的间隔（秒）
+DEFAULT_RESCAN_INTERVAL = 300.0
+
+# 主循环等待子进程结果或文件系统事件的最长时间（秒），也决定响应停止的速度
+WATCH_TICK = 0.2
+
+# 完成记录的行数超过视频数的这么多倍时，打开时压缩重写
+JOURNAL_COMPACT_RATIO = 2
+
+# inotify事件掩码，见inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len，之后是len字节的文件名
+
+
+class _Inotify:
+    """通过ctypes调用libc的inotify，监视目录树中文件的新建、写完和移入
+
+    新建的子目录自动加入监视。监视数达到系统上限等原因无法添加时complete变为False，调用方应改为轮询。
+    """
+
+    MASK = IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO
+
+    def __init__(self, libc, fd):
+        self.libc = libc
+        self.fd = fd
+        self.watches = {}  # 监视描述符 -> 目录
+        self.complete = True
+
+    @classmethod
+    def open(cls):
+        """不是Linux或libc没有inotify时返回None"""
+        if not sys.platform.startswith("linux"):
+            return None
+        # ctypes只在监视模式中使用，不在导入包时加载，避免拖慢命令行启动
+        import ctypes
+        import ctypes.util
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        return cls(libc, fd) if fd >= 0 else None
+
+    def add_tree(self, directory):
+        """监视directory及其所有子目录（不进入符号链接），全部成功时返回True"""
+        stack = [Path(directory)]
+        while stack:
+            directory = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                self.complete = False
+                return False
+            self.watches[wd] = directory
+            try:
+                with os.scandir(directory) as entries:
+                    stack.extend(Path(entry.path) for entry in entries
+                                 if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                continue
+        return True
+
+    def read(self, timeout):
+        """等待最多timeout秒，返回(新建、写完或移入的视频路径集合, 是否需要完整扫描)"""
+        paths, rescan = set(), False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return paths, rescan
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True  # 事件队列溢出，丢失的事件只能靠完整扫描补上
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                directory = self.watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if mask & IN_ISDIR:
+                    # 新目录：加入监视，并找出监视生效之前已写入其中的视频
+                    if not self.add_tree(path):
+                        rescan = True
+                    paths.update(video_path for video_path, _ in iter_video_entries(path))
+                elif path.name.lower().endswith(VIDEO_EXTENSIONS):
+                    paths.add(path)
+        return paths, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """找出输入文件夹中新到达或变化、并且已经写完的视频
+
+    文件大小不为0，且大小和修改时间在连续的检查中保持settle_seconds秒不变，才认为已写完。
+    is_done(路径, stat)返回True的文件被忽略（已处理或正在处理）。
+    """
+
+    def __init__(self, input_dir, settle_seconds=DEFAULT_SETTLE_SECONDS, rescan_interval=DEFAULT_RESCAN_INTERVAL,
+                 use_inotify=True, is_done=None, log=None):
+        self.input_dir = Path(input_dir)
+        self.settle_seconds = settle_seconds
+        self.rescan_interval = rescan_interval
+        self.is_done = is_done or (lambda path, stat: False)
+        self.log = log or (lambda message, level=logging.INFO: None)
+        self.pending = {}  # 尚未写完的视频 -> (大小, 修改时间, 开始保持不变的时间)
+        self.candidates = set()  # inotify报告的、下一次检查时需要stat的视频
+        self.next_rescan = 0.0
+        self.inotify = _Inotify.open() if use_inotify else None
+        if self.inotify is not None and not self.inotify.add_tree(self.input_dir):
+            self._fall_back()
+
+    def _fall_back(self):
+        self.log("无法用inotify监视整个输入文件夹（可能超过了max_user_watches），改为定期扫描", logging.WARNING)
+        self.inotify.close()
+        self.inotify = None
+
+    def wait(self, timeout):
+        """等待timeout秒；使用inotify时期间收到的事件记为下一次检查的候选文件"""
+        if self.inotify is None:
+            time.sleep(timeout)
+            return
+        paths, rescan = self.inotify.read(timeout)
+        self.candidates |= paths
+        if rescan:
+            self.next_rescan = 0.0
+        if not self.inotify.complete:
+            self._fall_back()
+
+    def poll(self):
+        """检查一次，返回已写完、等待处理的[(路径, stat)]"""
+        now = time.monotonic()
+        if self.inotify is None or now >= self.next_rescan:
+            entries = dict(iter_video_entries(self.input_dir))
+            # 完整扫描中没有的文件已被删除或移走
+            for path in [path for path in self.pending if path not in entries]:
+                del self.pending[path]
+            self.next_rescan = now + self.rescan_interval
+        else:
+            entries = {}
+            for path in self.candidates | set(self.pending):
+                try:
+                    entries[path] = path.stat()
+                except OSError:
+                    self.pending.pop(path, None)
+        self.candidates.clear()
+
+        ready = []
+        for path, stat in entries.items():
+            if self.is_done(path, stat):
+                self.pending.pop(path, None)
+                continue
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self.pending.get(path)
+            if previous is None or previous[:2] != signature or not stat.st_size:
+                self.pending[path] = signature + (now,)
+            elif now - previous[2] >= self.settle_seconds:
+                del self.pending[path]
+                ready.append((path, stat))
+        return ready
+
+    def close(self):
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+
+class WatchJournal:
+    """监视模式的完成记录：每处理完一个视频追加一行JSON，重启后跳过已完成且大小和修改时间未变的视频
+
+    只追加、不重写，记录一个视频的开销与已完成的视频数无关；打开时同一视频的多条记录以最后一条为准，
+    行数明显多于视频数时压缩重写一次。写了一半的最后一行（进程被强制结束）被忽略。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}  # 视频路径 -> (大小, 修改时间)
+        lines = 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                        self.entries[record["video"]] = (record["size"], record["mtime_ns"])
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if lines > JOURNAL_COMPACT_RATIO * len(self.entries):
+            self._compact()
+        self.file = open(self.path, "a", encoding="utf-8")
+
+    def _compact(self):
+        temp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for video, (size, mtime_ns) in self.entries.items():
+                f.write(json.dumps({"video": video, "size": size, "mtime_ns": mtime_ns}, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_done(self, path, stat):
+        return self.entries.get(str(path)) == (stat.st_size, stat.st_mtime_ns)
+
+    def record(self, path, stat, result):
+        """记录处理完成的视频，stat为提交处理时的状态"""
+        self.entries[str(path)] = (stat.st_size, stat.st_mtime_ns)
+        self.file.write(json.dumps({"video": str(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                                    "status": result.status, "saved": result.saved,
+                                    "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class WatchResult:
+    """监视模式的累计结果
+
+    长时间运行时不保留每个视频的结果（会无限增长），只累计计数和各阶段统计；
+    results始终为空，只是为了与BatchResult一样可以传给metrics.write_report。
+    """
+
+    def __init__(self):
+        self.processed = 0
+        self.failed = 0
+        self.unchanged = 0
+        self.extracted_frames = 0
+        self.bytes_written = 0
+        self.metrics = RunMetrics()
+        self.results = []
+        self.elapsed = 0.0
+        self.memory = None  # 设置了内存预算时为MemoryBudget.as_dict()
+
+    def add(self, result):
+        self.processed += 1
+        self.failed += result.status in ("failed", "aborted")
+        self.unchanged += result.status == "unchanged"
+        self.extracted_frames += result.saved
+        self.bytes_written += result.bytes_written
+        self.metrics.merge(result.metrics)
+        self.metrics.elapsed = self.elapsed
+
+    def as_dict(self):
+        return {
+            "processed_videos": self.processed,
+            "failed_videos": self.failed,
+            "unchanged_videos": self.unchanged,
+            "extracted_frames": self.extracted_frames,
+            "bytes_written": self.bytes_written,
+            "bytes_per_frame": int(self.bytes_written / self.extracted_frames) if self.extracted_frames else 0,
+            "elapsed_s": round(self.elapsed, 3),
+            "memory_budget": self.memory,
+            "videos": [],
+        }
+
+
+def watch_folder(input_dir, output_dir, options, reporter=None, should_continue=None, log_level=logging.INFO,
+                 stats_file=None, poll_interval=DEFAULT_POLL_INTERVAL, settle_seconds=DEFAULT_SETTLE_SECONDS,
+                 rescan_interval=DEFAULT_RESCAN_INTERVAL, use_inotify=True, journal_path=None):
+    """持续监视input_dir并提取新到达或变化的视频，直到should_continue返回False，返回WatchResult
+
+    视频写完后按到达顺序交给options.workers个进程（至少一个，扫描不会被提取阻塞）。总是启用断点续传：
+    停止时未完成的视频下次从中断的帧继续。完成记录默认为输出文件夹中的WATCH_JOURNAL_NAME；
+    失败的视频在本次运行中不再重试，除非文件发生变化，重启后会重试。不支持分段提取（抛出ValueError）。
+    """
+    if options.segments > 1:
+        raise ValueError("监视模式不支持分段提取")
+    options = copy.copy(options)
+    options.resume = True
+    started = time.perf_counter()
+    reporter = reporter or Reporter()
+    should_continue = should_continue or (lambda: True)
+    # 完成记录按路径查找，使用绝对路径，相对路径或当前目录不同的两次运行也能对上
+    input_dir = Path(input_dir).resolve()
+    output_dir = Path(output_dir)
+
+    journal = WatchJournal(journal_path or output_dir / WATCH_JOURNAL_NAME)
+    # 本次运行中已提交、尚未记入完成记录的视频 -> (大小, 修改时间)；失败的视频留在这里，
+    # 文件变化前不再重试，文件被删除或移走后去掉
+    attempted = {}
+
+    def is_done(path, stat):
+        return attempted.get(path) == (stat.st_size, stat.st_mtime_ns) or journal.is_done(path, stat)
+
+    watcher = FolderWatcher(input_dir, settle_seconds, rescan_interval, use_inotify, is_done, reporter.log)
+    method = "inotify" if watcher.inotify is not None else f"每 {poll_interval:g} 秒扫描一次"
+    reporter.log(f"开始监视 {input_dir}（{method}，文件保持 {settle_seconds:g} 秒不变后处理），"
+                 f"完成记录中已有 {len(journal)} 个视频")
+
+    result = WatchResult()
+    tracker = ProgressTracker(reporter, 0, stats_file)
+    workers = max(1, options.workers)
+    queued = deque()   # 已写完、等待提交的(路径, stat)
+    running = {}       # future -> (序号, 路径, 输出子目录, stat)
+    started_futures = set()
+
+    def finish(future):
+        index, path, output_subdir, stat = running.pop(future)
+        started_futures.discard(future)
+        try:
+            video = future.result()
+        except Exception as e:
+            reporter.log(f"处理视频 {path.name} 时出错: {str(e)}", logging.ERROR)
+            video = VideoResult(path, output_subdir, status="failed", error=str(e))
+        pool.drain()
+        tracker.video_finished(video)
+        result.elapsed = time.perf_counter() - started
+        result.add(video)
+        if video.status in ("done", "unchanged"):
+            journal.record(path, stat, video)
+            # 之后由完成记录判断；处理期间文件又变化时保留新的记录
+            if attempted.get(path) == (stat.st_size, stat.st_mtime_ns):
+                del attempted[path]
+        return video
+
+    pool = WorkerPool(workers, options, tracker)
+    next_poll = 0.0
+    idle = False
+    try:
+        while should_continue():
+            now = time.monotonic()
+            if now >= next_poll:
+                next_poll = now + poll_interval
+                for path in [path for path in attempted if not path.exists()]:
+                    del attempted[path]
+                for path, stat in watcher.poll():
+                    attempted[path] = (stat.st_size, stat.st_mtime_ns)
+                    queued.append((path, stat))
+                    reporter.log(f"发现新视频: {path}")
+
+            # 最多向进程池提交workers*2个任务（每个进程一个正在运行、一个排队），其余留在本地队列中，停止时不必逐个取消
+            while queued and len(running) < workers * 2:
+                path, stat = queued.popleft()
+                output_subdir = plan_jobs(input_dir, output_dir, [path])[0][1]
+                index = tracker.total_videos
+                tracker.total_videos += 1
+                future = pool.submit(path, output_subdir, log_level)
+                running[future] = (index, path, output_subdir, stat)
+
+            if running:
+                if idle:
+                    idle = False
+                    reporter.status("正在处理新视频...")
+                done, _ = wait(running, timeout=WATCH_TICK, return_when=FIRST_COMPLETED)
+                for future in running:
+                    if future.running() and future not in started_futures:
+                        started_futures.add(future)
+                        index, path, _, _ = running[future]
+                        tracker.video_started(path, index, tracker.total_videos)
+                broken = False
+                for future in done:
+                    broken |= isinstance(future.exception(), BrokenProcessPool)
+                    finish(future)
+                if broken:
+                    # 有子进程异常退出（例如解码器崩溃）时进程池不能再使用
+                    reporter.log("子进程异常退出，重新创建进程池", logging.WARNING)
+                    for future in list(running):
+                        finish(future)
+                    pool.restart()
+                watcher.wait(0)
+            else:
+                if not idle:
+                    idle = True
+                    reporter.status(f"正在监视新视频，已处理 {result.processed} 个")
+                watcher.wait(max(0.0, min(WATCH_TICK, next_poll - time.monotonic())))
+            pool.drain()
+            tracker.update_stats()
+    finally:
+        # 正在运行的视频在下一帧停止，未开始的任务被取消，未提交的留到下次运行
+        pool.stop()
+        for future in running:
+            future.cancel()
+        wait(running)
+        for future in [future for future in running if not future.cancelled()]:
+            finish(future)
+        pool.close()
+        watcher.close()
+        journal.close()
+
+    result.elapsed = time.perf_counter() - started
+    result.metrics.elapsed = result.elapsed
+    if pool.budget is not None:
+        result.memory = pool.budget.as_dict()
+    tracker.update_stats(force=True)
+    return result
@@ -0,0 +1,101 @@
+"""帧的编码与写出"""
+import os
+import threading
+from pathlib import Path
+
+from .lazy import cv2, np
+
+# 输出格式 -> (扩展名, 编码参数名, 默认参数值, 允许的参数范围)
+OUTPUT_FORMATS = {
+    "png": (".png", "IMWRITE_PNG_COMPRESSION", 0, (0, 9)),      # 无损，参数为压缩级别，0不压缩
+    "jpg": (".jpg", "IMWRITE_JPEG_QUALITY", 95, (0, 100)),
+    "webp": (".webp", "IMWRITE_WEBP_QUALITY", 90, (1, 100)),    # 有损WebP
+    "webp-lossless": (".webp", "IMWRITE_WEBP_QUALITY", 101, None),  # OpenCV中质量大于100表示无损
+    "raw": (".bgr", None, None, None),                          # 原始BGR字节，不编码
+}
+
+# 编码预设 -> (输出格式, 质量或压缩级别)，在速度和文件大小之间取舍
+ENCODE_PRESETS = {
+    "fastest": ("jpg", 90),             # 编码最快，文件也小，写出不再是瓶颈
+    "smallest": ("webp", 80),           # 文件最小，编码较慢
+    "lossless-balanced": ("png", 1),    # 无损，比不压缩的PNG小数倍
+}
+
+
+def format_extension(output_format):
+    return OUTPUT_FORMATS[output_format][0]
+
+
+def check_quality(output_format, quality):
+    """检查质量或压缩级别是否在该格式允许的范围内"""
+    if quality is None:
+        return
+    limits = OUTPUT_FORMATS[output_format][3]
+    if limits is None:
+        raise ValueError(f"{output_format} 格式不支持设置质量")
+    if not limits[0] <= quality <= limits[1]:
+        raise ValueError(f"{output_format} 格式的质量或压缩级别必须在 {limits[0]}~{limits[1]} 之间: {quality}")
+
+
+def encode_frame(frame, output_format="png", quality=None):
+    """将帧编码为指定格式的字节，失败时返回None
+
+    quality为PNG的压缩级别或JPG/WebP的质量，None时使用格式的默认值；raw格式直接返回帧的原始字节。
+    """
+    extension, param_name, value, _ = OUTPUT_FORMATS[output_format]
+    if param_name is None:
+        return np.ascontiguousarray(frame).reshape(-1)
+    if quality is not None:
+        value = int(quality)
+    try:
+        success, buffer = cv2.imencode(extension, frame, [getattr(cv2, param_name), value])
+    except cv2.error:
+        return None
+    return buffer if success else None
+
+
+_short_path_func = None
+
+
+def get_short_path_name(path):
+    """获取Windows短路径名，用于OpenCV无法打开的中文路径；其他系统或失败时返回None"""
+    global _short_path_func
+    if os.name != "nt":
+        return None
+    try:
+        import ctypes
+        if _short_path_func is None:
+            # 只在首次调用时查找系统函数
+            func = ctypes.WinDLL('kernel32').GetShortPathNameW
+            func.argtypes = [ctypes.c_wchar_p, ctypes.c_wchar_p, ctypes.c_uint]
+            func.restype = ctypes.c_uint
+            _short_path_func = func
+        
+        buffer_size = 1024
+        buffer = ctypes.create_unicode_buffer(buffer_size)
+        result_length = _short_path_func(str(path), buffer, buffer_size)
+        if 0 < result_length < buffer_size:
+            return buffer.value
+    except Exception:
+        pass
+    return None
+
+
+def write_file_atomic(path, data):
+    """将字节数据写入目标目录下的临时文件，再原子重命名为目标文件
+
+    临时文件与目标在同一目录（同一文件系统），只写一次数据；
+    中途失败不会留下不完整的目标文件。
+    """
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(memoryview(data))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -1,12 +1,144 @@
 import os
 import sys
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # 带参数运行时转为无界面的命令行模式（参数与python -m frame_extractor相同），不导入tkinter也不创建窗口
+    from frame_extractor.cli import main
+    sys.exit(main())
+
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 from pathlib import Path
 import threading
+import queue
 import time
 import importlib.util
 import subprocess
+import logging
+from collections import deque
+
+from frame_extractor import (
+    DEFAULT_ENCODE_WORKERS,
+    DEFAULT_HASH_DISTANCE,
+    DEFAULT_QUEUE_DEPTH,
+    DEFAULT_SCENE_THRESHOLD,
+    ENCODE_PRESETS,
+    OUTPUT_FORMATS,
+    ExtractionOptions,
+    Reporter,
+    format_duration,
+    run_batch,
+    watch_folder,
+)
+
+# 界面定时处理事件的间隔（毫秒）、日志窗口最多保留的行数
+EVENT_POLL_MS = 100
+MAX_LOG_LINES = 2000
+
+LOG_LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "WARNING": logging.WARNING}
+
+SAMPLING_MODE_LABELS = {"每隔N帧": "frames", "每隔N秒": "seconds", "场景变化": "scene"}
+DEDUP_LABELS = {"关闭": None, "单个视频内": "video", "整个批次": "batch"}
+CONTAINER_LABELS = {"每帧一个文件": "files", "tar分片": "tar", "zip分片": "zip", "npy数组(原始帧)": "npy"}
+
+
+class EventChannel:
+    """工作线程与界面线程之间的事件通道
+
+    工作线程只把日志、状态和需要在界面线程执行的调用放入队列，
+    界面线程通过root.after定时批量取出并更新控件。
+    """
+    
+    def __init__(self, level=logging.INFO, max_lines=MAX_LOG_LINES):
+        self.level = level
+        self.max_lines = max_lines
+        self._logs = queue.Queue()
+        self._calls = queue.Queue()
+        self._state = {}
+        self._state_lock = threading.Lock()
+    
+    def log(self, message, level=logging.INFO):
+        if level >= self.level:
+            self._logs.put(f"[{time.strftime('%H:%M:%S')}] {message}")
+    
+    def set(self, key, value):
+        """记录最新的状态值，两次处理之间的多次更新只保留最后一次"""
+        with self._state_lock:
+            self._state[key] = value
+    
+    def call(self, func, *args):
+        """在界面线程中执行func，不等待结果"""
+        self._calls.put((func, args, None))
+    
+    def ask(self, func, *args):
+        """在界面线程中执行func并等待其返回值，用于对话框"""
+        done = threading.Event()
+        result = []
+        self._calls.put((func, args, (done, result)))
+        done.wait()
+        return result[0] if result else None
+    
+    def drain(self):
+        """取出待显示的日志（环形缓冲，最多max_lines行）和最新状态，由界面线程调用"""
+        lines = deque(maxlen=self.max_lines)
+        while True:
+            try:
+                lines.append(self._logs.get_nowait())
+            except queue.Empty:
+                break
+        with self._state_lock:
+            state, self._state = self._state, {}
+        return lines, state
+    
+    def run_calls(self):
+        while True:
+            try:
+                func, args, waiter = self._calls.get_nowait()
+            except queue.Empty:
+                break
+            result = None
+            try:
+                result = func(*args)
+            finally:
+                if waiter is not None:
+                    done, holder = waiter
+                    holder.append(result)
+                    done.set()
+
+
+class GuiReporter(Reporter):
+    """把提取核心的回调转换为事件通道中的消息，由界面线程统一更新控件"""
+    
+    def __init__(self, events):
+        self.events = events
+    
+    def ask_continue(self, title, message):
+        return self.events.ask(messagebox.askyesno, title, message)
+    
+    def log(self, message, level=logging.INFO):
+        self.events.log(message, level)
+    
+    def status(self, message):
+        self.events.set("status", message)
+    
+    def notify(self, kind, title, message):
+        if kind == "error":
+            self.events.call(messagebox.showerror, title, message)
+        else:
+            self.events.call(messagebox.showwarning, title, message)
+    
+    def video_progress(self, video_path, frame_index, total_frames):
+        if total_frames > 0:
+            self.events.set("video_progress", (frame_index / total_frames) * 100)
+    
+    def batch_progress(self, finished, total):
+        self.events.set("total_progress", (finished / total) * 100)
+    
+    def batch_estimate(self, fraction, remaining_seconds):
+        # 按工作量计算的进度比按视频个数更准确，覆盖batch_progress设置的值
+        self.events.set("total_progress", fraction * 100)
+        self.events.set("eta", f"剩余约 {format_duration(remaining_seconds)}")
+
 
 class VideoFrameExtractor:
     def __init__(self, root):
@@ -19,18 +151,42 @@ class VideoFrameExtractor:
         self.input_folder = tk.StringVar()
         self.output_folder = tk.StringVar()
         self.frame_interval = tk.IntVar(value=1)  # 默认每1帧提取一张
+        self.sampling_mode = tk.StringVar(value="每隔N帧")
+        self.seconds = tk.DoubleVar(value=1.0)  # 按时间采样时每隔多少秒提取一张
+        self.scene_threshold = tk.DoubleVar(value=DEFAULT_SCENE_THRESHOLD)  # 场景变化采样的阈值
+        self.dedup = tk.StringVar(value="关闭")
+        self.dedup_distance = tk.IntVar(value=DEFAULT_HASH_DISTANCE)  # 感知哈希汉明距离不超过该值的帧视为重复
+        self.worker_count = tk.IntVar(value=1)  # 并行处理的进程数，1表示在后台线程中逐个处理
+        self.segments = tk.IntVar(value=1)  # 大于1时把每个视频分段，由多个进程并行提取
+        self.encode_workers = tk.IntVar(value=DEFAULT_ENCODE_WORKERS)  # 每个视频的编码线程数
+        self.queue_depth = tk.IntVar(value=DEFAULT_QUEUE_DEPTH)  # 每个视频最多缓冲的已解码帧数
+        self.memory_budget_mb = tk.IntVar(value=0)  # 所有进程中在途帧的内存上限（MB），0表示不限制
+        self.output_format = tk.StringVar(value="png")
+        self.container = tk.StringVar(value="每帧一个文件")
+        self.quality = tk.StringVar()  # PNG压缩级别0~9或JPG/WebP质量，留空使用默认值
+        self.preset = tk.StringVar(value="自定义")
+        self.max_edge = tk.IntVar(value=0)  # 编码前等比缩小到最长边不超过该值，0表示不缩放
+        self.crop = tk.StringVar()  # 编码前裁剪的区域 x,y,宽,高
+        self.grayscale = tk.BooleanVar(value=False)
+        self.resume = tk.BooleanVar(value=True)  # 跳过已完成的视频，未完成的从上次的位置继续
+        self.watch = tk.BooleanVar(value=False)  # 持续监视输入文件夹，处理新到达的视频，直到点击停止
         self.processing = False
         self.total_videos = 0
         self.processed_videos = 0
         self.total_frames = 0
         self.extracted_frames = 0
         self.installing = False
+        self.log_level = tk.StringVar(value="INFO")
+        self.events = EventChannel()
         
         # 检查依赖
         self.check_dependencies()
         
         # 创建UI
         self.create_widgets()
+        
+        # 定时处理工作线程发来的日志和进度
+        self.root.after(EVENT_POLL_MS, self.poll_events)
     
     def create_widgets(self):
         # 主框架
@@ -72,8 +228,65 @@ class VideoFrameExtractor:
         settings_frame = ttk.LabelFrame(main_frame, text="提取设置", padding="5")
         settings_frame.pack(fill=tk.X, pady=5)
         
-        ttk.Label(settings_frame, text="每隔多少帧提取一张:").grid(row=0, column=0, sticky=tk.W, pady=5)
-        ttk.Spinbox(settings_frame, from_=1, to=1000, textvariable=self.frame_interval, width=10).grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+        ttk.Label(settings_frame, text="采样方式:").grid(row=0, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(settings_frame, values=list(SAMPLING_MODE_LABELS), textvariable=self.sampling_mode, state="readonly", width=8).grid(row=0, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="每隔多少帧提取一张:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=1, to=1000, textvariable=self.frame_interval, width=10).grid(row=1, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="每隔多少秒提取一张:").grid(row=2, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=0.1, to=3600, increment=0.5, textvariable=self.seconds, width=10).grid(row=2, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="场景变化阈值(0~1，越小保留越多):").grid(row=3, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=0.01, to=1, increment=0.01, textvariable=self.scene_threshold, width=10).grid(row=3, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="去除重复帧:").grid(row=4, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(settings_frame, values=list(DEDUP_LABELS), textvariable=self.dedup, state="readonly", width=10).grid(row=4, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="重复判定距离(0~64，越大跳过越多):").grid(row=5, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=0, to=64, textvariable=self.dedup_distance, width=10).grid(row=5, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="并行处理进程数:").grid(row=6, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.worker_count, width=10).grid(row=6, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="单个视频分段并行数(1不分段):").grid(row=7, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=1, to=os.cpu_count() or 1, textvariable=self.segments, width=10).grid(row=7, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="编码线程数:").grid(row=8, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=1, to=32, textvariable=self.encode_workers, width=10).grid(row=8, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="缓冲帧数:").grid(row=9, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=1, to=256, textvariable=self.queue_depth, width=10).grid(row=9, column=1, sticky=tk.W, padx=5, pady=5)
+
+        ttk.Label(settings_frame, text="在途帧内存上限MB(0不限制):").grid(row=10, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=0, to=1024 * 1024, increment=256, textvariable=self.memory_budget_mb, width=10).grid(row=10, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="输出格式:").grid(row=11, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(settings_frame, values=list(OUTPUT_FORMATS), textvariable=self.output_format, state="readonly", width=8).grid(row=11, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="质量/压缩级别(留空使用默认):").grid(row=12, column=0, sticky=tk.W, pady=5)
+        ttk.Entry(settings_frame, textvariable=self.quality, width=10).grid(row=12, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="编码预设(覆盖格式和质量):").grid(row=13, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(settings_frame, values=["自定义"] + list(ENCODE_PRESETS), textvariable=self.preset, state="readonly", width=16).grid(row=13, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="输出方式:").grid(row=14, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(settings_frame, values=list(CONTAINER_LABELS), textvariable=self.container, state="readonly", width=16).grid(row=14, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="最长边像素(0不缩放):").grid(row=15, column=0, sticky=tk.W, pady=5)
+        ttk.Spinbox(settings_frame, from_=0, to=8192, increment=32, textvariable=self.max_edge, width=10).grid(row=15, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Label(settings_frame, text="裁剪区域 x,y,宽,高(留空不裁剪):").grid(row=16, column=0, sticky=tk.W, pady=5)
+        ttk.Entry(settings_frame, textvariable=self.crop, width=20).grid(row=16, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Checkbutton(settings_frame, text="转为灰度图", variable=self.grayscale).grid(row=17, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        ttk.Label(settings_frame, text="日志级别:").grid(row=18, column=0, sticky=tk.W, pady=5)
+        ttk.Combobox(settings_frame, values=list(LOG_LEVELS), textvariable=self.log_level, state="readonly", width=8).grid(row=18, column=1, sticky=tk.W, padx=5, pady=5)
+        
+        ttk.Checkbutton(settings_frame, text="断点续传（跳过已完成的视频，未完成的从上次停止处继续）", variable=self.resume).grid(row=19, column=0, columnspan=2, sticky=tk.W, pady=5)
+        
+        ttk.Checkbutton(settings_frame, text="监视输入文件夹（新视频写完后自动提取，直到点击停止）", variable=self.watch).grid(row=20, column=0, columnspan=2, sticky=tk.W, pady=5)
         
         # 进度显示
         progress_frame = ttk.LabelFrame(main_frame, text="进度", padding="5")
@@ -90,6 +303,9 @@ class VideoFrameExtractor:
         self.total_progress = ttk.Progressbar(progress_frame, orient=tk.HORIZONTAL, length=500, mode='determinate')
         self.total_progress.grid(row=2, column=1, sticky=tk.W+tk.E, padx=5, pady=2)
         
+        self.eta_label = ttk.Label(progress_frame, text="")
+        self.eta_label.grid(row=3, column=1, sticky=tk.W, padx=5, pady=2)
+        
         # 日志区域
         log_frame = ttk.LabelFrame(main_frame, text="日志", padding="5")
         log_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -135,12 +351,39 @@ class VideoFrameExtractor:
             self.output_folder.set(str(folder_path))
             self.log(f"已选择输出文件夹: {folder_path}")
     
-    def log(self, message):
-        self.log_text.insert(tk.END, f"[{time.strftime('%H:%M:%S')}] {message}\n")
-        self.log_text.see(tk.END)
+    def log(self, message, level=logging.INFO):
+        # 可以在任意线程调用，实际写入日志窗口由poll_events在界面线程完成
+        self.events.log(message, level)
     
     def update_status(self, message):
-        self.status_label.config(text=message)
+        self.events.set("status", message)
+    
+    def set_running(self, running):
+        self.events.set("running", running)
+    
+    def poll_events(self):
+        """在界面线程中批量处理事件通道中的日志、状态和调用"""
+        lines, state = self.events.drain()
+        if lines:
+            self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+            # 日志窗口只保留最近的若干行
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.events.max_lines
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see(tk.END)
+        if "status" in state:
+            self.status_label.config(text=state["status"])
+        if "video_progress" in state:
+            self.video_progress['value'] = state["video_progress"]
+        if "total_progress" in state:
+            self.total_progress['value'] = state["total_progress"]
+        if "eta" in state:
+            self.eta_label.config(text=state["eta"])
+        if "running" in state:
+            self.start_button.config(state=tk.DISABLED if state["running"] else tk.NORMAL)
+            self.stop_button.config(state=tk.NORMAL if state["running"] else tk.DISABLED)
+        self.events.run_calls()
+        self.root.after(EVENT_POLL_MS, self.poll_events)
     
     def start_extraction(self):
         # 检查输入和输出文件夹
@@ -152,6 +395,7 @@ class VideoFrameExtractor:
             return
         
         self.processing = True
+        self.events.level = LOG_LEVELS.get(self.log_level.get(), logging.INFO)
         self.start_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
         
@@ -162,6 +406,7 @@ class VideoFrameExtractor:
         self.extracted_frames = 0
         self.video_progress['value'] = 0
         self.total_progress['value'] = 0
+        self.eta_label.config(text="")
         
         # 启动处理线程
         threading.Thread(target=self.process_videos, daemon=True).start()
@@ -178,277 +423,82 @@ class VideoFrameExtractor:
     
     def process_videos(self):
         try:
-            input_dir = Path(self.input_folder.get())
-            output_dir = Path(self.output_folder.get())
-            
-            # 获取所有视频文件
-            video_extensions = ('.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm')
-            video_files = []
-            
-            self.update_status("正在扫描视频文件...")
-            self.log("开始扫描视频文件...")
-            
-            # 使用Path对象处理文件路径
-            for root, _, files in os.walk(input_dir):
-                root_path = Path(root)
-                for file in files:
-                    if file.lower().endswith(video_extensions):
-                        video_files.append(root_path / file)
-            
-            self.total_videos = len(video_files)
-            self.log(f"找到 {self.total_videos} 个视频文件")
-            
-            if self.total_videos == 0:
-                self.update_status("未找到视频文件")
-                self.processing = False
-                self.start_button.config(state=tk.NORMAL)
-                self.stop_button.config(state=tk.DISABLED)
+            options = ExtractionOptions(
+                interval=self.frame_interval.get(),
+                output_format=self.output_format.get(),
+                workers=self.worker_count.get(),
+                encode_workers=self.encode_workers.get(),
+                queue_depth=self.queue_depth.get(),
+                resume=self.resume.get(),
+                sampling_mode=SAMPLING_MODE_LABELS.get(self.sampling_mode.get(), "frames"),
+                seconds=self.seconds.get(),
+                scene_threshold=self.scene_threshold.get(),
+                dedup=DEDUP_LABELS.get(self.dedup.get()),
+                dedup_distance=self.dedup_distance.get(),
+                container=CONTAINER_LABELS.get(self.container.get(), "files"),
+                quality=int(self.quality.get()) if self.quality.get().strip() else None,
+                preset=self.preset.get() if self.preset.get() in ENCODE_PRESETS else None,
+                max_edge=self.max_edge.get() or None,
+                crop=[int(part) for part in self.crop.get().split(",")] if self.crop.get().strip() else None,
+                grayscale=self.grayscale.get(),
+                segments=self.segments.get(),
+                memory_budget=self.memory_budget_mb.get() * 1024 * 1024,
+            )
+            if self.watch.get():
+                self.watch_videos(options)
                 return
+            batch = run_batch(
+                Path(self.input_folder.get()),
+                Path(self.output_folder.get()),
+                options,
+                GuiReporter(self.events),
+                should_continue=lambda: self.processing,
+                log_level=self.events.level,
+            )
+            self.total_videos = batch.total_videos
+            self.processed_videos = len(batch.results)
+            self.extracted_frames = batch.extracted_frames
             
-            # 处理每个视频
-            for video_path in video_files:
-                if not self.processing:
-                    break
-                
-                # 计算相对路径，以保持文件夹结构
-                video_path_obj = Path(video_path)
-                rel_path = video_path_obj.parent.relative_to(input_dir)
-                video_name = video_path_obj.stem
-                
-                # 创建对应的输出文件夹
-                output_subdir = output_dir / rel_path / video_name
-                output_subdir.mkdir(parents=True, exist_ok=True)
-                
-                self.extract_frames(video_path, output_subdir)
-                self.processed_videos += 1
-                self.total_progress['value'] = (self.processed_videos / self.total_videos) * 100
-            
-            if self.processing:  # 如果没有被中途停止
+            if self.processing and self.total_videos > 0:  # 如果没有被中途停止
                 self.update_status("提取完成")
                 self.log(f"所有视频处理完成，共提取 {self.extracted_frames} 帧")
-                messagebox.showinfo("完成", f"所有视频处理完成，共提取 {self.extracted_frames} 帧")
+                summary = batch.as_dict()
+                if batch.extracted_frames:
+                    self.log(f"写出 {batch.bytes_written / 1024 / 1024:.1f} MB，平均每帧 {summary['bytes_per_frame'] / 1024:.1f} KB，编码 {summary['encode_ms_per_frame']:.1f} ms/帧")
+                    self.log(batch.metrics.summary_text())
+                if batch.memory is not None:
+                    self.log(f"在途帧内存峰值 {batch.memory['peak_bytes'] / 1024 / 1024:.1f} MB，解码等待预算 {batch.memory['waits']} 次，共 {batch.memory['wait_s']:.2f} 秒")
+                if options.dedup is not None:
+                    self.log(f"去重跳过 {summary['duplicate_frames']} 帧，约节省 {summary['duplicate_bytes_saved'] / 1024 / 1024:.1f} MB")
+                self.events.call(messagebox.showinfo, "完成", f"所有视频处理完成，共提取 {self.extracted_frames} 帧")
             
             self.processing = False
-            self.start_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
+            self.set_running(False)
             
         except Exception as e:
-            self.log(f"错误: {str(e)}")
+            self.log(f"错误: {str(e)}", logging.ERROR)
             self.update_status("处理出错")
             self.processing = False
-            self.start_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
+            self.set_running(False)
+    
+    def watch_videos(self, options):
+        """监视模式：持续处理输入文件夹中新到达的视频，点击停止后结束"""
+        result = watch_folder(
+            Path(self.input_folder.get()),
+            Path(self.output_folder.get()),
+            options,
+            GuiReporter(self.events),
+            should_continue=lambda: self.processing,
+            log_level=self.events.level,
+        )
+        self.processed_videos = result.processed
+        self.extracted_frames = result.extracted_frames
+        self.log(f"监视结束，共处理 {result.processed} 个视频，提取 {result.extracted_frames} 帧，失败 {result.failed} 个")
+        if result.extracted_frames:
+            self.log(result.metrics.summary_text())
+        self.processing = False
+        self.set_running(False)
     
-    def extract_frames(self, video_path, output_dir):
-        try:
-            # 使用Path对象处理路径，增强对中文和特殊字符的支持
-            video_path = Path(video_path)
-            output_dir = Path(output_dir)
-            
-            video_name = video_path.name
-            self.update_status(f"正在处理: {video_name}")
-            self.log(f"开始处理视频: {video_path}")
-            
-            # 确保输出目录存在
-            try:
-                if not output_dir.exists():
-                    output_dir.mkdir(parents=True, exist_ok=True)
-                    self.log(f"创建输出目录: {output_dir}")
-                
-                # 检查目录写入权限
-                test_file_path = output_dir / "test_write_permission.tmp"
-                try:
-                    with open(test_file_path, 'w', encoding='utf-8') as f:
-                        f.write("test")
-                    if test_file_path.exists():
-                        test_file_path.unlink()
-                except Exception as perm_error:
-                    self.log(f"警告: 输出目录可能没有写入权限: {str(perm_error)}")
-                    messagebox.showwarning("权限警告", f"输出目录可能没有写入权限，请选择其他目录或检查权限设置。\n{output_dir}")
-                    return
-            except Exception as dir_error:
-                self.log(f"错误: 无法创建或访问输出目录: {str(dir_error)}")
-                messagebox.showerror("目录错误", f"无法创建或访问输出目录，请检查路径是否包含特殊字符或权限设置。\n{output_dir}")
-                return
-            
-            # 打开视频文件
-            # 将Path对象转换为字符串，确保cv2.VideoCapture能正确处理中文和特殊字符路径
-            video_path_str = str(video_path.resolve())
-            self.log(f"尝试打开视频文件: {video_path_str}")
-            
-            # 对于包含特殊字符的路径，尝试使用绝对路径打开
-            cap = cv2.VideoCapture(video_path_str)
-            if not cap.isOpened():
-                self.log(f"无法打开视频: {video_path}，尝试其他方法...")
-                
-                # 尝试使用其他方式打开视频
-                try:
-                    # 在Windows系统上，尝试使用短路径名
-                    import ctypes
-                    kernel32 = ctypes.WinDLL('kernel32')
-                    GetShortPathNameW = kernel32.GetShortPathNameW
-                    GetShortPathNameW.argtypes = [ctypes.c_wchar_p, ctypes.c_wchar_p, ctypes.c_uint]
-                    GetShortPathNameW.restype = ctypes.c_uint
-                    
-                    buffer_size = 1024
-                    buffer = ctypes.create_unicode_buffer(buffer_size)
-                    result_length = GetShortPathNameW(video_path_str, buffer, buffer_size)
-                    
-                    if result_length > 0 and result_length < buffer_size:
-                        short_path = buffer.value
-                        self.log(f"尝试使用短路径名打开: {short_path}")
-                        cap = cv2.VideoCapture(short_path)
-                except Exception as short_path_error:
-                    self.log(f"尝试使用短路径名失败: {str(short_path_error)}")
-                
-                # 如果仍然无法打开，返回错误
-                if not cap.isOpened():
-                    self.log(f"所有尝试都失败，无法打开视频: {video_path}")
-                    return
-            
-            # 获取视频信息
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            fps = cap.get(cv2.CAP_PROP_FPS)
-            
-            self.log(f"视频信息: 总帧数={total_frames}, FPS={fps:.2f}")
-            self.video_progress['value'] = 0
-            
-            # 提取帧
-            frame_count = 0
-            saved_count = 0
-            interval = self.frame_interval.get()
-            error_count = 0  # 记录连续错误次数
-            max_errors = 5   # 最大允许连续错误次数
-            
-            while cap.isOpened() and self.processing:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                
-                # 按指定间隔提取帧
-                if frame_count % interval == 0:
-                    try:
-                        # 处理文件名，使用Path对象处理路径
-                        frame_filename = f"frame_{frame_count:06d}.png"
-                        output_path = output_dir / frame_filename
-                        
-                        # 将Path对象转换为字符串，确保cv2.imwrite能正确处理中文路径
-                        output_path_str = str(output_path.resolve())
-                        self.log(f"尝试保存图片到: {output_path_str}")
-                        
-                        # 尝试使用短路径名（如果在Windows系统上）
-                        try:
-                            import ctypes
-                            kernel32 = ctypes.WinDLL('kernel32')
-                            GetShortPathNameW = kernel32.GetShortPathNameW
-                            GetShortPathNameW.argtypes = [ctypes.c_wchar_p, ctypes.c_wchar_p, ctypes.c_uint]
-                            GetShortPathNameW.restype = ctypes.c_uint
-                            
-                            buffer_size = 1024
-                            buffer = ctypes.create_unicode_buffer(buffer_size)
-                            result_length = GetShortPathNameW(output_path_str, buffer, buffer_size)
-                            
-                            if result_length > 0 and result_length < buffer_size:
-                                short_path = buffer.value
-                                self.log(f"使用短路径名: {short_path}")
-                                output_path_str = short_path
-                        except Exception as short_path_error:
-                            self.log(f"获取短路径名失败，继续使用原路径: {str(short_path_error)}")
-                        
-                        # 尝试保存图片
-                        # 使用临时目录保存，然后移动到目标位置
-                        try:
-                            import tempfile
-                            import shutil
-                            
-                            # 创建临时文件
-                            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                                temp_path = temp_file.name
-                            
-                            # 保存到临时文件
-                            self.log(f"尝试先保存到临时文件: {temp_path}")
-                            temp_success = cv2.imwrite(temp_path, frame, [cv2.IMWRITE_PNG_COMPRESSION, 0])  # 使用无损压缩
-                            
-                            if temp_success:
-                                # 将临时文件复制到目标位置
-                                shutil.copy2(temp_path, output_path_str)
-                                # 删除临时文件
-                                os.remove(temp_path)
-                                success = True
-                                self.log(f"通过临时文件成功保存图片: {output_path}")
-                            else:
-                                success = False
-                                self.log(f"保存到临时文件失败")
-                        except Exception as temp_error:
-                            self.log(f"使用临时文件方法失败: {str(temp_error)}，尝试直接保存...")
-                            # 如果临时文件方法失败，尝试直接保存
-                            success = cv2.imwrite(output_path_str, frame, [cv2.IMWRITE_PNG_COMPRESSION, 0])
-                        
-                        if success:
-                            saved_count += 1
-                            self.extracted_frames += 1
-                            error_count = 0  # 重置错误计数
-                            
-                            # 验证文件是否真的被创建
-                            if not output_path.exists():
-                                self.log(f"警告: 文件似乎未被创建: {output_path}")
-                                error_count += 1
-                        else:
-                            self.log(f"错误: 无法保存图片: {output_path}")
-                            error_count += 1
-                            
-                            # 尝试使用不同的格式保存
-                            if error_count <= max_errors:
-                                try:
-                                    jpg_path = output_dir / f"frame_{frame_count:06d}.jpg"
-                                    jpg_path_str = str(jpg_path.resolve())
-                                    jpg_success = cv2.imwrite(jpg_path_str, frame, [cv2.IMWRITE_JPEG_QUALITY, 95])
-                                    if jpg_success:
-                                        self.log(f"成功使用JPG格式保存: {jpg_path}")
-                                        saved_count += 1
-                                        self.extracted_frames += 1
-                                        error_count = 0
-                                except Exception as jpg_error:
-                                    self.log(f"尝试JPG格式保存也失败: {str(jpg_error)}")
-                    except Exception as save_error:
-                        self.log(f"保存帧时出错: {str(save_error)}")
-                        error_count += 1
-                    
-                    # 如果连续错误次数过多，提示用户并中断处理
-                    if error_count >= max_errors:
-                        self.log(f"连续出现{max_errors}次保存错误，可能是路径问题或磁盘空间不足")
-                        if messagebox.askyesno("错误", f"连续出现{max_errors}次保存错误，是否继续处理？\n\n可能的原因:\n- 输出路径包含特殊字符\n- 磁盘空间不足\n- 没有写入权限"):
-                            error_count = 0  # 重置错误计数
-                        else:
-                            self.log("用户选择中断处理")
-                            break
-                
-                frame_count += 1
-                if frame_count % 10 == 0:  # 每10帧更新一次进度，减少UI更新频率
-                    self.video_progress['value'] = (frame_count / total_frames) * 100
-                    self.root.update_idletasks()
-            
-            cap.release()
-            self.video_progress['value'] = 100
-            
-            # 检查是否真的保存了文件
-            try:
-                actual_files = len([f for f in output_dir.glob("*.png")]) + len([f for f in output_dir.glob("*.jpg")])
-                self.log(f"视频 {video_name} 处理完成，预期提取 {saved_count} 帧，实际保存 {actual_files} 个文件")
-                
-                if actual_files == 0 and saved_count > 0:
-                    self.log(f"警告: 没有文件被保存到 {output_dir}，请检查权限或磁盘空间")
-                    messagebox.showwarning("警告", f"预期保存了 {saved_count} 个文件，但实际未找到任何文件。\n请检查输出目录的权限或磁盘空间。")
-            except Exception as check_error:
-                self.log(f"检查保存文件时出错: {str(check_error)}")
-                self.log(f"尝试使用绝对路径: {output_dir.resolve()}")
-            
-        except Exception as e:
-            self.log(f"处理视频 {video_path.name} 时出错: {str(e)}")
-            import traceback
-            self.log(f"错误详情: {traceback.format_exc()}")
-            messagebox.showerror("处理错误", f"处理视频时出错: {str(e)}")
-
     def check_dependencies(self):
         """检查必要的库是否已安装"""
         missing_libs = []
@@ -552,13 +602,7 @@ class VideoFrameExtractor:
         os.execl(python, python, *sys.argv)
 
 if __name__ == "__main__":
-    try:
-        import cv2
-        root = tk.Tk()
-        app = VideoFrameExtractor(root)
-        root.mainloop()
-    except ImportError:
-        # 如果导入cv2失败，仍然启动应用，让依赖检查机制处理
-        root = tk.Tk()
-        app = VideoFrameExtractor(root)
-        root.mainloop()
\ No newline at end of file
+    # 如果导入cv2失败，仍然启动应用，让依赖检查机制处理
+    root = tk.Tk()
+    app = VideoFrameExtractor(root)
+    root.mainloop()
\ No newline at end of file